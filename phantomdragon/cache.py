@@ -0,0 +1,318 @@
+"""On-disk caches for calculated descriptors and parsed data tables."""
+import hashlib
+import json
+import os
+import sqlite3
+from array import array
+
+import numpy as np
+import pandas as pd
+
+
+TABLE_CACHE_VERSION = 1
+
+# the number of cache hits whose access times are written to the database in one transaction
+ACCESS_FLUSH_INTERVAL = 1000
+
+
+def hash_contents(contents, **settings):
+    """
+    Compute a content-based cache key for a descriptor calculation.
+
+    Args:
+        contents (list): The contents of the input files (e.g. ligand SD-file and protein PDB-file) as bytes, read from
+            disk or from an archive.
+        **settings: All options that influence the calculated values (calculator type, radii, flags, ...).
+
+    Returns:
+        str: The hex digest identifying the calculation. Identical file contents and settings always give the same key,
+            regardless of the file names or locations.
+    """
+    sha = hashlib.sha256()
+
+    for content in contents:
+        sha.update(len(content).to_bytes(8, "little"))
+        sha.update(content)
+
+    for name in sorted(settings):
+        sha.update(f"{name}={settings[name]!r};".encode())
+
+    return sha.hexdigest()
+
+
+class DescriptorCache:
+    """
+    Size-bounded SQLite store of descriptor vectors with least-recently-used eviction. The access times of cache hits are
+    buffered and written in one transaction by put(), close() or every ACCESS_FLUSH_INTERVAL hits.
+
+    Args:
+        path (str): The path of the SQLite database file. It is created if it does not exist.
+        max_size (int, optional): The maximum total size in bytes of the stored descriptor vectors. Defaults to 1 GiB.
+    """
+
+    def __init__(self, path, max_size=1024**3):
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.accesses = {}
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS descriptors "
+            "(key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_access INTEGER NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS descriptors_last_access ON descriptors (last_access)")
+        self.connection.commit()
+        self.size, self.clock = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0), COALESCE(MAX(last_access), 0) FROM descriptors"
+        ).fetchone()
+
+    def _tick(self):
+        self.clock += 1
+        return self.clock
+
+    def _flush_accesses(self):
+        if self.accesses:
+            self.connection.executemany(
+                "UPDATE descriptors SET last_access = ? WHERE key = ?", [(tick, key) for key, tick in self.accesses.items()]
+            )
+            self.accesses.clear()
+
+    def get(self, key):
+        """
+        Look up the descriptor vector stored for a key.
+
+        Args:
+            key (str): The cache key (see hash_contents).
+
+        Returns:
+            list or None: The descriptor values, or None if the key is not cached.
+        """
+        row = self.connection.execute("SELECT value FROM descriptors WHERE key = ?", (key,)).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.accesses[key] = self._tick()
+
+        if len(self.accesses) >= ACCESS_FLUSH_INTERVAL:
+            self._flush_accesses()
+            self.connection.commit()
+
+        values = array("d")
+        values.frombytes(row[0])
+        return values.tolist()
+
+    def put(self, key, values):
+        """
+        Store a descriptor vector and evict the least recently used entries if the size limit is exceeded.
+
+        Args:
+            key (str): The cache key (see hash_contents).
+            values (list): The descriptor values.
+        """
+        blob = array("d", values).tobytes()
+
+        # the eviction below needs the current access times
+        self._flush_accesses()
+        old = self.connection.execute("SELECT size FROM descriptors WHERE key = ?", (key,)).fetchone()
+
+        if old is not None:
+            self.size -= old[0]
+
+        self.connection.execute(
+            "INSERT OR REPLACE INTO descriptors (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+            (key, blob, len(blob), self._tick()),
+        )
+        self.size += len(blob)
+
+        while self.size > self.max_size:
+            oldest = self.connection.execute(
+                "SELECT key, size FROM descriptors ORDER BY last_access LIMIT 1"
+            ).fetchone()
+
+            if oldest is None:
+                break
+
+            self.connection.execute("DELETE FROM descriptors WHERE key = ?", (oldest[0],))
+            self.size -= oldest[1]
+            self.evictions += 1
+
+        self.connection.commit()
+
+    def stats(self):
+        """
+        Returns:
+            dict: The hit/miss/eviction counts of this session and the number and total size of the stored entries.
+        """
+        entries = self.connection.execute("SELECT COUNT(*) FROM descriptors").fetchone()[0]
+        lookups = self.hits + self.misses
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups > 0 else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "size": self.size,
+        }
+
+    def report(self):
+        """
+        Returns:
+            str: A one-line summary of the cache statistics.
+        """
+        stats = self.stats()
+
+        return (
+            f"Descriptor cache {self.path}: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate'] * 100:.1f}% hit rate), {stats['evictions']} evictions, "
+            f"{stats['entries']} entries ({stats['size'] / 1024**2:.1f} MB)"
+        )
+
+    def close(self):
+        self._flush_accesses()
+        self.connection.commit()
+        self.connection.close()
+
+
+class TableCache:
+    """
+    Directory of parsed tables (e.g. descriptor and experimental data CSV-files). Every table is stored as one .npy
+    matrix per numeric column dtype, which is memory-mapped (copy-on-write) when loaded, and a JSON file holding the
+    column layout and the string columns such as the PDB codes. Entries are keyed by the absolute path of the source file
+    and the reader and its settings, and are parsed again when the modification time or size of the source file changed.
+
+    Args:
+        cache_dir (str): The cache directory. It is created if it does not exist.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_path(self, path, reader, settings):
+        sha = hashlib.sha256()
+
+        sha.update(os.path.abspath(path).encode())
+        sha.update(f"{reader.__module__}.{reader.__qualname__}".encode())
+
+        for name in sorted(settings):
+            sha.update(f"{name}={settings[name]!r};".encode())
+
+        return os.path.join(self.cache_dir, sha.hexdigest()[:32])
+
+    def load(self, path, reader, **settings):
+        """
+        Load a table, parsing the source file with reader(path, **settings) only if it is not cached or has changed.
+
+        Args:
+            path (str): The source file.
+            reader (callable): The function parsing the source file into a DataFrame (e.g. pandas.read_csv or
+                output.read_descriptors).
+            **settings: The keyword arguments of reader.
+
+        Returns:
+            pandas.DataFrame: The table.
+        """
+        entry_path = self._entry_path(path, reader, settings)
+        stat = os.stat(path)
+
+        try:
+            with open(entry_path + ".json") as file:
+                meta = json.load(file)
+
+            if meta["version"] == TABLE_CACHE_VERSION and meta["mtime_ns"] == stat.st_mtime_ns and meta["size"] == stat.st_size:
+                table = self._read_entry(entry_path, meta)
+                self.hits += 1
+                return table
+
+        except (OSError, ValueError, KeyError):
+            pass
+
+        self.misses += 1
+        table = reader(path, **settings)
+        self._write_entry(entry_path, table, stat)
+
+        return table
+
+    @staticmethod
+    def _read_entry(entry_path, meta):
+        groups = [np.load(f"{entry_path}.{i}.npy", mmap_mode="c") for i in range(len(meta["groups"]))]
+        columns = meta["columns"]
+
+        if groups:
+            names = [column["name"] for column in columns if column.get("group") == 0]
+            table = pd.DataFrame(groups[0], columns=names, copy=False)
+        else:
+            table = pd.DataFrame(index=pd.RangeIndex(meta["num_rows"]))
+
+        for loc, column in enumerate(columns):
+            if column.get("group") == 0:
+                continue
+
+            if "group" in column:
+                values = groups[column["group"]][:, column["index"]]
+            else:
+                values = pd.Series(column["values"], dtype=column["dtype"])
+
+            table.insert(loc, column["name"], values)
+
+        return table
+
+    @staticmethod
+    def _write_entry(entry_path, table, stat):
+        if not isinstance(table.index, pd.RangeIndex) or table.index.start != 0 or table.index.step != 1:
+            return
+
+        groups = []
+        columns = []
+
+        for name, dtype in table.dtypes.items():
+            if isinstance(dtype, np.dtype) and dtype.kind in "biuf":
+                if str(dtype) not in groups:
+                    groups.append(str(dtype))
+
+                group = groups.index(str(dtype))
+                index = sum(1 for column in columns if column.get("group") == group)
+                columns.append({"name": name, "group": group, "index": index})
+            else:
+                values = table[name].astype(object).where(table[name].notna(), None).tolist()
+                columns.append({"name": name, "dtype": str(dtype), "values": values})
+
+        tmp_suffix = f".{os.getpid()}.tmp"
+
+        for group, dtype in enumerate(groups):
+            names = [column["name"] for column in columns if column.get("group") == group]
+
+            with open(f"{entry_path}.{group}.npy{tmp_suffix}", "wb") as file:
+                np.save(file, np.asfortranarray(table[names].to_numpy(dtype=dtype)))
+
+            os.replace(f"{entry_path}.{group}.npy{tmp_suffix}", f"{entry_path}.{group}.npy")
+
+        meta = {
+            "version": TABLE_CACHE_VERSION,
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "num_rows": len(table),
+            "groups": groups,
+            "columns": columns,
+        }
+
+        with open(entry_path + ".json" + tmp_suffix, "w") as file:
+            json.dump(meta, file)
+
+        os.replace(entry_path + ".json" + tmp_suffix, entry_path + ".json")
+
+    def report(self):
+        """
+        Returns:
+            str: A one-line summary of the table cache use.
+        """
+        return f"Table cache {self.cache_dir}: {self.hits} hits, {self.misses} misses"
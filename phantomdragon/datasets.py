@@ -0,0 +1,209 @@
+"""In-process memoization of the training and testing data prepared for the affinity prediction experiments."""
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from .features import get_feature_schema
+from .functions import build_arrays, build_group_arrays, load_aligned_data
+
+
+class DatasetManager:
+    """
+    Memo of the aligned feature and experiment tables (see functions.load_aligned_data()) and the training and testing
+    arrays built from them (see functions.build_arrays()), keyed by their inputs. In an experiment grid the tables of a
+    training set are then loaded, sorted and filtered once, and its arrays are built once per test set. The arrays hold
+    all descriptor elements, the feature subsets are selected from them by column indices (see features.FeatureSchema).
+    The least recently used entries are evicted when the memoized data exceed max_size. Entries of a file are rebuilt when its modification
+    time or size changes. The memoized arrays are read-only.
+
+    Args:
+        max_size (int, optional): The maximum total size in bytes of the memoized tables and arrays. Defaults to 1 GiB.
+        table_cache (cache.TableCache, optional): Cache of the parsed tables the aligned tables are loaded from. Defaults
+            to None.
+    """
+
+    def __init__(self, max_size=1024**3, table_cache=None):
+        self.max_size = max_size
+        self.table_cache = table_cache
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _file_version(path):
+        stat = os.stat(path)
+        return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+    @staticmethod
+    def _get_size(value):
+        if isinstance(value, np.ndarray):
+            return value.nbytes
+
+        if isinstance(value, tuple):
+            return sum(DatasetManager._get_size(item) for item in value)
+
+        return int(value.memory_usage(index=True, deep=True).sum())
+
+    def _lookup(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key][0]
+
+        self.misses += 1
+        return None
+
+    def _store(self, key, value):
+        size = self._get_size(value)
+
+        if size > self.max_size:
+            return
+
+        self.entries[key] = (value, size)
+        self.size += size
+
+        while self.size > self.max_size:
+            old_key, (old_value, old_size) = self.entries.popitem(last=False)
+            self.size -= old_size
+            self.evictions += 1
+
+    def get_aligned(self, featurepath, experimentpath, identifier="PDB code", experiment_identifier="Affinity Data Type", dtype=None):
+        """
+        Returns:
+            tuple: The aligned features and experiment data of functions.load_aligned_data(), which must not be modified.
+        """
+        key = ("aligned", self._file_version(featurepath), self._file_version(experimentpath), identifier, experiment_identifier, dtype)
+        data = self._lookup(key)
+
+        if data is None:
+            data = load_aligned_data(featurepath, experimentpath, identifier, experiment_identifier, self.table_cache, dtype)
+            self._store(key, data)
+
+        return data
+
+    def get_arrays(self,
+        scoretype,
+        featurepath_train,
+        featurepath_test,
+        experimentpath_train,
+        experimentpath_test,
+        add_information,
+        identifier="PDB code",
+        experiment_identifier="Affinity Data Type",
+        polynomial=False,
+        dtype=None,
+        ):
+        """
+        Returns:
+            tuple: The read-only training and testing features and scores of functions.build_arrays(), in identifier
+                order (see functions.prepare_data() for the arguments).
+        """
+        key = (
+            "arrays",
+            scoretype,
+            self._file_version(featurepath_train),
+            self._file_version(featurepath_test),
+            self._file_version(experimentpath_train),
+            self._file_version(experimentpath_test),
+            identifier,
+            experiment_identifier,
+            polynomial,
+            dtype,
+        )
+        train_data = self.get_aligned(featurepath_train, experimentpath_train, identifier, experiment_identifier, dtype)
+        arrays = self._lookup(key)
+
+        if arrays is None:
+            test_data = self.get_aligned(featurepath_test, experimentpath_test, identifier, experiment_identifier, dtype)
+            arrays = build_arrays(train_data, test_data, scoretype, None, identifier, polynomial)
+
+            for array in arrays:
+                array.flags.writeable = False
+
+            self._store(key, arrays)
+
+        features_train, features_test, scores_train, scores_test = arrays
+        schema = get_feature_schema(train_data[0].columns.drop(identifier))
+        num_blocks = 2 if polynomial else 1
+
+        return (
+            schema.select(features_train, add_information, num_blocks),
+            schema.select(features_test, add_information, num_blocks),
+            scores_train,
+            scores_test,
+        )
+
+    def get_group_arrays(self,
+        scoretype,
+        featurepath_train,
+        featurepaths_test,
+        experimentpath_train,
+        experimentpaths_test,
+        add_information,
+        identifier="PDB code",
+        experiment_identifier="Affinity Data Type",
+        polynomial=False,
+        dtype=None,
+        ):
+        """
+        Returns:
+            tuple: The read-only training features, stacked testing features, scores and testing set indices of
+                functions.build_group_arrays() (see functions.prepare_group_data() for the arguments).
+        """
+        key = (
+            "group_arrays",
+            scoretype,
+            self._file_version(featurepath_train),
+            tuple(self._file_version(path) for path in featurepaths_test),
+            self._file_version(experimentpath_train),
+            tuple(self._file_version(path) for path in experimentpaths_test),
+            identifier,
+            experiment_identifier,
+            polynomial,
+            dtype,
+        )
+        train_data = self.get_aligned(featurepath_train, experimentpath_train, identifier, experiment_identifier, dtype)
+        arrays = self._lookup(key)
+
+        if arrays is None:
+            test_datas = [
+                self.get_aligned(featurepath, experimentpath, identifier, experiment_identifier, dtype)
+                for featurepath, experimentpath in zip(featurepaths_test, experimentpaths_test)
+            ]
+            arrays = build_group_arrays(train_data, test_datas, scoretype, None, identifier, polynomial)
+
+            for array in arrays:
+                array.flags.writeable = False
+
+            self._store(key, arrays)
+
+        features_train, features_test, scores_train, scores_test, groups = arrays
+        schema = get_feature_schema(train_data[0].columns.drop(identifier))
+        num_blocks = 2 if polynomial else 1
+
+        return (
+            schema.select(features_train, add_information, num_blocks),
+            schema.select(features_test, add_information, num_blocks),
+            scores_train,
+            scores_test,
+            groups,
+        )
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    def report(self):
+        """
+        Returns:
+            str: A one-line summary of the memo use.
+        """
+        lookups = self.hits + self.misses
+
+        return (
+            f"Datasets: {self.hits} hits, {self.misses} misses ({self.hits / lookups * 100 if lookups else 0.0:.1f}% hit rate), "
+            f"{self.evictions} evictions, {len(self.entries)} entries ({self.size / 1024**2:.1f} MB)"
+        )
@@ -0,0 +1,1768 @@
+"""Calculation of the GRAIL-based descriptors GRADE and X-GRADE."""
+import gzip
+import hashlib
+import multiprocessing
+import os
+import pickle
+import posixpath
+import tarfile
+import zipfile
+from collections import OrderedDict, deque, namedtuple
+
+import numpy as np
+import pandas as pd
+import scipy.spatial
+
+import CDPL
+import CDPL.Base as Base
+import CDPL.Chem as Chem
+import CDPL.Biomol as Biomol
+import CDPL.Math as Math
+import CDPL.MolProp as MolProp
+import CDPL.ForceField as ForceField
+import CDPL.GRAIL as GRAIL
+import CDPL.Pharm as Pharm
+
+from .cache import hash_contents
+from .prefetch import Prefetcher
+from .sdfindex import load_sdf_index, read_sdf_records
+from .timing import StageTimer
+
+
+LIG_ENV_MAX_RADIUS = 21.0
+# descriptor elements summing over all ligand-environment atom pairs without distance cutoff, which change with the
+# environment radius
+RADIUS_DEPENDENT_ELEMENTS = ("ES_ENERGY", "ES_ENERGY_SQRD_DIST")
+REMOVE_NON_STD_RESIDUES = True
+NON_STD_RESIDUE_MAX_ATOM_COUNT = 8
+SITE_GRID_SPACING = 0.05
+PREP_RECEPTOR_FILE_MAGIC = b"GRAIL-PREPARED-RECEPTOR\x001\n"
+MAX_PENDING_TASKS_PER_JOB = 4
+MAX_PREPARED_RECEPTORS = 2
+# the number of consecutive complexes that are grouped by receptor at once (see DescriptorEngine)
+RECEPTOR_GROUP_WINDOW = 1000
+
+# PDB records without influence on the structure read from a PDB-file, ignored when identifying receptors
+PDB_ANNOTATION_RECORDS = (b"HEADER", b"TITLE", b"COMPND", b"SOURCE", b"KEYWDS", b"EXPDTA", b"AUTHOR", b"REVDAT", b"JRNL", b"REMARK")
+
+DIRECTORY_LAYOUTS = {
+    "pdbbind": ("{code}_ligand.sdf", "{code}_protein.pdb"),
+    "plrex": ("ligand.sdf", "protein.pdb"),
+}
+
+
+ComplexInput = namedtuple("ComplexInput", ["name", "ligand_file", "protein_file", "data"], defaults=[None])
+"""
+A ligand-protein complex given by the paths of its ligand SD-file and protein PDB-file (optionally gzipped). Complexes read
+from an archive carry the file contents as data tuple (ligand bytes or None if missing, protein bytes or None if missing)
+and the member names within the archive as file names.
+"""
+
+Result = namedtuple("Result", ["name", "descriptors", "error", "warnings", "record"])
+"""
+The outcome of processing a complex or ligand: the descriptor vector (numpy.ndarray) or None and an error message, the
+warnings raised for the input structures and the StageTimer record (or None).
+"""
+
+
+def create_descriptor_calculator(ext_descr=False):
+    """
+    Create a GRAIL descriptor calculator.
+
+    Args:
+        ext_descr (bool, optional): Whether to create the X-GRADE calculator with subdivided HBA/HBD feature types. Defaults to False.
+
+    Returns:
+        GRAIL.GRAILDescriptorCalculator or GRAIL.GRAILXDescriptorCalculator: The calculator.
+    """
+    if ext_descr:
+        return GRAIL.GRAILXDescriptorCalculator()
+
+    return GRAIL.GRAILDescriptorCalculator()
+
+
+def descriptor_names(ext_descr=False):
+    """
+    Returns:
+        list: The names of the descriptor elements, in the order of the calculated vectors.
+    """
+    return list(create_descriptor_calculator(ext_descr).ElementIndex.names.keys())
+
+
+def check_protein(protein):
+    """
+    Returns:
+        list: Warnings about isolated hydrogens and atoms of unknown element in the protein.
+    """
+    warnings = []
+
+    for atom in protein.atoms:
+        if Chem.getType(atom) == Chem.AtomType.H and atom.numAtoms == 0:
+            warnings.append("isolated hydrogen atom encountered")
+
+        elif Chem.getType(atom) == Chem.AtomType.UNKNOWN:
+            warnings.append("atom of unknown element encountered")
+
+    return warnings
+
+
+def remove_non_std_residues(frag, max_atom_count=None):
+    """
+    Remove isolated fragments of standard residues with less than 5 atoms and non-standard residues (except single metal
+    ions) from a protein or environment fragment.
+
+    Args:
+        frag (Chem.Fragment or Chem.Molecule): The protein or environment residues.
+        max_atom_count (int, optional): Only non-standard residues with at most this number of atoms are removed. Defaults to
+            None, which removes all of them.
+
+    Returns:
+        list: Warnings about the removed isolated standard residue fragments.
+    """
+    warnings = []
+
+    for res in Biomol.ResidueList(frag):
+        is_std_res = Biomol.ResidueDictionary.isStdResidue(Biomol.getResidueCode(res))
+
+        if is_std_res and res.numAtoms < 5:
+            warnings.append(f"isolated standard residue fragment of size {res.numAtoms} found")
+            frag -= res
+
+        elif not is_std_res and (max_atom_count is None or res.numAtoms <= max_atom_count):
+            if res.numAtoms == 1 and Chem.AtomDictionary.isMetal(Chem.getType(res.atoms[0])):
+                continue
+
+            frag -= res
+
+    return warnings
+
+
+def read_file_data(file_path):
+    """
+    Returns:
+        bytes: The contents of a file, decompressed if the file name ends with .gz.
+    """
+    with (gzip.open if file_path.endswith(".gz") else open)(file_path, "rb") as file:
+        return file.read()
+
+
+def read_molecule(file_path, protein=False):
+    """
+    Read the first molecule of an SD-file (or of a PDB-file if protein is True). Gzipped files (.sdf.gz, .pdb.gz) are
+    decompressed in memory.
+
+    Raises:
+        IOError: If the file does not contain a molecule.
+
+    Returns:
+        Chem.BasicMolecule: The molecule.
+    """
+    if file_path.endswith(".gz"):
+        return read_molecule_data(read_file_data(file_path), protein)
+
+    if protein:
+        reader = Biomol.FilePDBMoleculeReader(file_path)
+    else:
+        reader = Chem.FileSDFMoleculeReader(file_path)
+
+    mol = Chem.BasicMolecule()
+
+    if not reader.read(mol):
+        raise IOError(f"reading {'protein PDB' if protein else 'ligand SD'}-file failed")
+
+    return mol
+
+
+def read_molecule_data(data, protein=False):
+    """
+    Read the first molecule of SD-file (or PDB-file if protein is True) contents held in memory.
+
+    Raises:
+        IOError: If the data do not contain a molecule.
+
+    Returns:
+        Chem.BasicMolecule: The molecule.
+    """
+    stream = Base.StringIOStream()
+    stream.setvalue(data)
+
+    if protein:
+        reader = Biomol.PDBMoleculeReader(stream)
+    else:
+        reader = Chem.SDFMoleculeReader(stream)
+
+    mol = Chem.BasicMolecule()
+
+    if not reader.read(mol):
+        raise IOError(f"reading {'protein PDB' if protein else 'ligand SD'}-file failed")
+
+    return mol
+
+
+def load_complex_files(item):
+    """
+    Raises:
+        IOError: If a file of a complex read from an archive is missing.
+
+    Returns:
+        tuple: The (decompressed) contents of the ligand and protein file of a ComplexInput as bytes.
+    """
+    if item.data is None:
+        return read_file_data(item.ligand_file), read_file_data(item.protein_file)
+
+    for file_name, data in zip((item.ligand_file, item.protein_file), item.data):
+        if data is None:
+            raise IOError(f"{file_name} not found in archive")
+
+    return item.data
+
+
+def get_receptor_key(prot_data):
+    """
+    Identify a protein by the structure records (atoms, coordinates, connectivity, ...) of its PDB-file contents, so that
+    copies of a protein file that differ only in annotations get the same key.
+
+    Returns:
+        str: The hex digest identifying the protein structure.
+    """
+    sha = hashlib.sha256()
+
+    for line in prot_data.splitlines():
+        if line.strip() and not line.startswith(PDB_ANNOTATION_RECORDS):
+            sha.update(line.rstrip() + b"\n")
+
+    return sha.hexdigest()
+
+
+def read_complex_molecule(file_path, data, protein=False):
+    """
+    Read a ligand or protein from its file or from the already loaded file contents.
+
+    Args:
+        file_path (str): The path of the file (or its name within an archive).
+        data (bytes): The file contents, or None to read the file.
+        protein (bool, optional): Whether a protein PDB-file is read. Defaults to False.
+
+    Returns:
+        Chem.BasicMolecule: The molecule.
+    """
+    if data is None:
+        return read_molecule(file_path, protein)
+
+    return read_molecule_data(data, protein)
+
+
+def extract_ligand_environment(ligand, protein, max_radius=LIG_ENV_MAX_RADIUS):
+    """
+    Returns:
+        Chem.Fragment: The protein residues within max_radius of a ligand atom, with perceived SSSR.
+    """
+    lig_env = Chem.Fragment()
+
+    Biomol.extractEnvironmentResidues(ligand, protein, lig_env, Chem.Atom3DCoordinatesFunctor(), max_radius, False)
+    Chem.extractSSSRSubset(protein, lig_env, True)
+
+    return lig_env
+
+
+def get_fragment_indices(frag, mol):
+    """
+    Returns:
+        tuple: The indices of the atoms and bonds of a fragment of mol, for rebuilding it in another process.
+    """
+    return ([mol.getAtomIndex(atom) for atom in frag.atoms], [mol.getBondIndex(bond) for bond in frag.bonds])
+
+
+def create_fragment(mol, atom_indices, bond_indices):
+    """
+    Returns:
+        Chem.Fragment: The fragment of mol with the given atoms and bonds and perceived SSSR (see get_fragment_indices).
+    """
+    frag = Chem.Fragment()
+
+    for idx in atom_indices:
+        frag.addAtom(mol.getAtom(idx))
+
+    for idx in bond_indices:
+        frag.addBond(mol.getBond(idx))
+
+    Chem.extractSSSRSubset(mol, frag, True)
+
+    return frag
+
+
+class Receptor:
+    """
+    A protein prepared for the descriptor calculation of many ligands: non-standard residues are removed and the GRAIL
+    preparation is done once.
+
+    Args:
+        protein (Chem.BasicMolecule): The prepared protein.
+        norm_chgs (bool, optional): Whether acidic/basic groups were protonated in a state likely at pH7. Defaults to False.
+        warnings (list, optional): Warnings raised during the preparation. Defaults to None.
+    """
+
+    def __init__(self, protein, norm_chgs=False, warnings=None):
+        self.protein = protein
+        self.norm_chgs = norm_chgs
+        self.warnings = warnings or []
+
+    @classmethod
+    def from_pdb(cls, pdb_file, norm_chgs=False):
+        """
+        Read and prepare a protein PDB-file.
+
+        Raises:
+            IOError: If reading the PDB-file fails.
+        """
+        protein = read_molecule(pdb_file, protein=True)
+        warnings = check_protein(protein)
+        warnings += remove_non_std_residues(protein, None if REMOVE_NON_STD_RESIDUES else 0)
+
+        Chem.clearSSSR(protein)
+        GRAIL.prepareForGRAILDescriptorCalculation(protein, norm_chgs)
+
+        return cls(protein, norm_chgs, warnings)
+
+    @staticmethod
+    def settings(norm_chgs):
+        return {"norm_chgs": norm_chgs, "remove_non_std_residues": REMOVE_NON_STD_RESIDUES, "cdpkit_version": CDPL.__version__}
+
+    def to_data(self):
+        """
+        Returns:
+            dict: A picklable representation of the prepared receptor.
+        """
+        cdf_stream = Base.StringIOStream()
+        cdf_writer = Chem.CDFMolecularGraphWriter(cdf_stream)
+        protein = self.protein
+
+        Chem.setCDFOutputSinglePrecisionFloatsParameter(cdf_writer, False)
+        cdf_writer.write(protein)
+
+        # the CDF-format does not cover the force field and pharmacophore related properties
+        # set by GRAIL.prepareForGRAILDescriptorCalculation() -> store them separately
+        return {
+            "settings": self.settings(self.norm_chgs),
+            "cdf_data": cdf_stream.getbytes(),
+            "mmff94_charges": [ForceField.getMMFF94Charge(atom) for atom in protein.atoms],
+            "mmff94_num_types": [ForceField.getMMFF94NumericType(atom) for atom in protein.atoms],
+            "mmff94_sym_types": [ForceField.getMMFF94SymbolicType(atom) for atom in protein.atoms],
+            "mmff94_bond_type_indices": [ForceField.getMMFF94TypeIndex(bond) for bond in protein.bonds],
+            "hydrophobicities": [MolProp.getHydrophobicity(atom) for atom in protein.atoms],
+            "sybyl_types": [Chem.getSybylType(atom) for atom in protein.atoms],
+        }
+
+    @classmethod
+    def from_data(cls, data):
+        """
+        Restore a receptor from the representation created by to_data.
+
+        Raises:
+            IOError: If the structure data cannot be read.
+        """
+        cdf_stream = Base.StringIOStream()
+        protein = Chem.BasicMolecule()
+
+        cdf_stream.setvalue(data["cdf_data"])
+
+        if not Chem.CDFMoleculeReader(cdf_stream).read(protein):
+            raise IOError("reading prepared receptor data failed")
+
+        for i, atom in enumerate(protein.atoms):
+            ForceField.setMMFF94Charge(atom, data["mmff94_charges"][i])
+            ForceField.setMMFF94NumericType(atom, data["mmff94_num_types"][i])
+            ForceField.setMMFF94SymbolicType(atom, data["mmff94_sym_types"][i])
+            MolProp.setHydrophobicity(atom, data["hydrophobicities"][i])
+            Chem.setSybylType(atom, data["sybyl_types"][i])
+
+        for i, bond in enumerate(protein.bonds):
+            ForceField.setMMFF94TypeIndex(bond, data["mmff94_bond_type_indices"][i])
+
+        return cls(protein, data["settings"]["norm_chgs"])
+
+    def save(self, file_path):
+        """
+        Save the prepared receptor to a file that can be loaded with Receptor.load.
+        """
+        with open(file_path, "wb") as file:
+            file.write(PREP_RECEPTOR_FILE_MAGIC)
+            pickle.dump(self.to_data(), file, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def is_prepared_file(file_path):
+        with open(file_path, "rb") as file:
+            return file.read(len(PREP_RECEPTOR_FILE_MAGIC)) == PREP_RECEPTOR_FILE_MAGIC
+
+    @classmethod
+    def load(cls, file_path, norm_chgs=False):
+        """
+        Load a receptor saved with Receptor.save.
+
+        Raises:
+            ValueError: If the receptor was prepared with different settings.
+        """
+        with open(file_path, "rb") as file:
+            file.read(len(PREP_RECEPTOR_FILE_MAGIC))
+            data = pickle.load(file)
+
+        settings = data["settings"]
+
+        if settings["norm_chgs"] != norm_chgs or settings["remove_non_std_residues"] != REMOVE_NON_STD_RESIDUES:
+            raise ValueError(f"Prepared receptor {os.path.basename(file_path)} was created with different settings {settings}")
+
+        receptor = cls.from_data(data)
+
+        if settings["cdpkit_version"] != CDPL.__version__:
+            receptor.warnings.append(f"prepared receptor was created with CDPKit version {settings['cdpkit_version']}")
+
+        return receptor
+
+    @classmethod
+    def read(cls, file_path, norm_chgs=False):
+        """
+        Load a prepared receptor file or read and prepare a PDB-file.
+        """
+        if cls.is_prepared_file(file_path):
+            return cls.load(file_path, norm_chgs)
+
+        return cls.from_pdb(file_path, norm_chgs)
+
+
+def read_ligand_coordinates(lig_file, norm_chgs=False):
+    """
+    Args:
+        lig_file (str): The ligand file.
+        norm_chgs (bool, optional): Whether charges get normalized during ligand preparation. Defaults to False.
+
+    Yields:
+        numpy.ndarray: The atom coordinates of each molecule in the ligand file after the preparation done by
+            DescriptorEngine, i.e. including the added hydrogens. Molecules whose preparation fails are skipped, since
+            no descriptors get calculated for them.
+    """
+    lig_reader = Chem.MoleculeReader(lig_file)
+
+    Chem.setMultiConfImportParameter(lig_reader, False)
+
+    ligand = Chem.BasicMolecule()
+    coords = Math.Vector3DArray()
+
+    while lig_reader.read(ligand):
+        try:
+            GRAIL.prepareForGRAILDescriptorCalculation(ligand, norm_chgs)
+
+        except Exception:
+            continue
+
+        Chem.get3DCoordinates(ligand, coords)
+
+        yield coords.toArray(False)
+
+
+def get_ligand_atom_positions(lig_file, norm_chgs=False):
+    grid_points = np.empty((0, 3), dtype=np.int64)
+    blocks = []
+
+    # the positions are snapped to a fine grid and deduplicated blockwise, so that memory
+    # consumption is bounded by the volume of the binding site and not by the number of ligands
+    for coords in read_ligand_coordinates(lig_file, norm_chgs):
+        blocks.append(np.round(coords / SITE_GRID_SPACING).astype(np.int64))
+
+        if len(blocks) == 1000:
+            grid_points = np.unique(np.vstack([grid_points] + blocks), axis=0)
+            blocks = []
+
+    grid_points = np.unique(np.vstack([grid_points] + blocks), axis=0)
+
+    return grid_points * SITE_GRID_SPACING
+
+
+def extract_union_environment(protein, lig_file, norm_chgs=False, max_radius=LIG_ENV_MAX_RADIUS):
+    """
+    Extract the binding site spanned by all ligands of a file. The ligands are prepared like in DescriptorEngine, so
+    the site equals the union of the environments extract_ligand_environment() returns for the single ligands,
+    including residues that are only in contact with an added hydrogen.
+
+    Args:
+        protein (Chem.Molecule): The prepared protein.
+        lig_file (str): The ligand file.
+        norm_chgs (bool, optional): Whether charges get normalized during ligand preparation. Has to match the setting
+            of the DescriptorEngine. Defaults to False.
+        max_radius (float, optional): The environment radius. Defaults to LIG_ENV_MAX_RADIUS.
+
+    Returns:
+        Chem.Fragment: The protein residues with an atom within max_radius of any ligand atom, with perceived SSSR.
+    """
+    prot_atom_coords = Math.Vector3DArray()
+
+    Chem.get3DCoordinates(protein, prot_atom_coords)
+
+    prot_atom_coords = prot_atom_coords.toArray(False)
+    lig_atom_positions = get_ligand_atom_positions(lig_file, norm_chgs)
+
+    if len(lig_atom_positions) == 0:
+        raise ValueError('no ligand of %s could be prepared' % lig_file)
+
+    # a residue becomes part of the site if one of its atoms lies within max_radius of
+    # any ligand atom, as done by Biomol.extractEnvironmentResidues() for a single ligand
+    snap_error = 0.5 * np.sqrt(3.0) * SITE_GRID_SPACING
+    dists, _ = scipy.spatial.cKDTree(lig_atom_positions).query(prot_atom_coords, distance_upper_bound=max_radius + snap_error)
+    in_range = dists <= max_radius - snap_error
+    undecided = np.nonzero((dists > max_radius - snap_error) & (dists <= max_radius + snap_error))[0]
+
+    # atoms close to the boundary get decided with the exact ligand atom positions in a second pass
+    if len(undecided) > 0:
+        tree = scipy.spatial.cKDTree(prot_atom_coords[undecided])
+
+        for coords in read_ligand_coordinates(lig_file, norm_chgs):
+            for atom_indices in tree.query_ball_point(coords, max_radius):
+                in_range[undecided[atom_indices]] = True
+
+    lig_env = Chem.Fragment()
+
+    for res in Biomol.ResidueList(protein):
+        for atom in res.atoms:
+            if in_range[protein.getAtomIndex(atom)]:
+                lig_env += res
+                break
+
+    Chem.extractSSSRSubset(protein, lig_env, True)
+
+    return lig_env
+
+
+def extract_residues_environment(protein, res_specs):
+    """
+    Args:
+        protein (Chem.Molecule): The protein.
+        res_specs (str): Comma separated list of CHAIN:NUMBER[INSERTION_CODE] items, e.g. 'A:45,A:46,B:101A'.
+
+    Raises:
+        ValueError: If none of the residues is found.
+
+    Returns:
+        Chem.Fragment: The given residues with perceived SSSR.
+    """
+    res_ids = set()
+
+    for spec in res_specs.split(","):
+        chain, number = spec.strip().split(":")
+        ins_code = number.lstrip("-0123456789")
+
+        res_ids.add((chain, int(number[: len(number) - len(ins_code)]), ins_code))
+
+    lig_env = Chem.Fragment()
+
+    for res in Biomol.ResidueList(protein):
+        atom = res.atoms[0]
+
+        if (Biomol.getChainID(atom), Biomol.getResidueSequenceNumber(atom), Biomol.getResidueInsertionCode(atom)) in res_ids:
+            lig_env += res
+
+    if lig_env.numAtoms == 0:
+        raise ValueError(f"None of the binding site residues {res_specs} found")
+
+    Chem.extractSSSRSubset(protein, lig_env, True)
+
+    return lig_env
+
+
+def extract_reference_environment(protein, ref_lig_file, max_radius=LIG_ENV_MAX_RADIUS):
+    """
+    Raises:
+        IOError: If the file does not contain a ligand.
+
+    Returns:
+        Chem.Fragment: The environment of all reference ligand(s) in the given file.
+    """
+    lig_reader = Chem.MoleculeReader(ref_lig_file)
+    ref_ligand = Chem.BasicMolecule()
+    ref_ligands = Chem.BasicMolecule()
+
+    Chem.setMultiConfImportParameter(lig_reader, False)
+
+    while lig_reader.read(ref_ligand):
+        ref_ligands += ref_ligand
+
+    if ref_ligands.numAtoms == 0:
+        raise IOError(f"Reading reference ligand file {os.path.basename(ref_lig_file)} failed")
+
+    return extract_ligand_environment(ref_ligands, protein, max_radius)
+
+
+def prepare_complex(ligand, protein, norm_chgs, timer, protein_prepared=False, max_radius=LIG_ENV_MAX_RADIUS):
+    """
+    Prepare the ligand and protein of a complex for the descriptor calculation and extract the environment of the ligand.
+
+    Args:
+        ligand (Chem.Molecule): The ligand, which gets prepared.
+        protein (Chem.Molecule): The protein, which gets prepared.
+        norm_chgs (bool): Whether to change the protonation of acidic/basic groups to a state likely at pH7.
+        timer (timing.StageTimer): Records the stages and atom counts.
+        protein_prepared (bool, optional): Whether the protein has already been prepared (with the same norm_chgs
+            setting), e.g. for another ligand. Defaults to False.
+        max_radius (float, optional): The environment radius around the ligand atoms. Defaults to LIG_ENV_MAX_RADIUS.
+
+    Returns:
+        tuple: The environment residues with perceived SSSR (Chem.Fragment) and a list of warnings.
+    """
+    with timer.stage("prepare_ligand"):
+        GRAIL.prepareForGRAILDescriptorCalculation(ligand, norm_chgs)
+
+    if not protein_prepared:
+        with timer.stage("prepare_protein"):
+            GRAIL.prepareForGRAILDescriptorCalculation(protein, norm_chgs)
+
+    timer.count("ligand_atoms", ligand.numAtoms)
+    timer.count("protein_atoms", protein.numAtoms)
+
+    lig_env = Chem.Fragment()
+
+    with timer.stage("extract_environment"):
+        Biomol.extractEnvironmentResidues(ligand, protein, lig_env, Chem.Atom3DCoordinatesFunctor(), max_radius, False)
+
+    with timer.stage("remove_non_std_residues"):
+        warnings = remove_non_std_residues(lig_env, NON_STD_RESIDUE_MAX_ATOM_COUNT if REMOVE_NON_STD_RESIDUES else 0)
+
+    with timer.stage("extract_sssr"):
+        Chem.extractSSSRSubset(protein, lig_env, True)
+
+    timer.count("env_atoms", lig_env.numAtoms)
+
+    return lig_env, warnings
+
+
+class ComplexSource:
+    """
+    Explicitly given ligand-protein complexes.
+
+    Args:
+        complexes (list): ComplexInput items or (name, ligand_file, protein_file) tuples.
+    """
+
+    def __init__(self, complexes):
+        self.complexes = [ComplexInput(*item) for item in complexes]
+
+    def __iter__(self):
+        return iter(self.complexes)
+
+
+def _find_file(file_path):
+    # prefer the uncompressed file, fall back to a gzipped one
+    if not os.path.exists(file_path) and os.path.exists(file_path + ".gz"):
+        return file_path + ".gz"
+
+    return file_path
+
+
+class DirectorySource:
+    """
+    The ligand-protein complexes in the subdirectories of a data directory, in sorted order of the subdirectory names, which
+    also serve as complex names. Ligand and protein files may be gzipped (e.g. <code>_protein.pdb.gz).
+
+    Args:
+        data_dir (str): The directory containing one subdirectory per complex.
+        layout (str, optional): 'pdbbind' (<code>/<code>_ligand.sdf and <code>/<code>_protein.pdb) or 'plrex'
+            (<code>/ligand.sdf and <code>/protein.pdb). Defaults to 'pdbbind'.
+        exclude (set, optional): Names of complexes to skip. Defaults to None.
+    """
+
+    def __init__(self, data_dir, layout="pdbbind", exclude=None):
+        self.data_dir = data_dir
+        self.ligand_pattern, self.protein_pattern = DIRECTORY_LAYOUTS[layout]
+        self.exclude = exclude or set()
+
+    def __iter__(self):
+        for code in sorted(os.listdir(self.data_dir)):
+            comp_data_dir = os.path.join(self.data_dir, code)
+
+            if os.path.isfile(comp_data_dir) or code in self.exclude:
+                continue
+
+            yield ComplexInput(code, _find_file(os.path.join(comp_data_dir, self.ligand_pattern.format(code=code))),
+                               _find_file(os.path.join(comp_data_dir, self.protein_pattern.format(code=code))))
+
+
+ARCHIVE_EXTENSIONS = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz", ".zip")
+
+
+class ArchiveSource:
+    """
+    The ligand-protein complexes in a .tar (optionally compressed) or .zip archive of a data directory. The complexes are
+    named by the directories containing their files, which may be gzipped. The complexes of .zip and uncompressed .tar
+    archives are read in sorted order of their names, as by DirectorySource. Compressed tar archives are read as a
+    stream, in the order of the archive members (create them with e.g. 'tar --sort=name' for the order of
+    DirectorySource); only the ligand and protein files of complexes whose files have not all been read yet are held in
+    memory, which for archives of directory trees are those of a single complex.
+
+    Args:
+        archive_path (str): The path of the archive.
+        layout (str, optional): The file naming within the complex directories (see DirectorySource). Defaults to 'pdbbind'.
+        exclude (set, optional): Names of complexes to skip. Defaults to None.
+    """
+
+    def __init__(self, archive_path, layout="pdbbind", exclude=None):
+        self.archive_path = archive_path
+        self.ligand_pattern, self.protein_pattern = DIRECTORY_LAYOUTS[layout]
+        self.exclude = exclude or set()
+
+    @staticmethod
+    def is_archive(path):
+        return os.path.isfile(path) and path.lower().endswith(ARCHIVE_EXTENSIONS)
+
+    @staticmethod
+    def _member_order(name):
+        # sorted by complex name (the name of the directory containing the file), as DirectorySource
+        return posixpath.basename(posixpath.dirname(name)), name
+
+    def _members(self):
+        # yields (member name, function returning the member contents), the contents have to be read before the next member
+        if self.archive_path.lower().endswith(".zip"):
+            with zipfile.ZipFile(self.archive_path) as archive:
+                infos = [info for info in archive.infolist() if not info.is_dir()]
+
+                for info in sorted(infos, key=lambda info: self._member_order(info.filename)):
+                    yield info.filename, lambda: archive.read(info)
+        elif self.archive_path.lower().endswith(".tar"):
+            # the headers of uncompressed tar archives are read by seeking over the member contents
+            with tarfile.open(self.archive_path, "r:") as archive:
+                members = [member for member in archive.getmembers() if member.isfile()]
+
+                for member in sorted(members, key=lambda member: self._member_order(member.name)):
+                    yield member.name, lambda: archive.extractfile(member).read()
+        else:
+            with tarfile.open(self.archive_path, "r|*") as archive:
+                for member in archive:
+                    if member.isfile():
+                        yield member.name, lambda: archive.extractfile(member).read()
+
+    def __iter__(self):
+        pending = {}
+
+        for member_name, read in self._members():
+            dir_name, file_name = posixpath.split(member_name)
+            code = posixpath.basename(dir_name)
+
+            if not code or code in self.exclude:
+                continue
+
+            base_name = file_name[:-3] if file_name.endswith(".gz") else file_name
+
+            if base_name == self.ligand_pattern.format(code=code):
+                index = 0
+            elif base_name == self.protein_pattern.format(code=code):
+                index = 1
+            else:
+                continue
+
+            data = read()
+
+            if file_name.endswith(".gz"):
+                data = gzip.decompress(data)
+
+            entry = pending.setdefault(dir_name, [posixpath.join(dir_name, self.ligand_pattern.format(code=code)),
+                                                  posixpath.join(dir_name, self.protein_pattern.format(code=code)), None, None])
+            entry[index] = member_name
+            entry[index + 2] = data
+
+            if entry[2] is not None and entry[3] is not None:
+                del pending[dir_name]
+                yield self._complex(code, entry)
+
+        # complexes with missing files fail when processed
+        for dir_name, entry in pending.items():
+            yield self._complex(posixpath.basename(dir_name), entry)
+
+    def _complex(self, code, entry):
+        lig_file, prot_file, lig_data, prot_data = entry
+
+        return ComplexInput(code, f"{self.archive_path}:{lig_file}", f"{self.archive_path}:{prot_file}", (lig_data, prot_data))
+
+
+def open_complex_source(path, layout="pdbbind", exclude=None):
+    """
+    Returns:
+        DirectorySource or ArchiveSource: The complexes of a data directory or archive.
+    """
+    if ArchiveSource.is_archive(path):
+        return ArchiveSource(path, layout, exclude)
+
+    return DirectorySource(path, layout, exclude)
+
+
+class LibrarySource:
+    """
+    The ligands of a file (e.g. a screening library or docking poses), all in complex with the same receptor.
+
+    Args:
+        receptor (Receptor): The prepared receptor.
+        lig_file (str): The ligand file. Parallel processing requires an SD-file.
+        site_env (Chem.Fragment, optional): A binding site used for all ligands instead of the individual ligand
+            environments (see extract_union_environment, extract_residues_environment, extract_reference_environment).
+            Defaults to None.
+        poses (bool, optional): Whether consecutive records of the same ligand are poses, which are rescored with one ligand
+            preparation (see PoseRescorer). Results are named <NAME>_<POSE>. Defaults to False.
+    """
+
+    def __init__(self, receptor, lig_file, site_env=None, poses=False):
+        self.receptor = receptor
+        self.lig_file = lig_file
+        self.site_env = site_env
+        self.poses = poses
+
+
+def get_ligand_name(ligand, lig_idx):
+    name = Chem.getName(ligand)
+
+    if not name:
+        name = str(lig_idx)
+
+    return name
+
+
+# engine of a worker process of a pool (see _init_complex_worker() and _init_library_worker())
+_worker_engine = None
+_worker_state = None
+
+
+def _init_complex_worker(engine_class, settings):
+    global _worker_engine
+
+    _worker_engine = engine_class(**settings)
+
+
+def _process_complex_task(item):
+    return _worker_engine.process_complex(item)
+
+
+def _process_group_task(task):
+    return _worker_engine.process_group(*task)
+
+
+def _init_library_worker(settings, rec_data, site_env_indices, lig_file):
+    global _worker_engine, _worker_state
+
+    _worker_engine = DescriptorEngine(**settings)
+    protein = Receptor.from_data(rec_data).protein
+    site_env = None
+
+    if site_env_indices is not None:
+        site_env = create_fragment(protein, *site_env_indices)
+        _worker_engine.descr_calc.initTargetData(site_env, Chem.Atom3DCoordinatesFunctor())
+
+    _worker_state = (protein, site_env, lig_file)
+
+
+def _process_library_task(task):
+    start, offsets = task
+    protein, site_env, lig_file = _worker_state
+    results = []
+
+    for i, record in enumerate(read_sdf_records(lig_file, offsets, 0, len(offsets) - 1)):
+        lig_idx = start + i + 1
+        stream = Base.StringIOStream()
+        lig_reader = Chem.SDFMoleculeReader(stream)
+        ligand = Chem.BasicMolecule()
+
+        stream.setvalue(record)
+        Chem.setMultiConfImportParameter(lig_reader, False)
+
+        try:
+            if not lig_reader.read(ligand):
+                raise IOError(f"reading ligand record {lig_idx} failed")
+
+        except Exception as e:
+            results.append(Result(str(lig_idx), None, str(e), [], None))
+            continue
+
+        results.append(_worker_engine.process_ligand(ligand, lig_idx, protein, site_env))
+
+    return results
+
+
+class DescriptorEngine:
+    """
+    Calculates GRADE/X-GRADE descriptors for the complexes of a ComplexSource or DirectorySource, or the ligands of a
+    LibrarySource, optionally in parallel and with a descriptor cache.
+
+    Args:
+        ext_descr (bool, optional): Whether to calculate X-GRADE instead of GRADE. Defaults to False.
+        norm_chgs (bool, optional): Whether to change the protonation of acidic/basic groups to a state likely at pH7.
+            Defaults to False.
+        num_jobs (int, optional): The number of worker processes. Defaults to 1.
+        chunk_size (int, optional): The number of consecutive library ligands processed by a worker process at once.
+            Defaults to 100.
+        cache (cache.DescriptorCache, optional): A cache of the complex descriptors. Defaults to None.
+        prefetch (int, optional): The number of complexes whose files are read ahead by reader threads while the current
+            complex is processed (single process only), or 0 to read the files on demand. Defaults to 0.
+        io_threads (int, optional): The number of reader threads used with prefetch. Defaults to 2.
+        group_receptors (bool, optional): Whether complexes with identical protein structure (see get_receptor_key()) are
+            processed together, preparing the protein only once per group (and worker). The complexes are grouped within
+            windows of group_window consecutive complexes, whose files are held in memory until they are processed. The
+            results of a window are delivered group by group, in the order of the first complex of each group, so the
+            result order differs from the input order; prefetch is not used. Defaults to False.
+        group_window (int, optional): The number of consecutive complexes grouped at once with group_receptors. Defaults
+            to RECEPTOR_GROUP_WINDOW.
+        env_radius (float, optional): The radius around the ligand atoms within which protein residues form the ligand
+            environment. Smaller radii change RADIUS_DEPENDENT_ELEMENTS, which have no distance cutoff (see
+            scripts/bench_env_radius.py). Does not apply to precomputed binding sites. Defaults to LIG_ENV_MAX_RADIUS.
+    """
+
+    def __init__(self, ext_descr=False, norm_chgs=False, num_jobs=1, chunk_size=100, cache=None, prefetch=0, io_threads=2,
+                 group_receptors=False, env_radius=LIG_ENV_MAX_RADIUS, group_window=RECEPTOR_GROUP_WINDOW):
+        self.ext_descr = ext_descr
+        self.norm_chgs = norm_chgs
+        self.env_radius = env_radius
+        self.num_jobs = num_jobs
+        self.chunk_size = chunk_size
+        self.cache = cache
+        self.prefetch = prefetch
+        self.io_threads = io_threads
+        self.prefetcher = None
+        self.group_receptors = group_receptors
+        self.group_window = group_window
+        self.group_stats = None
+        self.receptors = OrderedDict()
+        self.descr_calc = create_descriptor_calculator(ext_descr)
+
+    @property
+    def names(self):
+        """
+        list: The names of the descriptor elements.
+        """
+        return list(self.descr_calc.ElementIndex.names.keys())
+
+    def _worker_settings(self):
+        return {"ext_descr": self.ext_descr, "norm_chgs": self.norm_chgs, "env_radius": self.env_radius}
+
+    def cache_key(self, item, contents=None):
+        """
+        Args:
+            item (ComplexInput): The complex.
+            contents (tuple, optional): The already loaded file contents of the complex. Defaults to None.
+
+        Returns:
+            str: The descriptor cache key of a complex.
+        """
+        return hash_contents(
+            load_complex_files(item) if contents is None else contents,
+            descr_calc=type(self.descr_calc).__name__,
+            norm_chgs=self.norm_chgs,
+            lig_env_max_radius=self.env_radius,
+            remove_non_std_residues=REMOVE_NON_STD_RESIDUES,
+            non_std_residue_max_atom_count=NON_STD_RESIDUE_MAX_ATOM_COUNT,
+            cdpkit_version=CDPL.__version__,
+        )
+
+    def calculate_descriptors(self, ligand, lig_env, timer):
+        """
+        Calculate the descriptors of a prepared ligand in a target environment.
+
+        Args:
+            ligand (Chem.Molecule): The prepared ligand.
+            lig_env (Chem.Fragment or None): The environment residues with perceived SSSR, or None if the target data have
+                already been initialized.
+            timer (timing.StageTimer): Records the stages.
+
+        Returns:
+            numpy.ndarray: The descriptor vector.
+        """
+        descr = Math.DVector()
+        lig_atom_coords = Math.Vector3DArray()
+
+        Chem.get3DCoordinates(ligand, lig_atom_coords)
+
+        if lig_env is not None:
+            with timer.stage("init_target_data"):
+                self.descr_calc.initTargetData(lig_env, Chem.Atom3DCoordinatesFunctor())
+
+        with timer.stage("init_ligand_data"):
+            self.descr_calc.initLigandData(ligand)
+
+        with timer.stage("calculate"):
+            self.descr_calc.calculate(lig_atom_coords, descr)
+
+        return descr.toArray()
+
+    def calculate_complex(self, ligand, protein, timer=None):
+        """
+        Calculate the descriptors of a complex.
+
+        Args:
+            ligand (Chem.Molecule): The ligand, which gets prepared.
+            protein (Chem.Molecule): The protein, which gets prepared.
+            timer (timing.StageTimer, optional): Records the stages and atom counts of the current item. Defaults to None.
+
+        Returns:
+            tuple: The descriptor vector (numpy.ndarray) and a list of warnings.
+        """
+        if timer is None:
+            timer = StageTimer()
+            timer.begin("")
+
+        with timer.stage("check_protein"):
+            warnings = check_protein(protein)
+
+        lig_env, env_warnings = prepare_complex(ligand, protein, self.norm_chgs, timer, max_radius=self.env_radius)
+
+        return self.calculate_descriptors(ligand, lig_env, timer), warnings + env_warnings
+
+    def process_complex(self, item, data=None):
+        """
+        Read a complex and calculate its descriptors. Exceptions are reported in the result.
+
+        Args:
+            item (ComplexInput): The complex.
+            data (tuple, optional): The already loaded contents of the ligand and protein file (see load_complex_files()),
+                which are then only parsed. Defaults to None, which means the data of the item or its files.
+
+        Returns:
+            Result: The result.
+        """
+        timer = StageTimer()
+        timer.begin(item.name)
+
+        try:
+            ligand, protein = self._read_complex(item, data, timer)
+            descr, warnings = self.calculate_complex(ligand, protein, timer)
+
+        except Exception as e:
+            timer.fail(type(e).__name__)
+            return Result(item.name, None, str(e), [], timer.end())
+
+        return Result(item.name, descr, None, warnings, timer.end())
+
+    def _read_complex(self, item, data, timer):
+        with timer.stage("read_ligand"):
+            if data is None and item.data is not None:
+                data = load_complex_files(item)
+
+            ligand = read_complex_molecule(item.ligand_file, None if data is None else data[0])
+
+        with timer.stage("read_protein"):
+            protein = read_complex_molecule(item.protein_file, None if data is None else data[1], protein=True)
+
+        return ligand, protein
+
+    def _lookup(self, item):
+        if self.cache is None:
+            return (None, None)
+
+        try:
+            key = self.cache_key(item)
+
+        except OSError:  # missing input files -> will be reported by the calculation
+            return (None, None)
+
+        return (key, self.cache.get(key))
+
+    def _store(self, key, result):
+        if result.descriptors is not None:
+            self.cache.put(key, result.descriptors.tolist())
+
+    def _cached_result(self, item, descr):
+        timer = StageTimer()
+        timer.begin(item.name)
+
+        return Result(item.name, np.asarray(descr), None, [], timer.end("cached"))
+
+    def _run_complexes(self, source):
+        # the source is consumed lazily, so that complexes streamed from an archive are not all held in memory
+        entries = ((item,) + self._lookup(item) for item in source)
+
+        if self.group_receptors:
+            results = self._run_receptor_groups(entries)
+        elif self.num_jobs > 1:
+            results = self._run_complexes_parallel(entries)
+        elif self.prefetch > 0:
+            results = self._prefetch_complexes(entries)
+        else:
+            results = ((None, self._cached_result(item, cached_descr)) if cached_descr is not None else (key, self.process_complex(item))
+                       for item, key, cached_descr in entries)
+
+        for key, result in results:
+            if key is not None:
+                self._store(key, result)
+
+            yield result
+
+    def _run_complexes_parallel(self, entries):
+        pending = deque()
+        max_pending = MAX_PENDING_TASKS_PER_JOB * self.num_jobs
+
+        def next_result():
+            key, result = pending.popleft()
+
+            return (key, result) if isinstance(result, Result) else (key, result.get())
+
+        # results are delivered in input order, so that the order of the results does not depend
+        # on the number of worker processes
+        with multiprocessing.Pool(self.num_jobs, _init_complex_worker, (type(self), self._worker_settings())) as pool:
+            for item, key, cached_descr in entries:
+                if cached_descr is not None:
+                    pending.append((None, self._cached_result(item, cached_descr)))
+                else:
+                    pending.append((key, pool.apply_async(_process_complex_task, (item,))))
+
+                while len(pending) >= max_pending or (pending and (isinstance(pending[0][1], Result) or pending[0][1].ready())):
+                    yield next_result()
+
+            while pending:
+                yield next_result()
+
+    def _prefetch_complexes(self, entries):
+        def load(entry):
+            item, key, cached_descr = entry
+
+            return None if cached_descr is not None else load_complex_files(item)
+
+        # reader threads only load the file contents: parsing keeps the interpreter lock held
+        # and would not run concurrently with the descriptor calculation
+        self.prefetcher = Prefetcher(entries, load, self.io_threads, self.prefetch)
+
+        for (item, key, cached_descr), data, wait_time in self.prefetcher:
+            if cached_descr is not None:
+                yield None, self._cached_result(item, cached_descr)
+                continue
+
+            if isinstance(data, Exception):  # let the file readers report the error
+                result = self.process_complex(item)
+            else:
+                result = self.process_complex(item, data)
+
+            result.record["stages"]["wait_input"] = wait_time
+            result.record["total"] += wait_time
+
+            yield key, result
+
+    def _get_receptor(self, receptor_key, item, data, timer):
+        # the prepared proteins of the last MAX_PREPARED_RECEPTORS groups are kept
+        if receptor_key in self.receptors:
+            self.receptors.move_to_end(receptor_key)
+            timer.count("receptor_reused", 1)
+
+            return self.receptors[receptor_key]
+
+        with timer.stage("read_protein"):
+            protein = read_complex_molecule(item.protein_file, None if data is None else data[1], protein=True)
+
+        with timer.stage("check_protein"):
+            warnings = check_protein(protein)
+
+        with timer.stage("prepare_protein"):
+            GRAIL.prepareForGRAILDescriptorCalculation(protein, self.norm_chgs)
+
+        self.receptors[receptor_key] = (protein, warnings)
+
+        while len(self.receptors) > MAX_PREPARED_RECEPTORS:
+            self.receptors.popitem(last=False)
+
+        return protein, warnings
+
+    def process_group(self, receptor_key, items):
+        """
+        Read complexes sharing the same protein structure and calculate their descriptors. The protein is read and
+        prepared only for the first complex (if not kept from a previous group). Exceptions are reported in the results.
+
+        Args:
+            receptor_key (str): The key of the protein structure (see get_receptor_key()).
+            items (list): The complexes (ComplexInput).
+
+        Returns:
+            list: The results.
+        """
+        results = []
+
+        for item in items:
+            timer = StageTimer()
+            timer.begin(item.name)
+
+            try:
+                data = None if item.data is None else load_complex_files(item)
+                protein, warnings = self._get_receptor(receptor_key, item, data, timer)
+
+                with timer.stage("read_ligand"):
+                    ligand = read_complex_molecule(item.ligand_file, None if data is None else data[0])
+
+                lig_env, env_warnings = prepare_complex(ligand, protein, self.norm_chgs, timer, protein_prepared=True,
+                                                        max_radius=self.env_radius)
+                descr = self.calculate_descriptors(ligand, lig_env, timer)
+
+            except Exception as e:
+                timer.fail(type(e).__name__)
+                results.append(Result(item.name, None, str(e), [], timer.end()))
+                continue
+
+            results.append(Result(item.name, descr, None, warnings + env_warnings, timer.end()))
+
+        return results
+
+    def _run_receptor_groups(self, entries):
+        self.group_stats = {"complexes": 0, "receptors": 0, "preparations": 0, "preparation_time": 0.0}
+        receptor_keys = set()
+        groups = OrderedDict()
+        num_grouped = 0
+        pool = None
+
+        if self.num_jobs > 1:
+            pool = multiprocessing.Pool(self.num_jobs, _init_complex_worker, (type(self), self._worker_settings()))
+
+        try:
+            # the files are read once: the complexes carry their contents to process_group()
+            for item, key, cached_descr in entries:
+                if cached_descr is not None:
+                    yield None, self._cached_result(item, cached_descr)
+                    continue
+
+                try:
+                    data = load_complex_files(item)
+
+                except OSError:  # missing input files -> reported by the calculation
+                    yield key, self.process_complex(item)
+                    continue
+
+                receptor_key = get_receptor_key(data[1])
+                receptor_keys.add(receptor_key)
+                groups.setdefault(receptor_key, []).append((item._replace(data=data), key))
+                num_grouped += 1
+
+                if num_grouped >= self.group_window:
+                    yield from self._run_group_window(groups, pool)
+
+                    groups = OrderedDict()
+                    num_grouped = 0
+
+            yield from self._run_group_window(groups, pool)
+
+        finally:
+            if pool is not None:
+                pool.terminate()
+
+            self.group_stats["receptors"] = len(receptor_keys)
+
+    def _run_group_window(self, groups, pool):
+        # groups in the order of their first complex; large groups are split, so that they can be distributed over
+        # several workers
+        tasks = [(receptor_key, group[i : i + self.chunk_size]) for receptor_key, group in groups.items() for i in range(0, len(group), self.chunk_size)]
+        group_tasks = [(receptor_key, [item for item, key in task]) for receptor_key, task in tasks]
+
+        if pool is not None:
+            group_results = pool.imap(_process_group_task, group_tasks)
+        else:
+            group_results = (self.process_group(*task) for task in group_tasks)
+
+        for (receptor_key, task), results in zip(tasks, group_results):
+            for (item, key), result in zip(task, results):
+                self.group_stats["complexes"] += 1
+                self._count_preparation(result.record)
+                yield key, result
+
+    def _count_preparation(self, record):
+        if "receptor_reused" in record["counts"] or "read_protein" not in record["stages"]:
+            return
+
+        self.group_stats["preparations"] += 1
+        self.group_stats["preparation_time"] += sum(record["stages"].get(stage, 0.0) for stage in ("read_protein", "check_protein", "prepare_protein"))
+
+    def grouping_report(self):
+        """
+        Returns:
+            str: A summary of the receptor preparations saved by group_receptors, or None if no grouped run took place.
+        """
+        stats = self.group_stats
+
+        if stats is None:
+            return None
+
+        num_saved = stats["complexes"] - stats["preparations"]
+        mean_time = stats["preparation_time"] / stats["preparations"] if stats["preparations"] > 0 else 0.0
+
+        return (
+            f"Receptor grouping: {stats['complexes']} complexes, {stats['receptors']} distinct receptors, "
+            f"{stats['preparations']} receptor preparations ({stats['preparation_time']:.2f} s, {mean_time:.2f} s each), "
+            f"{num_saved} saved (~{num_saved * mean_time:.2f} s)"
+        )
+
+    def process_ligand(self, ligand, lig_idx, protein, site_env=None):
+        """
+        Calculate the descriptors of a ligand in complex with a prepared protein. Exceptions are reported in the result.
+
+        Args:
+            ligand (Chem.Molecule): The ligand, which gets prepared.
+            lig_idx (int): The position of the ligand in the input, which names unnamed ligands.
+            protein (Chem.Molecule): The prepared protein.
+            site_env (Chem.Fragment, optional): The binding site, for which the target data have already been initialized.
+                Defaults to None.
+
+        Returns:
+            Result: The result.
+        """
+        name = get_ligand_name(ligand, lig_idx)
+        timer = StageTimer()
+        timer.begin(name)
+
+        try:
+            with timer.stage("prepare_ligand"):
+                GRAIL.prepareForGRAILDescriptorCalculation(ligand, self.norm_chgs)
+
+            timer.count("ligand_atoms", ligand.numAtoms)
+
+            lig_env = None
+
+            # with a precomputed binding site the target data have already been initialized once for all ligands
+            if site_env is None:
+                with timer.stage("extract_environment"):
+                    lig_env = extract_ligand_environment(ligand, protein, self.env_radius)
+
+                timer.count("env_atoms", lig_env.numAtoms)
+
+            descr = self.calculate_descriptors(ligand, lig_env, timer)
+
+        except Exception as e:
+            timer.fail(type(e).__name__)
+            return Result(name, None, str(e), [], timer.end())
+
+        return Result(name, descr, None, [], timer.end())
+
+    def _run_library(self, source):
+        protein = source.receptor.protein
+
+        if source.poses:
+            yield from self._run_poses(source)
+            return
+
+        if self.num_jobs > 1:
+            yield from self._run_library_parallel(source)
+            return
+
+        if source.site_env is not None:
+            self.descr_calc.initTargetData(source.site_env, Chem.Atom3DCoordinatesFunctor())
+
+        lig_reader = Chem.MoleculeReader(source.lig_file)
+        ligand = Chem.BasicMolecule()
+        lig_idx = 0
+
+        Chem.setMultiConfImportParameter(lig_reader, False)
+
+        # unnamed ligands are identified by their position in the ligand file
+        while lig_reader.read(ligand):
+            lig_idx += 1
+
+            yield self.process_ligand(ligand, lig_idx, protein, source.site_env)
+
+    def _run_library_parallel(self, source):
+        offsets = load_sdf_index(source.lig_file)
+        num_ligs = len(offsets) - 1
+
+        # every task covers a contiguous range of records; the results are delivered in
+        # task order, so that they are in input order regardless of the number of workers
+        tasks = [(start, offsets[start : min(start + self.chunk_size, num_ligs) + 1]) for start in range(0, num_ligs, self.chunk_size)]
+        site_env_indices = None if source.site_env is None else get_fragment_indices(source.site_env, source.receptor.protein)
+        init_args = (self._worker_settings(), source.receptor.to_data(), site_env_indices, source.lig_file)
+
+        with multiprocessing.Pool(self.num_jobs, _init_library_worker, init_args) as pool:
+            for results in pool.imap(_process_library_task, tasks):
+                yield from results
+
+    def _run_poses(self, source):
+        rescorer = PoseRescorer(source.receptor.protein, self.ext_descr, self.norm_chgs, env_radius=self.env_radius)
+        rescorer.set_binding_site(source.site_env)
+
+        lig_reader = Chem.MoleculeReader(source.lig_file)
+        ligand = Chem.BasicMolecule()
+        lig_idx = 0
+
+        Chem.setMultiConfImportParameter(lig_reader, True)
+
+        while lig_reader.read(ligand):
+            lig_idx += 1
+            name = get_ligand_name(ligand, lig_idx)
+
+            try:
+                descriptors = rescorer.score(ligand)
+
+            except Exception as e:
+                yield Result(name, None, str(e), [], None)
+                continue
+
+            for i, descr in enumerate(descriptors, 1):
+                yield Result(f"{name}_{i}", descr, None, [], None)
+
+    def run(self, source, timer=None):
+        """
+        Calculate the descriptors of all complexes or ligands of a source.
+
+        Args:
+            source (ComplexSource, DirectorySource or LibrarySource): The input.
+            timer (timing.StageTimer, optional): Collects the per-item stage timing records. Defaults to None.
+
+        Yields:
+            Result: The results, in input order.
+        """
+        if isinstance(source, LibrarySource):
+            results = self._run_library(source)
+        else:
+            results = self._run_complexes(source)
+
+        for result in results:
+            if timer is not None and result.record is not None:
+                timer.add(result.record)
+
+            yield result
+
+    def calculate(self, source, as_frame=True, id_name="Name"):
+        """
+        Calculate the descriptors of all complexes or ligands of a source in memory. Failed inputs are left out.
+
+        Args:
+            source (ComplexSource, DirectorySource or LibrarySource): The input.
+            as_frame (bool, optional): Whether to return a DataFrame. Defaults to True.
+            id_name (str, optional): The name of the identifier column of the DataFrame. Defaults to 'Name'.
+
+        Returns:
+            pandas.DataFrame or tuple: The DataFrame with identifier and descriptor columns, or the list of names, the
+                descriptor matrix of shape (n, TOTAL_DESCRIPTOR_SIZE) and a dict of the errors of the failed inputs.
+        """
+        names = []
+        rows = []
+        errors = {}
+
+        for result in self.run(source):
+            if result.error is not None:
+                errors[result.name] = result.error
+                continue
+
+            names.append(result.name)
+            rows.append(result.descriptors)
+
+        descriptors = np.array(rows).reshape(len(rows), len(self.names))
+
+        if not as_frame:
+            return names, descriptors, errors
+
+        frame = pd.DataFrame(descriptors, columns=self.names)
+        frame.insert(0, id_name, names)
+
+        return frame
+
+
+VARIANTS = {
+    "GRADE": (False, False),
+    "X-GRADE": (True, False),
+    "GRADE_charged": (False, True),
+    "X-GRADE_charged": (True, True),
+}
+"""The descriptor variants of MultiVariantEngine with their ext_descr and norm_chgs settings."""
+
+
+class MultiVariantEngine(DescriptorEngine):
+    """
+    Calculates several descriptor variants (see VARIANTS) of the complexes of a ComplexSource, DirectorySource or
+    ArchiveSource in a single pass. Every complex is read once and prepared once per protonation setting; GRADE and
+    X-GRADE share the prepared structures and the ligand environment. The descriptors of a Result are a dict mapping the
+    variant names to the descriptor vectors. Variants that could not be calculated are missing in the dict and the error
+    of the result is set.
+
+    Args:
+        variants (list): The names of the variants.
+        num_jobs (int, optional): The number of worker processes. Defaults to 1.
+        cache (cache.DescriptorCache, optional): A cache of the complex descriptors, shared with single variant
+            DescriptorEngines. Defaults to None.
+        prefetch (int, optional): See DescriptorEngine. Defaults to 0.
+        io_threads (int, optional): See DescriptorEngine. Defaults to 2.
+        env_radius (float, optional): See DescriptorEngine. Defaults to LIG_ENV_MAX_RADIUS.
+
+    Raises:
+        ValueError: If a variant is unknown.
+    """
+
+    def __init__(self, variants, num_jobs=1, cache=None, prefetch=0, io_threads=2, env_radius=LIG_ENV_MAX_RADIUS):
+        for variant in variants:
+            if variant not in VARIANTS:
+                raise ValueError(f"Unknown descriptor variant '{variant}'")
+
+        super().__init__(num_jobs=num_jobs, cache=cache, prefetch=prefetch, io_threads=io_threads, env_radius=env_radius)
+
+        self.variants = list(variants)
+        self.engines = {variant: DescriptorEngine(*VARIANTS[variant], env_radius=env_radius) for variant in self.variants}
+
+    @property
+    def names(self):
+        """
+        dict: The names of the descriptor elements of each variant.
+        """
+        return {variant: engine.names for variant, engine in self.engines.items()}
+
+    def _worker_settings(self):
+        return {"variants": self.variants, "env_radius": self.env_radius}
+
+    def cache_key(self, item, contents=None):
+        """
+        Returns:
+            dict: The descriptor cache keys of the variants of a complex.
+        """
+        if contents is None:
+            contents = load_complex_files(item)
+
+        return {variant: engine.cache_key(item, contents) for variant, engine in self.engines.items()}
+
+    def process_complex(self, item, data=None):
+        """
+        Read a complex and calculate its descriptor variants. Exceptions are reported in the result.
+
+        Args:
+            item (ComplexInput): The complex.
+            data (tuple, optional): See DescriptorEngine.process_complex(). Defaults to None.
+
+        Returns:
+            Result: The result.
+        """
+        timer = StageTimer()
+        timer.begin(item.name)
+
+        try:
+            ligand, protein = self._read_complex(item, data, timer)
+
+            with timer.stage("check_protein"):
+                warnings = check_protein(protein)
+
+        except Exception as e:
+            timer.fail(type(e).__name__)
+            return Result(item.name, {}, str(e), [], timer.end())
+
+        norm_chgs_settings = sorted({VARIANTS[variant][1] for variant in self.variants})
+        descriptors = {}
+        errors = []
+
+        for i, norm_chgs in enumerate(norm_chgs_settings):
+            # preparation modifies the structures: all but the last setting work on copies
+            if i < len(norm_chgs_settings) - 1:
+                lig, prot = Chem.BasicMolecule(ligand), Chem.BasicMolecule(protein)
+            else:
+                lig, prot = ligand, protein
+
+            try:
+                lig_env, env_warnings = prepare_complex(lig, prot, norm_chgs, timer, max_radius=self.env_radius)
+                warnings += [warning for warning in env_warnings if warning not in warnings]
+
+                for variant in self.variants:
+                    if VARIANTS[variant][1] == norm_chgs:
+                        descriptors[variant] = self.engines[variant].calculate_descriptors(lig, lig_env, timer)
+
+            except Exception as e:
+                timer.fail(type(e).__name__)
+                errors.append(str(e))
+
+        return Result(item.name, descriptors, "; ".join(errors) if errors else None, warnings, timer.end())
+
+    def _lookup(self, item):
+        if self.cache is None:
+            return (None, None)
+
+        try:
+            keys = self.cache_key(item)
+
+        except OSError:
+            return (None, None)
+
+        cached = {variant: self.cache.get(key) for variant, key in keys.items()}
+
+        # a complex is only taken from the cache if all its variants are cached
+        if any(descr is None for descr in cached.values()):
+            return (keys, None)
+
+        return (keys, cached)
+
+    def _store(self, keys, result):
+        for variant, descr in result.descriptors.items():
+            self.cache.put(keys[variant], descr.tolist())
+
+    def _cached_result(self, item, cached):
+        timer = StageTimer()
+        timer.begin(item.name)
+
+        return Result(item.name, {variant: np.asarray(descr) for variant, descr in cached.items()}, None, [], timer.end("cached"))
+
+    def _run_library(self, source):
+        raise ValueError("Descriptor variants can only be calculated for complexes")
+
+    def calculate(self, source, as_frame=True, id_name="Name"):
+        """
+        Calculate the descriptor variants of all complexes of a source in memory. Complexes are left out of the variants
+        that could not be calculated.
+
+        Args:
+            source (ComplexSource, DirectorySource or ArchiveSource): The input.
+            as_frame (bool, optional): Whether to return DataFrames. Defaults to True.
+            id_name (str, optional): The name of the identifier column of the DataFrames. Defaults to 'Name'.
+
+        Returns:
+            dict: The DataFrame (or the tuple of DescriptorEngine.calculate()) of each variant.
+        """
+        names = {variant: [] for variant in self.variants}
+        rows = {variant: [] for variant in self.variants}
+        errors = {variant: {} for variant in self.variants}
+
+        for result in self.run(source):
+            for variant in self.variants:
+                if variant in result.descriptors:
+                    names[variant].append(result.name)
+                    rows[variant].append(result.descriptors[variant])
+                else:
+                    errors[variant][result.name] = result.error
+
+        tables = {}
+
+        for variant, engine in self.engines.items():
+            descriptors = np.array(rows[variant]).reshape(len(rows[variant]), len(engine.names))
+
+            if as_frame:
+                tables[variant] = pd.DataFrame(descriptors, columns=engine.names)
+                tables[variant].insert(0, id_name, names[variant])
+            else:
+                tables[variant] = (names[variant], descriptors, errors[variant])
+
+        return tables
+
+
+def get_pose_coordinates(ligand):
+    """
+    Get the atom coordinates of all poses of a ligand.
+
+    Args:
+        ligand (Chem.Molecule): The ligand. Poses are read from its conformations (e.g. after a multi-conformer import
+            of docking results) or, if it has none, from its 3D coordinates.
+
+    Returns:
+        numpy.ndarray: The coordinates of shape (n_poses, n_atoms, 3).
+    """
+    num_confs = Chem.getNumConformations(ligand)
+    coords = Math.Vector3DArray()
+
+    if num_confs == 0:
+        Chem.get3DCoordinates(ligand, coords)
+        return coords.toArray(False)[np.newaxis]
+
+    poses = np.empty((num_confs, ligand.numAtoms, 3))
+
+    for i in range(num_confs):
+        Chem.getConformation(ligand, i, coords)
+        poses[i] = coords.toArray(False)
+
+    return poses
+
+
+def extract_pose_environment(protein, ligand, poses, max_radius=LIG_ENV_MAX_RADIUS):
+    """
+    Extract the union of the environment residues of all poses of a ligand.
+
+    Args:
+        protein (Chem.Molecule): The prepared receptor.
+        ligand (Chem.Molecule): The ligand.
+        poses (numpy.ndarray): The pose coordinates of shape (n_poses, n_atoms, 3).
+        max_radius (float, optional): The environment radius around the ligand atoms. Defaults to LIG_ENV_MAX_RADIUS.
+
+    Returns:
+        Chem.Fragment: The environment residues with perceived SSSR.
+    """
+    pose = Chem.BasicMolecule(ligand)
+    lig_env = Chem.Fragment()
+
+    for coords in poses:
+        Chem.set3DCoordinates(pose, Math.Vector3DArray(coords))
+        Biomol.extractEnvironmentResidues(pose, protein, lig_env, Chem.Atom3DCoordinatesFunctor(), max_radius, True)
+
+    Chem.extractSSSRSubset(protein, lig_env, True)
+
+    return lig_env
+
+
+class PoseRescorer:
+    """
+    Calculate GRADE/X-GRADE descriptors for many poses of ligands in one receptor.
+
+    The target data are initialized once per ligand (or only once if a binding site is set) and the ligand data once per
+    ligand. For every pose only the descriptor calculation from the pose coordinates remains.
+
+    Args:
+        protein (Chem.Molecule): The receptor, prepared with GRAIL.prepareForGRAILDescriptorCalculation.
+        ext_descr (bool, optional): Whether to calculate X-GRADE instead of GRADE. Defaults to False.
+        norm_chgs (bool, optional): Whether to change the protonation of acidic/basic groups of the ligands to a state
+            likely at pH7. Should match the preparation of the receptor. Defaults to False.
+        env_radius (float, optional): The radius around the pose atoms within which protein residues form the ligand
+            environment if no binding site is set (see DescriptorEngine). Defaults to LIG_ENV_MAX_RADIUS.
+    """
+
+    def __init__(self, protein, ext_descr=False, norm_chgs=False, env_radius=LIG_ENV_MAX_RADIUS):
+        self.protein = protein
+        self.norm_chgs = norm_chgs
+        self.env_radius = env_radius
+        self.descr_calc = create_descriptor_calculator(ext_descr)
+        self.site_env = None
+
+    def set_binding_site(self, lig_env):
+        """
+        Use a fixed binding site environment for all ligands, so that the target data are initialized only once.
+
+        Args:
+            lig_env (Chem.Fragment or None): The environment residues with perceived SSSR, or None to extract the
+                environment of every ligand from its poses.
+        """
+        self.site_env = lig_env
+
+        if lig_env is not None:
+            self.descr_calc.initTargetData(lig_env, Chem.Atom3DCoordinatesFunctor())
+
+    def score(self, ligand, poses=None, prepare=True):
+        """
+        Calculate the descriptors of all poses of a ligand.
+
+        Args:
+            ligand (Chem.Molecule): The ligand.
+            poses (array-like, optional): The pose coordinates of shape (n_poses, n_atoms, 3) or (n_atoms, 3) in the atom
+                order of the ligand. Defaults to None, which takes the poses from the ligand (see get_pose_coordinates).
+            prepare (bool, optional): Whether the ligand still has to be prepared with
+                GRAIL.prepareForGRAILDescriptorCalculation. Defaults to True.
+
+        Raises:
+            ValueError: If the pose coordinates do not match the atoms of the (prepared) ligand.
+
+        Returns:
+            numpy.ndarray: The descriptors of shape (n_poses, TOTAL_DESCRIPTOR_SIZE).
+        """
+        if prepare:
+            num_atoms = ligand.numAtoms
+
+            GRAIL.prepareForGRAILDescriptorCalculation(ligand, self.norm_chgs)
+
+            if ligand.numAtoms != num_atoms and (poses is not None or Chem.getNumConformations(ligand) > 1):
+                raise ValueError(
+                    f"Preparation added {ligand.numAtoms - num_atoms} hydrogens to ligand '{Chem.getName(ligand)}'; "
+                    "rescoring poses requires ligands with explicit hydrogens"
+                )
+
+        if poses is None:
+            poses = get_pose_coordinates(ligand)
+
+        poses = np.asarray(poses, dtype=np.float64)
+
+        if poses.ndim == 2:
+            poses = poses[np.newaxis]
+
+        if poses.shape[1:] != (ligand.numAtoms, 3):
+            raise ValueError(f"Pose coordinates of shape {poses.shape} do not match the {ligand.numAtoms} ligand atoms")
+
+        if self.site_env is None:
+            lig_env = extract_pose_environment(self.protein, ligand, poses, max_radius=self.env_radius)
+            self.descr_calc.initTargetData(lig_env, Chem.Atom3DCoordinatesFunctor())
+
+        self.descr_calc.initLigandData(ligand)
+
+        descr = Math.DVector()
+        descriptors = np.empty((len(poses), self.descr_calc.TOTAL_DESCRIPTOR_SIZE))
+
+        for i, coords in enumerate(poses):
+            self.descr_calc.calculate(Math.Vector3DArray(coords), descr)
+            descriptors[i] = descr.toArray()
+
+        return descriptors
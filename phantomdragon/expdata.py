@@ -0,0 +1,186 @@
+"""Parsing of the PDBbind binding data index files into the experimental data tables of the affinity predictions."""
+import os
+import re
+import warnings
+
+import numpy as np
+import pandas as pd
+
+
+FORMATS = ("csv", "parquet")
+
+# the affinity data types written to separate tables besides 'all'
+SPLITS = {"kd": "Kd", "ki": "Ki"}
+
+# the relation column name and the relations of the entries that are left out from the kd/ki tables: the former parser
+# typed e.g. 'Ki<=0.6nM' as 'Ki<', so the published kd/ki tables contain the '=', '~', '<' and '>' entries only
+RELATION_COLUMN = "Relation"
+SPLIT_EXCLUDED_RELATIONS = ("<=", ">=")
+
+# R * T in kcal/mol at 298 K, as used for the published tables
+RT = 0.001987 * 298
+
+# the concentration units of the index files in nM
+UNIT_FACTORS = {"fM": 1e-6, "pM": 1e-3, "nM": 1.0, "uM": 1e3, "mM": 1e6}
+
+# e.g. '3zzf  2.20  2012   0.40  Ki=400mM      // 3zzf.pdf (NLG)' (INDEX_*_data files) or
+# '4llx    1.75     2014    2.89     Ki=1300uM    1' (CoreSet.dat); other lines that are not comments are matched by
+# the last group
+LINE_PATTERN = re.compile(
+    r"^(?:(\w{4})[ \t]+\S+[ \t]+\S+[ \t]+([0-9.]+)[ \t]+([A-Za-z]+[0-9]*)(<=|>=|=|~|<|>)([0-9.]+)([fpnum]M)(?=\s|$)"
+    r"|([^#\s].*))",
+    re.MULTILINE,
+)
+
+DELTA_G_DECIMALS = 2
+K_RECIPROCAL_DECIMALS = 5
+
+
+def round_values(values, decimals):
+    """
+    Returns:
+        numpy.ndarray: The values correctly rounded to decimals, as by round().
+    """
+    scale = 10.0**decimals
+    scaled = values * scale
+    rounded = np.round(scaled) / scale
+
+    # values * scale is inexact and may end up on the wrong side of a tie (numpy.round() rounds 1/8000 =
+    # 0.000125000000000000005 down to 0.00012), values close to a tie are rounded by round()
+    ties = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    rounded[ties] = [round(value, decimals) for value in values[ties].tolist()]
+
+    return rounded
+
+
+def read_index(path, identifier="PDB code", experiment_identifier="Affinity Data Type"):
+    """
+    Parse a PDBbind binding data index file (e.g. INDEX_general_PL_data.2020, INDEX_refined_data.2020 or CoreSet.dat).
+    The entries are extracted in one regular expression pass over the file and the affinities converted with array
+    operations.
+
+    Args:
+        path (str): The path of the index file.
+        identifier (str, optional): The identifier column name. Defaults to 'PDB code'.
+        experiment_identifier (str, optional): The affinity data type column name. Defaults to 'Affinity Data Type'.
+
+    Raises:
+        ValueError: If a line that is neither empty nor a comment is not a binding data entry.
+
+    Returns:
+        pandas.DataFrame: Per complex, in file order, the affinity data type (Kd, Ki or IC50), the relation of the
+            affinity ('Relation', e.g. '<=' for 'Ki<=0.6nM'), the affinity in nM, the -log(Kd/Ki/IC50) of the index,
+            the binding free energy ('delta G', RT ln(K) in kcal/mol, rounded to 2 decimals) and '1/K' (in 1/nM, rounded
+            to 5 decimals).
+    """
+    with open(path) as file:
+        text = file.read()
+
+    entries = LINE_PATTERN.findall(text)
+    columns = list(zip(*entries)) if entries else [()] * 7
+
+    if any(columns[6]):
+        line = next(entry[6] for entry in entries if entry[6])
+        raise ValueError(f"Invalid binding data entry in {path}: '{line}'")
+
+    codes, pks, data_types, relations, values, units = columns[:6]
+    values = np.array(values, dtype="float64")
+    factors = np.array([UNIT_FACTORS[unit] for unit in units], dtype="float64")
+
+    # multiplied resp. divided by the integral unit ratio, so that e.g. 2.2uM gives exactly float('2.2') * 1000
+    values = values * np.where(factors >= 1.0, factors, 1.0) / np.where(factors < 1.0, np.round(1.0 / factors), 1.0)
+
+    data = pd.DataFrame({
+        identifier: pd.Series(codes, dtype=str),
+        experiment_identifier: pd.Series(data_types, dtype=str),
+        RELATION_COLUMN: pd.Series(relations, dtype=str),
+        "Affinity Data Value": values,
+        "pKd pKi pIC50": np.array(pks, dtype="float64"),
+        "delta G": round_values(RT * np.log(values / 1e9), DELTA_G_DECIMALS),
+        "1/K": round_values(1.0 / values, K_RECIPROCAL_DECIMALS),
+    })
+
+    return data
+
+
+def split_affinity_types(data, experiment_identifier="Affinity Data Type"):
+    """
+    Returns:
+        dict: The table of all complexes ('all') and the tables of the complexes with Kd ('kd') and Ki ('ki') data, by
+            split name. Entries with a relation of SPLIT_EXCLUDED_RELATIONS are only in the table of all complexes.
+    """
+    tables = {"all": data}
+    included = ~data[RELATION_COLUMN].isin(SPLIT_EXCLUDED_RELATIONS)
+
+    for name, data_type in SPLITS.items():
+        tables[name] = data[(data[experiment_identifier] == data_type) & included]
+
+    return tables
+
+
+def get_split_path(out_prefix, split, format="csv"):
+    """
+    Returns:
+        str: The path of a split table, e.g. '../data/exp_data/PDBbind_general_set_kd.csv' for out_prefix
+            '../data/exp_data/PDBbind_general_set'.
+    """
+    return f"{out_prefix}_{split}.{format}"
+
+
+def write_tables(data, out_prefix, format="csv", experiment_identifier="Affinity Data Type"):
+    """
+    Write the all/kd/ki tables of split_affinity_types() in one pass.
+
+    Args:
+        data (pandas.DataFrame): The table of read_index().
+        out_prefix (str): The output path without the '_<split>.<format>' suffix.
+        format (str, optional): 'csv' (with the row index of the table as first column, as the published tables) or
+            'parquet'. Defaults to 'csv'.
+        experiment_identifier (str, optional): The affinity data type column name. Defaults to 'Affinity Data Type'.
+
+    Raises:
+        ValueError: If the format is not supported.
+
+    Returns:
+        list: The paths of the written tables.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unknown experimental data file format '{format}'")
+
+    paths = []
+
+    for split, table in split_affinity_types(data, experiment_identifier).items():
+        path = get_split_path(out_prefix, split, format)
+
+        if format == "parquet":
+            table.to_parquet(path, index=False)
+        else:
+            table.to_csv(path)
+
+        paths.append(path)
+
+    return paths
+
+
+def read_exp_data(path, identifier="PDB code", experiment_identifier="Affinity Data Type"):
+    """
+    Read an experimental data table written in CSV or Parquet format. The format is determined by the file extension.
+
+    Args:
+        path (str): The path of the table.
+        identifier (str, optional): The identifier column name, read as string. Defaults to 'PDB code'.
+        experiment_identifier (str, optional): The affinity data type column name, read as string. Defaults to
+            'Affinity Data Type'.
+
+    Returns:
+        pandas.DataFrame: The identifier, affinity data type and relation (if present) columns and the float64 value
+            columns.
+    """
+    if os.path.splitext(path)[1].lower() == ".parquet":
+        return pd.read_parquet(path)
+
+    # the converters override dtype, which is intended
+    with warnings.catch_warnings():
+        warnings.simplefilter(action="ignore", category=pd.errors.ParserWarning)
+
+        return pd.read_csv(path, dtype="float64", converters={identifier: str, experiment_identifier: str, RELATION_COLUMN: str})
@@ -0,0 +1,130 @@
+"""Named subsets of the GRADE/X-GRADE descriptor elements used as model features."""
+import numpy as np
+
+
+# descriptor elements left out together by the feature subsets
+FEATURE_GROUPS = {
+    "hydrophobic": ("H_H_SCORE_SUM", "H_H_SCORE_MAX"),
+    "electrostatic": ("ES_ENERGY", "ES_ENERGY_SQRD_DIST"),
+    "vdw": ("VDW_ENERGY_ATT", "VDW_ENERGY_REP"),
+}
+
+# the feature groups left out by each named subset (add_information of functions.parameterCollector); '-el' keeps the
+# electrostatic and '-vdw' the van der Waals energies. The 'basic' and '-w' subsets of the former GRAIL descriptor
+# (without weighted resp. unweighted hydrophobic scores) coincide, GRADE has a single hydrophobic score.
+FEATURE_SUBSETS = {
+    "basic": ("hydrophobic", "electrostatic", "vdw"),
+    "-w": ("hydrophobic", "electrostatic", "vdw"),
+    "basic-el": ("hydrophobic", "vdw"),
+    "-w-el": ("hydrophobic", "vdw"),
+    "basic-vdw": ("hydrophobic", "electrostatic"),
+    "-w-vdw": ("hydrophobic", "electrostatic"),
+    "basic-el-vdw": ("hydrophobic",),
+    "-w-el-vdw": ("hydrophobic",),
+}
+
+
+class FeatureSchema:
+    """
+    The descriptor elements of a feature table, against which the feature subsets are resolved (once per subset) to
+    column index arrays.
+
+    Args:
+        column_names (list): The names of the descriptor elements in column order. Surrounding blanks (e.g. of the
+            ', '-separated CSV export) are ignored.
+    """
+
+    def __init__(self, column_names):
+        self.column_names = [str(name).strip() for name in column_names]
+        self.positions = {name: i for i, name in enumerate(self.column_names)}
+        self.subset_indices = {}
+
+    def indices(self, subset):
+        """
+        Resolve a feature subset to column indices. Names that are not in FEATURE_SUBSETS (e.g. 'GRADE', 'X-GRADE' or
+        'PLEC') select all columns.
+
+        Args:
+            subset (str): The name of the subset.
+
+        Raises:
+            ValueError: If an element left out by the subset is not a column of the schema.
+
+        Returns:
+            numpy.ndarray: The read-only column indices, in column order.
+        """
+        indices = self.subset_indices.get(subset)
+
+        if indices is not None:
+            return indices
+
+        excluded = set()
+
+        for group in FEATURE_SUBSETS.get(subset, ()):
+            for name in FEATURE_GROUPS[group]:
+                if name not in self.positions:
+                    raise ValueError(f"Feature subset '{subset}' leaves out {name}, which is not a descriptor element of the feature table")
+
+                excluded.add(self.positions[name])
+
+        indices = np.array([i for i in range(len(self.column_names)) if i not in excluded], dtype=np.intp)
+        indices.flags.writeable = False
+        self.subset_indices[subset] = indices
+
+        return indices
+
+    def select(self, matrix, subset, num_blocks=1):
+        """
+        Select the columns of a feature subset from a feature matrix.
+
+        Args:
+            matrix (numpy.ndarray): The feature matrix with one column per descriptor element of the schema.
+            subset (str): The name of the subset.
+            num_blocks (int, optional): The number of consecutive blocks of descriptor element columns of matrix (e.g. 2
+                for the polynomial features of functions.prepare_data()), from each of which the subset is selected.
+                Defaults to 1.
+
+        Returns:
+            numpy.ndarray: The selected columns, a view of matrix if they form a contiguous range (e.g. all columns).
+        """
+        indices = self.indices(subset)
+
+        if num_blocks > 1:
+            indices = np.concatenate([indices + block * len(self.column_names) for block in range(num_blocks)])
+
+        if len(indices) > 0 and indices[-1] - indices[0] == len(indices) - 1:
+            return matrix[:, indices[0] : indices[-1] + 1]
+
+        return matrix[:, indices]
+
+
+_schemas = {}
+
+
+def get_feature_schema(column_names):
+    """
+    Returns:
+        FeatureSchema: The schema of the given descriptor element names, shared by all tables with the same columns.
+    """
+    key = tuple(column_names)
+    schema = _schemas.get(key)
+
+    if schema is None:
+        schema = _schemas[key] = FeatureSchema(key)
+
+    return schema
+
+
+def select_features(features, subset, identifier="PDB code"):
+    """
+    Args:
+        features (pandas.DataFrame): The identifier column and the descriptor element columns.
+        subset (str): The name of the feature subset (see FEATURE_SUBSETS).
+        identifier (str, optional): The identifier column name. Defaults to 'PDB code'.
+
+    Returns:
+        numpy.ndarray: The feature matrix of the subset.
+    """
+    features = features.drop(identifier, axis=1)
+
+    return get_feature_schema(features.columns).select(features.to_numpy(), subset)
@@ -14,7 +14,18 @@ from sklearn.utils import shuffle
 from scipy import stats
 import joblib
 import xgboost as xgb
-import warnings
+
+from .expdata import read_exp_data
+from .features import select_features
+from .output import read_descriptors
+
+# model types whose predictions change only at the rounding level with float32 features (parameterCollector(...,
+# dtype="float32")), as checked with scripts/bench_float32.py. The tree models split on exact feature values, distinct
+# values that coincide in float32 give other splits and models.
+FLOAT32_MODELTYPES = ("linearRegression", "Ridge", "Lasso", "SVR")
+
+# the attributes set per testing set by parameterCollector.phantomtest_groups()
+GROUP_RESULT_ATTRIBUTES = ("scores_test", "scores_pre", "mae", "mse", "sd", "r", "conf_int", "spearman_r", "r_2")
 
 def rsquared(x, y):
     """ Return R^2 where x and y are array-like."""
@@ -22,6 +33,28 @@ def rsquared(x, y):
     slope, intercept, r_value, p_value, std_err = stats.linregress(x, y)
     return r_value**2        
 
+def read_table(reader, path, table_cache=None, **settings):
+    """
+    Parameters
+    ----------
+    reader : TYPE Function
+        Parses the file into a pandas Dataframe, called as reader(path, **settings).
+    path : TYPE String
+        The file path.
+    table_cache : TYPE cache.TableCache
+        Cache of parsed tables, or None to parse the file every time.
+
+    Returns
+    -------
+    df : TYPE PANDAS Dataframe
+        The parsed table.
+
+    """
+    if table_cache is None:
+        return reader(path, **settings)
+    return table_cache.load(path, reader, **settings)
+
+
 def filter_and_sort_features(exp_data, features,identifier="PDB code"):
     """
     Parameters
@@ -46,6 +79,33 @@ def filter_and_sort_features(exp_data, features,identifier="PDB code"):
     return df
 
 
+def remove_test_complexes(features_train, experiment_train, test_codes, identifier="PDB code"):
+    """
+    Parameters
+    ----------
+    features_train : TYPE PANDAS Dataframe
+        The training features, filtered and sorted by filter_and_sort_features.
+    experiment_train : TYPE PANDAS Dataframe
+        The experimental training scores, aligned row by row with features_train.
+    test_codes : TYPE List
+        The PDB codes of the test complexes.
+
+    Returns
+    -------
+    features_train, experiment_train : TYPE PANDAS Dataframe
+        The training features and scores without the complexes of the test set.
+        Both are filtered with the same row mask, so they stay aligned.
+
+    """
+    if features_train[identifier].tolist() != experiment_train[identifier].tolist():
+        raise ValueError("Trainfeatures and Trainlables have different Values")
+
+    keep = ~features_train[identifier].isin(test_codes).to_numpy()
+    features_train = features_train[keep].reset_index(drop=True)
+    experiment_train = experiment_train[keep].reset_index(drop=True)
+    return features_train, experiment_train
+
+
 def combine(list1, list2, list3):
     """
     Parameters
@@ -67,6 +127,100 @@ def combine(list1, list2, list3):
     return combinations
 
 
+def load_aligned_data(featurepath,
+    experimentpath,
+    identifier="PDB code",
+    experiment_identifier="Affinity Data Type",
+    table_cache=None,
+    dtype=None,
+    ):
+    """
+    Load a feature table and its experimental data, both sorted by identifier and restricted to the complexes present in both.
+    Args:
+        featurepath (str): The file path of the feature data.
+        experimentpath (str): The file path of the experiment data (CSV or Parquet, see expdata.read_exp_data()).
+        identifier (str, optional): The identifier column name. Defaults to 'PDB code'.
+        experiment_identifier (str, optional): The experiment identifier column name. Defaults to 'Affinity Data Type'.
+        table_cache (cache.TableCache, optional): Cache of the parsed tables. Defaults to None.
+        dtype (str, optional): The dtype of the feature columns (see output.read_descriptors()). Defaults to None.
+    Returns:
+        tuple: The features and the experiment data (pandas.DataFrame), aligned row by row.
+    """
+    features = read_table(read_descriptors, featurepath, table_cache, identifier=identifier, dtype=dtype)
+    experiment = read_table(read_exp_data, experimentpath, table_cache, identifier=identifier, experiment_identifier=experiment_identifier)
+    experiment = experiment.sort_values(identifier)
+    experiment = experiment.reset_index()
+    experiment = experiment.drop("index", axis=1)
+    features = filter_and_sort_features(experiment, features)
+    experiment = filter_and_sort_features(features, experiment)
+    return features, experiment
+
+
+def build_arrays(train_data, test_data, scoretype, add_information, identifier="PDB code", polynomial=False):
+    """
+    Build the feature matrices and score vectors from aligned training and testing data (see load_aligned_data), leaving
+    out the testing complexes from the training data.
+    Args:
+        train_data (tuple): The aligned training features and experiment data.
+        test_data (tuple): The aligned testing features and experiment data.
+        scoretype (str): The type of score to use.
+        add_information (str): The type of additional information to include.
+        identifier (str, optional): The identifier column name. Defaults to 'PDB code'.
+        polynomial (bool, optional): Whether to include polynomial features. Defaults to False.
+    Returns:
+        tuple: The training and testing features, as well as the corresponding scores, in identifier order.
+    """
+    features_train, experiment_train = train_data
+    features_test, experiment_test = test_data
+
+    if features_test[identifier].tolist() == experiment_test[identifier].tolist():
+        PDB_codes = features_test[identifier].tolist()
+    else:
+        raise ValueError("Testfeatures and Testlables have different Values")
+
+    features_train, experiment_train = remove_test_complexes(features_train, experiment_train, PDB_codes, identifier)
+
+    scores_test = np.array(experiment_test[scoretype])
+    scores_train = np.array(experiment_train[scoretype])
+
+    features_train = select_features(features_train, add_information, identifier)
+    features_test = select_features(features_test, add_information, identifier)
+
+    if polynomial == True:
+        features_train = np.hstack((features_train, features_train**2))
+        features_test = np.hstack((features_test, features_test**2))
+
+    return features_train, features_test, scores_train, scores_test
+
+
+def build_group_arrays(train_data, test_datas, scoretype, add_information, identifier="PDB code", polynomial=False):
+    """
+    Build the feature matrices and score vectors of several testing sets that are tested with one model: the testing
+    sets are stacked and the complexes of all of them are left out from the training data (see build_arrays).
+    Args:
+        train_data (tuple): The aligned training features and experiment data.
+        test_datas (list): The aligned testing features and experiment data of each testing set.
+        scoretype (str): The type of score to use.
+        add_information (str): The type of additional information to include.
+        identifier (str, optional): The identifier column name. Defaults to 'PDB code'.
+        polynomial (bool, optional): Whether to include polynomial features. Defaults to False.
+    Returns:
+        tuple: The training features, the stacked testing features, the corresponding scores and the index of the
+            testing set of each testing row (numpy.ndarray), in identifier order within each testing set.
+    """
+    for features_test, experiment_test in test_datas:
+        if features_test[identifier].tolist() != experiment_test[identifier].tolist():
+            raise ValueError("Testfeatures and Testlables have different Values")
+
+    features_test = pd.concat([features for features, experiment in test_datas], ignore_index=True)
+    experiment_test = pd.concat([experiment[[identifier, scoretype]] for features, experiment in test_datas], ignore_index=True)
+    groups = np.repeat(np.arange(len(test_datas)), [len(features) for features, experiment in test_datas])
+
+    features_train, features_test, scores_train, scores_test = build_arrays(train_data, (features_test, experiment_test), scoretype, add_information, identifier, polynomial)
+
+    return features_train, features_test, scores_train, scores_test, groups
+
+
 def prepare_data(scoretype,
     featurepath_train,
     featurepath_test,
@@ -77,6 +231,9 @@ def prepare_data(scoretype,
     identifier="PDB code",
     experiment_identifier="Affinity Data Type",
     polynomial=False,
+    table_cache=None,
+    datasets=None,
+    dtype=None,
     ):
     """
     Prepare the data for training and testing.
@@ -91,113 +248,129 @@ def prepare_data(scoretype,
         identifier (str, optional): The identifier column name. Defaults to 'PDB code'.
         experiment_identifier (str, optional): The experiment identifier column name. Defaults to 'Affinity Data Type'.
         polynomial (bool, optional): Whether to include polynomial features. Defaults to False.
+        table_cache (cache.TableCache, optional): Cache of the parsed feature and experiment tables, which are then parsed
+            only once per file version. Defaults to None.
+        datasets (datasets.DatasetManager, optional): In-process memo of the loaded tables and the prepared arrays, which
+            are then built only once for the same inputs. Without shuffling, the returned arrays are shared and read-only.
+            Defaults to None.
+        dtype (str, optional): The dtype of the features, e.g. 'float32' to halve the memory of the tables, the cached
+            matrices and the arrays. The scores stay float64. Defaults to None (float64).
     Returns:
         tuple: A tuple containing the prepared training and testing features, as well as the corresponding scores.
     """
-
-
-    
     if " " in featurepath_train or " " in featurepath_test or " " in experimentpath_train or " " in experimentpath_test:
         featurepath_train = featurepath_train.replace(" ","_")
         featurepath_test = featurepath_test.replace(" ","_")
         experimentpath_train = experimentpath_train.replace(" ","_")
         experimentpath_test = experimentpath_test.replace(" ","_")
-    #Ignoring warnings of converters and dtype. Converters override dtype. This is desired behavior
-    with warnings.catch_warnings():
-        warnings.simplefilter(action='ignore', category=pd.errors.ParserWarning)
-        features_train = pd.read_csv(featurepath_train, dtype='float64',converters={identifier: str,})
-        features_test = pd.read_csv(featurepath_test, dtype='float64',converters={identifier: str})
-        experiment_train = pd.read_csv(experimentpath_train, dtype='float64',converters={identifier: str, experiment_identifier: str})
-        experiment_test = pd.read_csv(experimentpath_test, dtype='float64',converters={identifier: str, experiment_identifier: str})
-    experiment_train = experiment_train.sort_values(identifier)
-    experiment_train = experiment_train.reset_index()
-    experiment_train = experiment_train.drop("index", axis=1)
-    experiment_test = experiment_test.sort_values(identifier)
-    experiment_test = experiment_test.reset_index()
-    experiment_test = experiment_test.drop("index", axis=1)
-    features_train = filter_and_sort_features(experiment_train, features_train)
-    features_test = filter_and_sort_features(experiment_test, features_test)
-    experiment_train = filter_and_sort_features(features_train, experiment_train)
-    experiment_test = filter_and_sort_features(features_test,experiment_test)
 
-    if features_test[identifier].tolist() == experiment_test[identifier].tolist():
-        PDB_codes = features_test[identifier].tolist()
-    else:
-        raise ValueError("Testfeatures and Testlables have different Values")
-
-    if all(x in PDB_codes for x in features_train[identifier]):
-        pass
+    if datasets is not None:
+        features_train, features_test, scores_train, scores_test = datasets.get_arrays(scoretype,
+            featurepath_train,
+            featurepath_test,
+            experimentpath_train,
+            experimentpath_test,
+            add_information,
+            identifier,
+            experiment_identifier,
+            polynomial,
+            dtype,
+        )
     else:
-        bool_list = []
-        for i in range(len(PDB_codes)):
-            if PDB_codes[i] in list(features_train[identifier]):
-                bool_list.append(True)
-            else:
-                bool_list.append(False)
-        PDB_codes = np.array(PDB_codes)
-        PDB_codes = list(PDB_codes[bool_list])
-
-    features_train = features_train.set_index(features_train[identifier])
-    features_train = features_train.transpose()
+        train_data = load_aligned_data(featurepath_train, experimentpath_train, identifier, experiment_identifier, table_cache, dtype)
+        test_data = load_aligned_data(featurepath_test, experimentpath_test, identifier, experiment_identifier, table_cache, dtype)
+        features_train, features_test, scores_train, scores_test = build_arrays(train_data, test_data, scoretype, add_information, identifier, polynomial)
 
-    for PDB_code in PDB_codes:
-        features_train = features_train.drop(PDB_code, axis=1)
+    scaler = preprocessing.StandardScaler().fit(features_train)
 
-    features_train = features_train.transpose()
-    features_train = features_train.reset_index(drop=True)
+    if sh == True:
+        features_train, scores_train = shuffle(features_train, scores_train)
+        features_test, scores_test = shuffle(features_test, scores_test)
 
-    experiment_train = experiment_train.set_index(experiment_train[identifier])
-    experiment_train = experiment_train.transpose()
 
-    experiment_train = experiment_train.drop(PDB_codes, axis=1)
-    experiment_train = experiment_train.transpose()
+    return features_train, features_test, scores_train, scores_test
 
-    scores_test = np.array(experiment_test[scoretype])
-    scores_train = np.array(experiment_train[scoretype])
 
-    if add_information == "basic":
-        drop = [identifier, " HW-HW_SUM", " HW-HW_MAX", " ES", " VDW_ATT", " VDW_REP"]
-    elif add_information == "-w":
-        drop = [identifier, " H-H_SUM", " H-H_MAX", " ES", " VDW_ATT", " VDW_REP"]
-    elif add_information == "basic-el":
-        drop = [identifier, " HW-HW_SUM", " HW-HW_MAX", " VDW_ATT", " VDW_REP"]
-    elif add_information == "-w-el":
-        drop = [identifier, " H-H_SUM", " H-H_MAX", " VDW_ATT", " VDW_REP"]
-    elif add_information == "basic-el-vdw":
-        drop = [identifier, " HW-HW_SUM", " HW-HW_MAX"]
-    elif add_information == "-w-el-vdw":
-        drop = [identifier, " H-H_SUM", " H-H_MAX"]
-    elif add_information == "basic-vdw":
-        drop = [identifier, " HW-HW_SUM", " HW-HW_MAX", " ES", " VDW_ATT", " VDW_REP"]
-    elif add_information == "-w-vdw":
-        drop = [identifier, " HW-HW_SUM", " HW-HW_MAX", " ES", " VDW_ATT", " VDW_REP"]
+def prepare_group_data(scoretype,
+    featurepath_train,
+    featurepaths_test,
+    experimentpath_train,
+    experimentpaths_test,
+    add_information,
+    sh=True,
+    identifier="PDB code",
+    experiment_identifier="Affinity Data Type",
+    polynomial=False,
+    table_cache=None,
+    datasets=None,
+    dtype=None,
+    ):
+    """
+    Prepare the data for training one model and testing it on several testing sets (see
+    parameterCollector.phantomtest_groups()). The complexes of all testing sets are left out from the training data.
+    Args:
+        scoretype (str): The type of score to use.
+        featurepath_train (str): The file path of the training feature data.
+        featurepaths_test (list): The file paths of the feature data of the testing sets.
+        experimentpath_train (str): The file path of the training experiment data.
+        experimentpaths_test (list): The file paths of the experiment data of the testing sets.
+        add_information (str): The type of additional information to include.
+        sh (bool, optional): Whether to shuffle the training data. The testing data stay in testing set order. Defaults
+            to True.
+        identifier (str, optional): The identifier column name. Defaults to 'PDB code'.
+        experiment_identifier (str, optional): The experiment identifier column name. Defaults to 'Affinity Data Type'.
+        polynomial (bool, optional): Whether to include polynomial features. Defaults to False.
+        table_cache (cache.TableCache, optional): Cache of the parsed feature and experiment tables. Defaults to None.
+        datasets (datasets.DatasetManager, optional): In-process memo of the loaded tables and the prepared arrays.
+            Defaults to None.
+        dtype (str, optional): The dtype of the features (see prepare_data()). Defaults to None (float64).
+    Returns:
+        tuple: The training features, the stacked testing features, the corresponding scores and the index of the
+            testing set of each testing row (see build_group_arrays()).
+    """
+    featurepath_train = featurepath_train.replace(" ","_")
+    experimentpath_train = experimentpath_train.replace(" ","_")
+    featurepaths_test = [path.replace(" ","_") for path in featurepaths_test]
+    experimentpaths_test = [path.replace(" ","_") for path in experimentpaths_test]
+
+    if len(featurepaths_test) != len(experimentpaths_test):
+        raise ValueError("Different numbers of testing feature and experiment files")
+
+    if datasets is not None:
+        features_train, features_test, scores_train, scores_test, groups = datasets.get_group_arrays(scoretype,
+            featurepath_train,
+            featurepaths_test,
+            experimentpath_train,
+            experimentpaths_test,
+            add_information,
+            identifier,
+            experiment_identifier,
+            polynomial,
+            dtype,
+        )
     else:
-        drop = [identifier]
-
-    features_train = features_train.drop(drop, axis=1)
-    features_test = features_test.drop(drop, axis=1)
-    features_train = features_train.to_numpy()
-    features_test = features_test.to_numpy()
-
-    if polynomial == True:
-        features_train = np.hstack((features_train, features_train**2))
-        features_test = np.hstack((features_test, features_test**2))
-
-    scaler = preprocessing.StandardScaler().fit(features_train)
+        train_data = load_aligned_data(featurepath_train, experimentpath_train, identifier, experiment_identifier, table_cache, dtype)
+        test_datas = [
+            load_aligned_data(featurepath, experimentpath, identifier, experiment_identifier, table_cache, dtype)
+            for featurepath, experimentpath in zip(featurepaths_test, experimentpaths_test)
+        ]
+        features_train, features_test, scores_train, scores_test, groups = build_group_arrays(train_data, test_datas, scoretype, add_information, identifier, polynomial)
 
     if sh == True:
         features_train, scores_train = shuffle(features_train, scores_train)
-        features_test, scores_test = shuffle(features_test, scores_test)
 
-
-    return features_train, features_test, scores_train, scores_test
+    return features_train, features_test, scores_train, scores_test, groups
 
 
 class parameterCollector:
-    def __init__(self, modeltype, add_information, scoretype):
+    def __init__(self, modeltype, add_information, scoretype, dtype=None):
         self.modeltype = modeltype
         self.add_information = add_information
         self.scoretype = scoretype
+        self.dtype = dtype
+
+        if dtype is not None and np.dtype(dtype) != np.float64 and modeltype not in FLOAT32_MODELTYPES:
+            raise ValueError(f"Modeltype {modeltype} does not support {dtype} features")
         self.mse = None
         self.r = None
         self.r_2 = None
@@ -268,6 +441,7 @@ class parameterCollector:
         """
         self.features_test = features_test
         self.scores_test = scores_test
+        self.group_scores_test = scores_test
 
     def set_datatype(self, datatype):
         """
@@ -309,55 +483,14 @@ class parameterCollector:
             featurepath = featurepath.replace(" ","_")
             experimentpath = experimentpath.replace(" ","_")
         
-        features = pd.read_csv(featurepath, dtype={identifier: str})
-        experiment = pd.read_csv(experimentpath, dtype={identifier: str})
+        features = read_descriptors(featurepath, identifier, dtype=self.dtype)
+        experiment = read_exp_data(experimentpath, identifier)
         experiment = experiment.sort_values(identifier)
         experiment = experiment.reset_index(drop=True)
         scores = np.array(experiment[self.scoretype])
 
-        if self.add_information == "basic":
-            drop = [
-                identifier,
-                " HW-HW_SUM",
-                " HW-HW_MAX",
-                " ES",
-                " VDW_ATT",
-                " VDW_REP",
-            ]
-        elif self.add_information == "-w":
-            drop = [identifier, " H-H_SUM", " H-H_MAX", " ES", " VDW_ATT", " VDW_REP"]
-        elif self.add_information == "basic-el":
-            drop = [identifier, " HW-HW_SUM", " HW-HW_MAX", " VDW_ATT", " VDW_REP"]
-        elif self.add_information == "-w-el":
-            drop = [identifier, " H-H_SUM", " H-H_MAX", " VDW_ATT", " VDW_REP"]
-        elif self.add_information == "basic-el-vdw":
-            drop = [identifier, " HW-HW_SUM", " HW-HW_MAX"]
-        elif self.add_information == "-w-el-vdw":
-            drop = [identifier, " H-H_SUM", " H-H_MAX"]
-        elif self.add_information == "basic-vdw":
-            drop = [
-                identifier,
-                " HW-HW_SUM",
-                " HW-HW_MAX",
-                " ES",
-                " VDW_ATT",
-                " VDW_REP",
-            ]
-        elif self.add_information == "-w-vdw":
-            drop = [
-                identifier,
-                " HW-HW_SUM",
-                " HW-HW_MAX",
-                " ES",
-                " VDW_ATT",
-                " VDW_REP",
-            ]
-        else:
-            drop = [identifier]
-        
         features = filter_and_sort_features(experiment, features)
-        features = features.drop(drop, axis=1)
-        features = features.to_numpy()
+        features = select_features(features, self.add_information, identifier)
 
         if sh == True:
             features, scores = shuffle(features, scores)
@@ -502,6 +635,69 @@ class parameterCollector:
         scores_pre = reg.predict(self.features_test)
 
         self.scores_pre = scores_pre
+        self._calculate_stats(confidence_level)
+
+        if return_values == True:
+            return self.scores_pre
+
+    def phantomtest_groups(self,
+        groups,
+        loadpath="",
+        confidence_level=0.9,
+        additional_marker="",
+        spearman=False):
+        """
+        Perform the PhantomTest analysis for several testing sets with one model. The model is loaded once and the
+        stacked testing features (e.g. of prepare_group_data(), set by set_testingdata()) are predicted in one call, the
+        statistics are calculated per testing set. The stacked testing scores are kept, so it can be called repeatedly.
+        Afterwards select_group() sets the testing scores, predicted scores and statistics of a testing set (e.g. for
+        get_stats() or plot_phantomtest()), the last testing set is selected.
+        Args:
+            groups (numpy.ndarray): The testing set of each row of the testing features.
+            loadpath (str, optional): The path to load the model. Defaults to "".
+            confidence_level (float, optional): The confidence level for the confidence interval. Defaults to 0.9.
+            additional_marker (str, optional): Additional marker for the model file. Defaults to "".
+            spearman (bool, optional): Whether the statistics include the Spearman correlation coefficient. Defaults to False.
+        Returns:
+            dict: The statistics of get_stats() by testing set, in order of first occurrence.
+        """
+        if "/" in self.scoretype:
+            self.scoretype = self.scoretype.replace("/", "div")
+
+        reg = joblib.load(
+            f"{loadpath}{self.modeltype}_{self.scoretype}_{self.datatype}_{self.add_information}{additional_marker}.sav"
+        )
+
+        if "div" in self.scoretype:
+            self.scoretype = self.scoretype.replace("div", "/")
+
+        # the stacked testing scores are kept in group_scores_test, select_group() sets scores_test to a testing set
+        scores_test = np.asarray(self.group_scores_test)
+        scores_pre = reg.predict(self.features_test)
+        groups = np.asarray(groups)
+        group_stats = {}
+        self.group_results = {}
+
+        for group in pd.unique(groups):
+            mask = groups == group
+            self.group_results[group] = {"scores_test": scores_test[mask], "scores_pre": scores_pre[mask]}
+            self.select_group(group)
+            self._calculate_stats(confidence_level)
+            self.group_results[group] = {name: getattr(self, name) for name in GROUP_RESULT_ATTRIBUTES}
+            group_stats[group] = self.get_stats(spearman)
+
+        return group_stats
+
+    def select_group(self, group):
+        """
+        Set the testing scores, predicted scores and statistics of a testing set of phantomtest_groups().
+        Args:
+            group: The testing set.
+        """
+        for name, value in self.group_results[group].items():
+            setattr(self, name, value)
+
+    def _calculate_stats(self, confidence_level):
         self.mae = mean_absolute_error(self.scores_test, self.scores_pre)
         self.mse = mean_squared_error(self.scores_test, self.scores_pre)
         self.sd = np.std(self.scores_pre)
@@ -516,9 +712,6 @@ class parameterCollector:
         #self.r_2 = round(r2_score(self.scores_test, self.scores_pre),6)
         self.r_2 = round(rsquared(self.scores_test, self.scores_pre),6)
 
-        if return_values == True:
-            return self.scores_pre
-
     def plot_phantomtest(self, savepath,name=None):
         """
         Plot the test scores against the predicted scores and save the plot as an image.
@@ -580,56 +773,20 @@ class parameterCollector:
         - features_test (str or pandas.DataFrame): Path to a CSV file containing the features or a pandas DataFrame object.
         - loadpath (str): Path to the directory where the model files are stored.
         - identifier (str, optional): Identifier column name in the features DataFrame. Default is "PDB code".
+        The features are read as self.dtype (e.g. 'float32', which halves the memory of large screening tables).
         Returns:
         - tuple: A tuple containing two arrays: PDB codes and corresponding phantom scores.
         """
         if isinstance(features_test, str):
-            self.features_test = pd.read_csv(features_test, dtype={identifier: str})
+            self.features_test = read_descriptors(features_test, identifier, dtype=self.dtype)
+        elif self.dtype is not None:
+            self.features_test = features_test.astype({name: self.dtype for name in features_test.columns if name != identifier})
+        else:
+            self.features_test = features_test
         
         PDB_codes = self.features_test[identifier]
 
-        if self.add_information == "basic":
-            drop = [
-                identifier,
-                " HW-HW_SUM",
-                " HW-HW_MAX",
-                " ES",
-                " VDW_ATT",
-                " VDW_REP",
-            ]
-        elif self.add_information == "-w":
-            drop = [identifier, " H-H_SUM", " H-H_MAX", " ES", " VDW_ATT", " VDW_REP"]
-        elif self.add_information == "basic-el":
-            drop = [identifier, " HW-HW_SUM", " HW-HW_MAX", " VDW_ATT", " VDW_REP"]
-        elif self.add_information == "-w-el":
-            drop = [identifier, " H-H_SUM", " H-H_MAX", " VDW_ATT", " VDW_REP"]
-        elif self.add_information == "basic-el-vdw":
-            drop = [identifier, " HW-HW_SUM", " HW-HW_MAX"]
-        elif self.add_information == "-w-el-vdw":
-            drop = [identifier, " H-H_SUM", " H-H_MAX"]
-        elif self.add_information == "basic-vdw":
-            drop = [
-                identifier,
-                " HW-HW_SUM",
-                " HW-HW_MAX",
-                " ES",
-                " VDW_ATT",
-                " VDW_REP",
-            ]
-        elif self.add_information == "-w-vdw":
-            drop = [
-                identifier,
-                " HW-HW_SUM",
-                " HW-HW_MAX",
-                " ES",
-                " VDW_ATT",
-                " VDW_REP",
-            ]
-        else:
-            drop = [identifier]
-            
-        self.features_test = self.features_test.drop(drop, axis=1)
-        self.features_test = self.features_test.to_numpy()
+        self.features_test = select_features(self.features_test, self.add_information, identifier)
         
         if "/" in self.scoretype:
             self.scoretype = self.scoretype.replace("/", "div")
@@ -0,0 +1,461 @@
+"""Parallel execution of grids of affinity prediction experiments (prepare_data -> train_and_save_model -> phantomtest)."""
+import csv
+import itertools
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from .cache import TableCache
+from .datasets import DatasetManager
+from .features import FEATURE_SUBSETS
+from .functions import parameterCollector, prepare_data, prepare_group_data
+
+
+# the statistics columns of a result row, as written by the pred_*.py scripts
+STATS_COLUMNS = (
+    "Modeltype",
+    "Scoretype",
+    "Datatype",
+    "Mean absolute error (mae)",
+    "Mean squared error (mse)",
+    "Standard Diviation (SD)",
+    "Pearson correlation coefficient (r)",
+    "90% Confidence interval",
+    "Coefficient of determination (r²)",
+    "Spearman correlation coefficient",
+    "add. information",
+)
+AVERAGED_COLUMNS = STATS_COLUMNS[3:7] + STATS_COLUMNS[8:10]
+
+# the cell fields of prepare_data() and parameterCollector
+PATH_FIELDS = ("featurepath_train", "featurepath_test", "experimentpath_train", "experimentpath_test")
+REQUIRED_FIELDS = ("modeltype", "scoretype", "datatype", "add_information") + PATH_FIELDS
+DEFAULT_FIELDS = {
+    "additional_marker": "",
+    "train": True,
+    "repeats": 1,
+    "shuffle": True,
+    "polynomial": False,
+    "dtype": None,
+    "plotpath": None,
+    "plot_name": None,
+    "fit_group": None,
+}
+
+# the cell fields that the cells sharing the model of a fit group agree in
+SHARED_FIT_FIELDS = (
+    "modeltype",
+    "scoretype",
+    "datatype",
+    "featurepath_train",
+    "experimentpath_train",
+    "polynomial",
+    "dtype",
+    "shuffle",
+    "train",
+    "repeats",
+)
+
+# relative training times of the model types (refined set, GRADE), the most expensive cells are started first, so that
+# a sweep over the model types takes about as long as its slowest model when there are enough worker processes
+MODELTYPE_COSTS = {
+    "ElasticNet": 100.0,
+    "RandomForest": 60.0,
+    "XGBoost": 9.0,
+    "SVR": 8.0,
+    "Lasso": 1.0,
+    "DecisionTree": 1.0,
+    "Ridge": 0.1,
+    "linearRegression": 0.1,
+}
+
+# data sets with fewer complexes are skipped (the statistics are undefined)
+MIN_SET_SIZE = 2
+
+
+def expand_grid(axes, **fields):
+    """
+    Expand a declarative grid specification into its cells.
+
+    Args:
+        axes (dict): The values of each grid axis by axis name, e.g. {"datatype": ["all", "ki", "kd"], "modeltype":
+            [...]}. The cells iterate the axes like nested loops in the given order, the last axis varies fastest.
+        **fields: The other cell fields, as format strings of the axis values (e.g. featurepath_train=
+            "../data/Descriptors/PDBbind_refined_set_{descriptor}.csv"), functions of the axis values (dict) or
+            non-string constants (e.g. repeats=10). The fields of REQUIRED_FIELDS that are not axes must be given, the
+            fields of DEFAULT_FIELDS may be given. Cells with the same fit_group (not None), SHARED_FIT_FIELDS and
+            feature subset are tested with one model, which is trained without the complexes of all their testing sets
+            and saved with the fit group in place of add_information (see run_group()).
+
+    Raises:
+        ValueError: If a required field is missing.
+
+    Returns:
+        list: The cells (dict) with the axis values, the formatted fields and the cell index ('cell').
+    """
+    missing = [name for name in REQUIRED_FIELDS if name not in axes and name not in fields]
+
+    if missing:
+        raise ValueError(f"Missing grid field(s): {', '.join(missing)}")
+
+    cells = []
+
+    for i, values in enumerate(itertools.product(*axes.values())):
+        cell = dict(DEFAULT_FIELDS)
+        cell.update(zip(axes, values))
+        names = dict(zip(axes, values))
+
+        for name, value in fields.items():
+            if isinstance(value, str):
+                value = value.format(**names)
+            elif callable(value):
+                value = value(names)
+
+            cell[name] = value
+
+        cell["axes"] = names
+        cell["cell"] = i
+        cells.append(cell)
+
+    return cells
+
+
+def get_model_path(cell, savepath):
+    """
+    Returns:
+        str: The path of the model file of a cell (see functions.parameterCollector.train_and_save_model()), the model
+            of its fit group if it has one.
+    """
+    scoretype = cell["scoretype"].replace("/", "div")
+
+    if cell["fit_group"] is not None:
+        return f"{savepath}{cell['modeltype']}_{scoretype}_{cell['datatype']}_{cell['fit_group']}.sav"
+
+    return f"{savepath}{cell['modeltype']}_{scoretype}_{cell['datatype']}_{cell['add_information']}{cell['additional_marker']}.sav"
+
+
+def _make_row(cell, stats, times, train_time, train_size, test_size):
+    row = dict(cell["axes"])
+    row.update(stats[0])
+
+    for name in AVERAGED_COLUMNS:
+        row[name] = sum(s[name] for s in stats) / len(stats)
+
+    row["add. information"] = cell["add_information"]
+    row["Training set size"] = train_size
+    row["Testing set size"] = test_size
+    row["Training time"] = train_time
+    row["Time"] = sum(times) / len(times)
+
+    return row
+
+
+def run_cell(cell, savepath="../models/", datasets=None):
+    """
+    Run the experiment of a grid cell: prepare the training and testing data, train and save the model (unless the
+    cell's train field is False, then the saved model is tested) and test it the given number of repeats. If the cell
+    has a plotpath, the test is plotted (see functions.parameterCollector.plot_phantomtest()).
+
+    Args:
+        cell (dict): The cell (see expand_grid()).
+        savepath (str, optional): The directory of the model files. Defaults to '../models/'.
+        datasets (datasets.DatasetManager, optional): Memo of the prepared data. Defaults to None.
+
+    Returns:
+        dict: The result row: the axis values, the columns of STATS_COLUMNS (averaged over the repeats), the set sizes and
+            the mean test time ('Time'), or None if the training or testing set has fewer than MIN_SET_SIZE complexes.
+    """
+    x_train, x_test, y_train, y_test = prepare_data(
+        cell["scoretype"],
+        *(cell[name] for name in PATH_FIELDS),
+        cell["add_information"],
+        sh=cell["shuffle"],
+        polynomial=cell["polynomial"],
+        datasets=datasets,
+        dtype=cell["dtype"],
+    )
+
+    if len(x_train) < MIN_SET_SIZE or len(x_test) < MIN_SET_SIZE:
+        return None
+
+    param = parameterCollector(cell["modeltype"], cell["add_information"], cell["scoretype"], dtype=cell["dtype"])
+
+    param.set_trainingdata(x_train, y_train)
+    param.set_testingdata(x_test, y_test)
+    param.set_datatype(cell["datatype"])
+
+    start = time.perf_counter()
+
+    if cell["train"]:
+        param.train_and_save_model(savepath=savepath, additional_marker=cell["additional_marker"])
+
+    train_time = time.perf_counter() - start
+    stats = []
+    times = []
+
+    for i in range(cell["repeats"]):
+        start = time.perf_counter()
+        param.phantomtest(loadpath=savepath, additional_marker=cell["additional_marker"])
+        times.append(time.perf_counter() - start)
+        stats.append(dict(zip(STATS_COLUMNS, param.get_stats(spearman=True))))
+
+    if cell["plotpath"] is not None:
+        param.plot_phantomtest(cell["plotpath"], name=cell["plot_name"])
+
+    return _make_row(cell, stats, times, train_time, len(x_train), len(x_test))
+
+
+def run_group(cells, savepath="../models/", datasets=None):
+    """
+    Run the experiments of the cells of a fit group with one model: prepare the training data without the complexes of
+    all testing sets of the cells, train and save the model once (unless the train field is False), predict the
+    stacked testing sets in one call and calculate the statistics per cell (see
+    functions.parameterCollector.phantomtest_groups()). The model is saved with the fit group in place of
+    add_information and without additional_marker.
+
+    Args:
+        cells (list): The cells of the fit group (see expand_grid()), which agree in SHARED_FIT_FIELDS and the feature
+            subset.
+        savepath (str, optional): The directory of the model files. Defaults to '../models/'.
+        datasets (datasets.DatasetManager, optional): Memo of the prepared data. Defaults to None.
+
+    Returns:
+        list: The (cell, result row) pairs, the row is None if the training or testing set of the cell has fewer than
+            MIN_SET_SIZE complexes (see run_cell()).
+    """
+    first = cells[0]
+
+    x_train, x_test, y_train, y_test, groups = prepare_group_data(
+        first["scoretype"],
+        first["featurepath_train"],
+        [cell["featurepath_test"] for cell in cells],
+        first["experimentpath_train"],
+        [cell["experimentpath_test"] for cell in cells],
+        first["add_information"],
+        sh=first["shuffle"],
+        polynomial=first["polynomial"],
+        datasets=datasets,
+        dtype=first["dtype"],
+    )
+    test_sizes = np.bincount(groups, minlength=len(cells))
+    tested = np.flatnonzero(test_sizes >= MIN_SET_SIZE)
+
+    if len(x_train) < MIN_SET_SIZE or len(tested) == 0:
+        return [(cell, None) for cell in cells]
+
+    mask = np.isin(groups, tested)
+    param = parameterCollector(first["modeltype"], first["fit_group"], first["scoretype"], dtype=first["dtype"])
+
+    param.set_trainingdata(x_train, y_train)
+    param.set_testingdata(x_test[mask], y_test[mask])
+    param.set_datatype(first["datatype"])
+
+    start = time.perf_counter()
+
+    if first["train"]:
+        param.train_and_save_model(savepath=savepath)
+
+    train_time = time.perf_counter() - start
+    stats = {i: [] for i in tested}
+    times = []
+
+    for i in range(first["repeats"]):
+        start = time.perf_counter()
+        group_stats = param.phantomtest_groups(groups[mask], loadpath=savepath, spearman=True)
+        times.append(time.perf_counter() - start)
+
+        for group, values in group_stats.items():
+            stats[group].append(dict(zip(STATS_COLUMNS, values)))
+
+    results = []
+
+    for i, cell in enumerate(cells):
+        if i not in stats:
+            results.append((cell, None))
+            continue
+
+        if cell["plotpath"] is not None:
+            param.select_group(i)
+            param.plot_phantomtest(cell["plotpath"], name=cell["plot_name"])
+
+        results.append((cell, _make_row(cell, stats[i], times, train_time, len(x_train), int(test_sizes[i]))))
+
+    return results
+
+
+# memo of the prepared data of a worker process of a pool (see _init_grid_worker())
+_worker_datasets = None
+_worker_savepath = None
+
+
+def _init_grid_worker(savepath, table_cache_dir, max_dataset_size, training_sets):
+    global _worker_datasets, _worker_savepath
+
+    _worker_savepath = savepath
+    _worker_datasets = DatasetManager(max_dataset_size, TableCache(table_cache_dir) if table_cache_dir else None)
+
+    # the training sets shared by many cells are loaded once, when the worker starts; errors are raised by the cells
+    for featurepath, experimentpath, dtype in training_sets:
+        try:
+            _worker_datasets.get_aligned(featurepath.replace(" ", "_"), experimentpath.replace(" ", "_"), dtype=dtype)
+
+        except (OSError, ValueError, KeyError):
+            pass
+
+
+def _run_task(task):
+    if task[0]["fit_group"] is None:
+        return [(task[0], run_cell(task[0], _worker_savepath, _worker_datasets))]
+
+    return run_group(task, _worker_savepath, _worker_datasets)
+
+
+class GridRunner:
+    """
+    Runs the cells of an experiment grid on a pool of worker processes. Each worker loads the training sets of the grid
+    once when it starts and keeps the prepared data in a datasets.DatasetManager. The cells of a fit group run together
+    in one worker (see run_group()). The cells are started in order of decreasing cost (see MODELTYPE_COSTS) and their
+    result rows are written as soon as they finish.
+
+    Args:
+        num_jobs (int, optional): The number of worker processes, 1 runs the cells in this process and 0 uses all CPUs.
+            Model types that train multithreaded (XGBoost) use all CPUs in each process, so several processes
+            oversubscribe the CPUs with them. Defaults to 1.
+        savepath (str, optional): The directory of the model files. Defaults to '../models/'.
+        table_cache_dir (str, optional): The directory of the table cache (see cache.TableCache), or None to parse the
+            tables in every worker. Defaults to '../data/.table_cache'.
+        max_dataset_size (int, optional): The max_size of the datasets.DatasetManager of each worker. Defaults to 1 GiB.
+    """
+
+    def __init__(self, num_jobs=1, savepath="../models/", table_cache_dir="../data/.table_cache", max_dataset_size=1024**3):
+        self.num_jobs = num_jobs if num_jobs > 0 else os.cpu_count()
+        self.savepath = savepath
+        self.table_cache_dir = table_cache_dir
+        self.max_dataset_size = max_dataset_size
+        self.num_skipped = 0
+
+    @staticmethod
+    def _make_tasks(cells):
+        # one task per cell without fit group and per shared model of a fit group
+        tasks = []
+        fit_groups = {}
+
+        for cell in cells:
+            if cell["fit_group"] is None:
+                tasks.append([cell])
+                continue
+
+            key = (cell["fit_group"], FEATURE_SUBSETS.get(cell["add_information"])) + tuple(cell[name] for name in SHARED_FIT_FIELDS)
+
+            if key in fit_groups:
+                fit_groups[key].append(cell)
+            else:
+                fit_groups[key] = [cell]
+                tasks.append(fit_groups[key])
+
+        return tasks
+
+    def _check_model_paths(self, tasks):
+        # concurrently running cells must not overwrite each other's model files
+        seen = {}
+
+        for task in tasks:
+            cell = task[0]
+
+            if not cell["train"]:
+                continue
+
+            path = get_model_path(cell, self.savepath)
+
+            if path in seen:
+                raise ValueError(f"Grid cells {seen[path]} and {cell['cell']} save their models to the same file {path}, "
+                                 "add the distinguishing axes to add_information, additional_marker or fit_group")
+
+            seen[path] = cell["cell"]
+
+    def run_iter(self, cells):
+        """
+        Run the cells of an experiment grid.
+
+        Args:
+            cells (list): The cells (see expand_grid()).
+
+        Raises:
+            ValueError: If several training cells or shared models of fit groups are saved to the same file.
+
+        Returns:
+            generator: The (cell, result row) pairs in order of completion, the row is None for skipped cells.
+        """
+        tasks = self._make_tasks(cells)
+        self._check_model_paths(tasks)
+
+        tasks = sorted(tasks, key=lambda task: -MODELTYPE_COSTS.get(task[0]["modeltype"], 1.0))
+        training_sets = sorted({(cell["featurepath_train"], cell["experimentpath_train"], cell["dtype"]) for cell in cells},
+                               key=str)
+
+        if self.num_jobs == 1 or len(tasks) <= 1:
+            _init_grid_worker(self.savepath, self.table_cache_dir, self.max_dataset_size, [])
+
+            for task in tasks:
+                yield from _run_task(task)
+
+            return
+
+        init_args = (self.savepath, self.table_cache_dir, self.max_dataset_size, training_sets)
+
+        with multiprocessing.Pool(min(self.num_jobs, len(tasks)), _init_grid_worker, init_args) as pool:
+            for results in pool.imap_unordered(_run_task, tasks):
+                yield from results
+
+    def run(self, cells, out_csv_file=None, verbose=True):
+        """
+        Run the cells of an experiment grid and write each result row to a CSV-file as soon as it is available.
+
+        Args:
+            cells (list): The cells (see expand_grid()).
+            out_csv_file (str, optional): The CSV-file the result rows are written to in order of completion (with the
+                cell index as first column), or None. Defaults to None.
+            verbose (bool, optional): Whether to print a line per finished cell. Defaults to True.
+
+        Returns:
+            list: The result rows in cell order, without the skipped cells.
+        """
+        rows = {}
+        writer = None
+        out_file = open(out_csv_file, "w", newline="") if out_csv_file else None
+
+        try:
+            for i, (cell, row) in enumerate(self.run_iter(cells)):
+                axes = " ".join(str(value) for value in cell["axes"].values())
+
+                if row is None:
+                    self.num_skipped += 1
+
+                    if verbose:
+                        print(f"[{i + 1}/{len(cells)}] No data for {axes}")
+
+                    continue
+
+                rows[cell["cell"]] = row
+
+                if verbose:
+                    print(f"[{i + 1}/{len(cells)}] {axes} done (training set size {row['Training set size']}, "
+                          f"testing set size {row['Testing set size']})")
+
+                if out_file is None:
+                    continue
+
+                if writer is None:
+                    writer = csv.DictWriter(out_file, ["cell"] + list(row))
+                    writer.writeheader()
+
+                writer.writerow(dict(row, cell=cell["cell"]))
+                out_file.flush()
+
+        finally:
+            if out_file is not None:
+                out_file.close()
+
+        return [rows[i] for i in sorted(rows)]
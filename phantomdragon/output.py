@@ -0,0 +1,367 @@
+"""Buffered writers and readers for descriptor tables in CSV, NumPy (.npy) and Parquet format."""
+import json
+import os
+import sys
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+
+FORMATS = ("csv", "npy", "parquet")
+DEFAULT_BLOCK_SIZE = 1024
+NPY_HEADER_SIZE = 128
+
+
+class DescriptorWriter:
+    """
+    Base class of the descriptor table writers. Rows are collected in blocks of block_size rows and written at once.
+
+    Args:
+        path (str): The path of the output file.
+        id_name (str): The name of the identifier column (e.g. 'PDB code').
+        column_names (list): The names of the descriptor elements.
+        block_size (int, optional): The number of rows written at once. Defaults to DEFAULT_BLOCK_SIZE.
+    """
+
+    def __init__(self, path, id_name, column_names, block_size=DEFAULT_BLOCK_SIZE):
+        self.path = path
+        self.id_name = id_name
+        self.column_names = list(column_names)
+        self.block_size = block_size
+        self.num_rows = 0
+        self.ids = []
+        self.block = np.empty((block_size, len(self.column_names)))
+
+    def write(self, identifier, values):
+        """
+        Add a row to the table.
+
+        Args:
+            identifier (str): The identifier of the row.
+            values (array-like): The descriptor values.
+        """
+        self.block[len(self.ids) - self.num_rows] = values
+        self.ids.append(identifier)
+
+        if len(self.ids) - self.num_rows == self.block_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the pending rows to the file.
+        """
+        num_pending = len(self.ids) - self.num_rows
+
+        if num_pending > 0:
+            self._write_block(self.ids[self.num_rows :], self.block[:num_pending])
+            self.num_rows = len(self.ids)
+
+    def _write_block(self, ids, values):
+        raise NotImplementedError
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CSVDescriptorWriter(DescriptorWriter):
+    """
+    Writes the rows as text lines 'ID<sep>VALUE<sep>VALUE...' with a header line of column names.
+
+    Args:
+        sep (str, optional): The field separator. Defaults to ', '.
+        append (bool, optional): Whether to append to an existing file, which then already has the header line.
+            Defaults to False.
+    """
+
+    def __init__(self, path, id_name, column_names, block_size=DEFAULT_BLOCK_SIZE, sep=", ", append=False):
+        super().__init__(path, id_name, column_names, block_size)
+        self.sep = sep
+        self.file = open(path, "a" if append else "w")
+
+        if self.file.tell() == 0:
+            self.file.write(self.header_line(id_name, column_names, sep) + "\n")
+            self.file.flush()
+
+    @staticmethod
+    def header_line(id_name, column_names, sep=", "):
+        """
+        Returns:
+            str: The header line (without newline) written for the given columns.
+        """
+        return sep.join([id_name] + list(column_names))
+
+    def _write_block(self, ids, values):
+        self.file.write(
+            "".join(identifier + self.sep + self.sep.join(map(str, row)) + "\n" for identifier, row in zip(ids, values.tolist()))
+        )
+        self.file.flush()
+
+    def close(self):
+        super().close()
+        self.file.close()
+
+
+class NPYDescriptorWriter(DescriptorWriter):
+    """
+    Writes the descriptor values as float64 matrix to a NumPy .npy file. The identifiers and column names are stored in
+    the JSON file <path>.json. The array header reserves NPY_HEADER_SIZE bytes and gets its final shape on close.
+    """
+
+    def __init__(self, path, id_name, column_names, block_size=DEFAULT_BLOCK_SIZE):
+        super().__init__(path, id_name, column_names, block_size)
+        self.file = open(path, "wb")
+        self._write_header(0)
+
+    def _write_header(self, num_rows):
+        header = {"descr": np.lib.format.dtype_to_descr(np.dtype(np.float64)), "fortran_order": False,
+                  "shape": (num_rows, len(self.column_names))}
+
+        self.file.seek(0)
+        np.lib.format.write_array_header_1_0(self.file, header)
+
+        if self.file.tell() != NPY_HEADER_SIZE:
+            raise ValueError(f"Unexpected .npy header size {self.file.tell()}")
+
+        self.file.seek(0, os.SEEK_END)
+
+    def _write_block(self, ids, values):
+        self.file.write(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+
+    def close(self):
+        super().close()
+        self._write_header(self.num_rows)
+        self.file.close()
+
+        with open(self.path + ".json", "w") as file:
+            json.dump({"id_name": self.id_name, "columns": self.column_names, "ids": self.ids}, file)
+
+
+class ParquetDescriptorWriter(DescriptorWriter):
+    """
+    Writes a Parquet file with a string identifier column and one float64 column per descriptor element. Every block
+    becomes a row group. Requires pyarrow.
+    """
+
+    def __init__(self, path, id_name, column_names, block_size=DEFAULT_BLOCK_SIZE):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Parquet output requires the pyarrow package") from e
+
+        super().__init__(path, id_name, column_names, block_size)
+        self.pa = pa
+        self.schema = pa.schema([(id_name, pa.string())] + [(name, pa.float64()) for name in self.column_names])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def _write_block(self, ids, values):
+        columns = [self.pa.array(ids, self.pa.string())] + [self.pa.array(values[:, i]) for i in range(values.shape[1])]
+        self.writer.write_table(self.pa.Table.from_arrays(columns, schema=self.schema))
+
+    def close(self):
+        super().close()
+        self.writer.close()
+
+
+def create_writer(format, path, id_name, column_names, block_size=DEFAULT_BLOCK_SIZE, sep=", ", append=False):
+    """
+    Create a descriptor table writer.
+
+    Args:
+        format (str): One of FORMATS.
+        path (str): The path of the output file.
+        id_name (str): The name of the identifier column.
+        column_names (list): The names of the descriptor elements.
+        block_size (int, optional): The number of rows written at once. Defaults to DEFAULT_BLOCK_SIZE.
+        sep (str, optional): The field separator of CSV output. Defaults to ', '.
+        append (bool, optional): Whether to append to an existing CSV-file. Defaults to False.
+
+    Raises:
+        ValueError: If the format is unknown or appending is requested for a binary format.
+
+    Returns:
+        DescriptorWriter: The writer.
+    """
+    if format == "csv":
+        return CSVDescriptorWriter(path, id_name, column_names, block_size, sep, append)
+
+    if append:
+        raise ValueError(f"Appending to {format} descriptor files is not supported")
+
+    if format == "npy":
+        return NPYDescriptorWriter(path, id_name, column_names, block_size)
+
+    if format == "parquet":
+        return ParquetDescriptorWriter(path, id_name, column_names, block_size)
+
+    raise ValueError(f"Unknown descriptor file format '{format}'")
+
+
+def read_descriptors(path, identifier="PDB code", csv_names=True, exact=False, dtype=None):
+    """
+    Read a descriptor table written in one of the supported formats. The format is determined by the file extension.
+
+    Args:
+        path (str): The path of the descriptor file.
+        identifier (str, optional): The identifier column name, read as string. Defaults to 'PDB code'.
+        csv_names (bool, optional): Whether the descriptor columns of binary files get the names of the ', '-separated CSV
+            export (with leading space, e.g. ' ES_ENERGY'). Defaults to True.
+        exact (bool, optional): Whether CSV values are parsed without rounding error (slower), so that they are written
+            again exactly as read. Defaults to False.
+        dtype (str, optional): The dtype of the descriptor columns (e.g. 'float32', which halves the memory of large
+            tables). CSV values are parsed directly into it. Defaults to None (float64, or the dtype of binary files).
+
+    Returns:
+        pandas.DataFrame: The identifier column followed by the descriptor columns.
+    """
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext == ".npy":
+        with open(path + ".json") as file:
+            meta = json.load(file)
+
+        values = np.load(path, mmap_mode="r")
+
+        if dtype is not None and values.dtype != np.dtype(dtype):
+            values = values.astype(dtype)
+
+        data = pd.DataFrame(values, columns=meta["columns"])
+        data.insert(0, meta["id_name"], pd.Series(meta["ids"], dtype=str))
+
+    elif ext == ".parquet":
+        data = pd.read_parquet(path)
+
+        if dtype is not None:
+            data = data.astype({name: dtype for name in data.columns[1:]})
+
+    else:
+        if dtype is not None:
+            dtypes = defaultdict(lambda: dtype, {identifier: str})
+        else:
+            dtypes = {identifier: str}
+
+        return pd.read_csv(path, dtype=dtypes, float_precision="round_trip" if exact else None)
+
+    if csv_names:
+        data.columns = [data.columns[0]] + [" " + name for name in data.columns[1:]]
+
+    return data
+
+
+def get_variant_path(out_path, variant):
+    """
+    Returns:
+        str: The output path of a descriptor variant: the '{variant}' placeholder of out_path replaced by the variant
+            name or, without placeholder, '_<variant>' inserted before the file extension.
+    """
+    if "{variant}" in out_path:
+        return out_path.replace("{variant}", variant)
+
+    root, ext = os.path.splitext(out_path)
+
+    return root + "_" + variant + ext
+
+
+def get_failure_ledger_path(out_path):
+    return out_path + ".failed"
+
+
+class FailureLedger:
+    """
+    Text file listing the inputs that could not be processed as lines 'ID, REASON'.
+
+    Args:
+        path (str): The path of the ledger file.
+        append (bool, optional): Whether to append to an existing ledger. Defaults to False.
+    """
+
+    def __init__(self, path, append=False):
+        self.path = path
+        self.file = open(path, "a" if append else "w")
+
+    def write(self, identifier, reason):
+        self.file.write(identifier + ", " + " ".join(reason.split()) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def read_failure_ledger(path):
+    """
+    Returns:
+        list: The (identifier, reason) entries of a failure ledger.
+    """
+    entries = []
+
+    with open(path) as file:
+        for line in file:
+            if line.strip():
+                identifier, _, reason = line.rstrip("\n").partition(",")
+                entries.append((identifier.strip(), reason.strip()))
+
+    return entries
+
+
+def load_processed_ids(path, header_line=None):
+    """
+    Collect the identifiers of the records of a CSV-file or failure ledger written by an interrupted run. Every record of
+    such a file is terminated by a newline, thus a non-empty last line is a torn record, which gets removed from the file
+    together with records of the wrong field count.
+
+    Args:
+        path (str): The path of the file.
+        header_line (str, optional): The expected header line of a CSV-file, or None for a ledger without header.
+            Defaults to None.
+
+    Raises:
+        ValueError: If the header line of the file does not match.
+
+    Returns:
+        set: The identifiers.
+    """
+    ids = set()
+
+    if not os.path.isfile(path):
+        return ids
+
+    with open(path, "r") as file:
+        lines = file.read().split("\n")
+
+    valid_lines = []
+
+    for i, line in enumerate(lines[:-1]):
+        if header_line is not None:
+            if i == 0:
+                if line != header_line:
+                    raise ValueError(f"Column names of {path} do not match the calculated descriptor")
+
+                valid_lines.append(line)
+                continue
+
+            if line.count(",") != header_line.count(","):
+                continue
+
+        if line:
+            ids.add(line.split(",", 1)[0].strip())
+            valid_lines.append(line)
+
+    num_discarded = len(lines) - 1 - len(valid_lines) + (1 if lines[-1] else 0)
+
+    if num_discarded > 0:
+        print(f"!! Discarding {num_discarded} incomplete record(s) of {path}", file=sys.stderr)
+
+        with open(path + ".tmp", "w") as file:
+            for line in valid_lines:
+                file.write(line + "\n")
+
+        os.replace(path + ".tmp", path)
+
+    return ids
@@ -0,0 +1,131 @@
+"""Scoring of a ligand library against a panel of receptors (e.g. for cross-target and selectivity profiling)."""
+import numpy as np
+
+import CDPL.Chem as Chem
+import CDPL.Math as Math
+import CDPL.GRAIL as GRAIL
+
+from .descriptors import create_descriptor_calculator, descriptor_names, extract_ligand_environment, get_ligand_name
+
+
+class PanelScorer:
+    """
+    Calculates the descriptors of the ligands of a library in complex with each receptor of a panel. The ligand poses are
+    used as they are for all receptors, which therefore have to share their coordinate frame (e.g. superimposed
+    structures). Every ligand is read and prepared once and its receptor-independent elements (the first
+    LIGAND_DESCRIPTOR_SIZE elements PI_COUNT ... TPSA) are calculated once and reused for the other receptors, for which
+    only the interaction elements are calculated. A binding site given for a receptor is initialized once.
+
+    Args:
+        receptors (list): The (name, descriptors.Receptor) pairs of the panel, prepared with the same norm_chgs setting.
+        ext_descr (bool, optional): Whether to calculate X-GRADE instead of GRADE. Defaults to False.
+        site_envs (list, optional): The binding site of each receptor, or None to use the environment of each ligand (see
+            descriptors.extract_ligand_environment()). Defaults to None.
+
+    Raises:
+        ValueError: If the receptors were prepared with different norm_chgs settings.
+    """
+
+    def __init__(self, receptors, ext_descr=False, site_envs=None):
+        if len({receptor.norm_chgs for name, receptor in receptors}) > 1:
+            raise ValueError("The receptors of a panel have to be prepared with the same norm_chgs setting")
+
+        self.receptor_names = [name for name, receptor in receptors]
+        self.receptors = [receptor for name, receptor in receptors]
+        self.norm_chgs = self.receptors[0].norm_chgs if self.receptors else False
+        self.names = descriptor_names(ext_descr)
+        self.site_envs = site_envs if site_envs is not None else [None] * len(self.receptors)
+        self.descr_calcs = [create_descriptor_calculator(ext_descr) for receptor in self.receptors]
+        self.num_ligand_elements = self.descr_calcs[0].LIGAND_DESCRIPTOR_SIZE if self.receptors else 0
+        self.num_ligands = 0
+        self.num_failed = 0
+
+        for descr_calc, site_env in zip(self.descr_calcs, self.site_envs):
+            if site_env is not None:
+                descr_calc.initTargetData(site_env, Chem.Atom3DCoordinatesFunctor())
+
+    def score(self, ligand):
+        """
+        Calculate the descriptors of a ligand in complex with every receptor of the panel.
+
+        Args:
+            ligand (Chem.Molecule): The ligand, which gets prepared.
+
+        Returns:
+            tuple: The descriptor matrix (numpy.ndarray) with one row per receptor, rows of failed receptors are NaN, and
+                the list of error messages per receptor (None for success).
+        """
+        descriptors = np.full((len(self.receptors), len(self.names)), np.nan)
+        errors = [None] * len(self.receptors)
+        lig_atom_coords = Math.Vector3DArray()
+        lig_part = None
+
+        self.num_ligands += 1
+
+        try:
+            GRAIL.prepareForGRAILDescriptorCalculation(ligand, self.norm_chgs)
+            Chem.get3DCoordinates(ligand, lig_atom_coords)
+
+        except Exception as e:
+            self.num_failed += len(self.receptors)
+            return descriptors, [str(e)] * len(self.receptors)
+
+        for i, (receptor, descr_calc, site_env) in enumerate(zip(self.receptors, self.descr_calcs, self.site_envs)):
+            descr = Math.DVector()
+
+            try:
+                if site_env is None:
+                    descr_calc.initTargetData(extract_ligand_environment(ligand, receptor.protein), Chem.Atom3DCoordinatesFunctor())
+
+                descr_calc.initLigandData(ligand)
+
+                if lig_part is None:
+                    descr_calc.calculate(lig_atom_coords, descr)
+                    descriptors[i] = descr.toArray()
+                    lig_part = descriptors[i, : self.num_ligand_elements]
+                else:
+                    descr.resize(len(self.names), 0.0)
+                    descr_calc.calculate(lig_atom_coords, descr, False)
+                    descriptors[i] = descr.toArray()
+                    descriptors[i, : self.num_ligand_elements] = lig_part
+
+            except Exception as e:
+                descriptors[i] = np.nan
+                errors[i] = str(e)
+                self.num_failed += 1
+
+        return descriptors, errors
+
+    def run(self, lig_file):
+        """
+        Score all ligands of a file.
+
+        Args:
+            lig_file (str): The ligand file.
+
+        Yields:
+            tuple: The ligand name, its descriptor matrix and error list (see score()).
+        """
+        lig_reader = Chem.MoleculeReader(lig_file)
+        ligand = Chem.BasicMolecule()
+        lig_idx = 0
+
+        Chem.setMultiConfImportParameter(lig_reader, False)
+
+        while lig_reader.read(ligand):
+            lig_idx += 1
+            descriptors, errors = self.score(ligand)
+
+            yield get_ligand_name(ligand, lig_idx), descriptors, errors
+
+    def report(self):
+        """
+        Returns:
+            str: A summary of the scored ligand-receptor pairs and the ligand preparations saved.
+        """
+        num_pairs = self.num_ligands * len(self.receptors)
+
+        return (
+            f"Panel: {self.num_ligands} ligands x {len(self.receptors)} receptors = {num_pairs} pairs, {self.num_failed} failed, "
+            f"{max(num_pairs - self.num_ligands, 0)} ligand preparations and intrinsic descriptor calculations saved"
+        )
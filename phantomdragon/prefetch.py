@@ -0,0 +1,109 @@
+"""Bounded read-ahead of input data by background threads."""
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Prefetcher:
+    """
+    Iterates over items together with their data loaded ahead of time by reader threads, so that the loading of the next
+    items overlaps with the processing of the current one. At most depth items are loaded ahead; the input order is kept.
+
+    Args:
+        items (iterable): The items.
+        load (callable): Loads the data of an item. Exceptions are passed on as the data of the item.
+        num_threads (int, optional): The number of reader threads. Defaults to 2.
+        depth (int, optional): The maximum number of items loaded ahead. Defaults to 8.
+    """
+
+    def __init__(self, items, load, num_threads=2, depth=8):
+        self.items = items
+        self.load = load
+        self.num_threads = num_threads
+        self.depth = max(depth, 1)
+        self.num_items = 0
+        self.num_stalls = 0
+        self.stall_time = 0.0
+        self.load_time = 0.0
+        self.depth_sum = 0
+        self.max_depth = 0
+
+    def _timed_load(self, item):
+        start_time = time.perf_counter()
+
+        try:
+            data = self.load(item)
+
+        except Exception as e:
+            data = e
+
+        return data, time.perf_counter() - start_time
+
+    def __iter__(self):
+        """
+        Yields:
+            tuple: The item, its data (or the exception raised by load) and the time in seconds the consumer waited for the
+                data.
+        """
+        items = iter(self.items)
+        pending = deque()
+
+        with ThreadPoolExecutor(self.num_threads) as executor:
+            for item in items:
+                pending.append((item, executor.submit(self._timed_load, item)))
+
+                if len(pending) == self.depth:
+                    break
+
+            while pending:
+                item, future = pending.popleft()
+                ready = sum(1 for _, f in pending if f.done()) + future.done()
+
+                self.depth_sum += ready
+                self.max_depth = max(self.max_depth, ready)
+
+                start_time = time.perf_counter()
+
+                if not future.done():
+                    self.num_stalls += 1
+
+                data, load_time = future.result()
+                wait_time = time.perf_counter() - start_time
+
+                self.stall_time += wait_time
+                self.load_time += load_time
+                self.num_items += 1
+
+                for next_item in items:
+                    pending.append((next_item, executor.submit(self._timed_load, next_item)))
+                    break
+
+                yield item, data, wait_time
+
+    def stats(self):
+        """
+        Returns:
+            dict: The number of items, the number of stalls (items not loaded when needed), the total stall and load time
+                and the mean and maximum number of loaded items waiting in the queue.
+        """
+        return {
+            "items": self.num_items,
+            "stalls": self.num_stalls,
+            "stall_time": self.stall_time,
+            "load_time": self.load_time,
+            "mean_queue_depth": self.depth_sum / self.num_items if self.num_items > 0 else 0.0,
+            "max_queue_depth": self.max_depth,
+        }
+
+    def report(self):
+        """
+        Returns:
+            str: A one-line summary of the prefetch statistics.
+        """
+        stats = self.stats()
+
+        return (
+            f"Prefetch ({self.num_threads} reader threads, depth {self.depth}): {stats['items']} items, "
+            f"{stats['load_time']:.2f} s loading, {stats['stalls']} stalls with {stats['stall_time']:.2f} s waiting, "
+            f"queue depth mean {stats['mean_queue_depth']:.1f} max {stats['max_queue_depth']}"
+        )
@@ -0,0 +1,111 @@
+"""Byte-offset index of the records in SD-files for random access to large ligand libraries."""
+import mmap
+import os
+
+import numpy as np
+
+
+RECORD_END_TAG = b"$$$$"
+
+
+def build_sdf_index(sdf_path):
+    """
+    Scan an SD-file for the record delimiter lines.
+
+    Args:
+        sdf_path (str): The path of the SD-file.
+
+    Returns:
+        numpy.ndarray: The int64 byte offsets of the record starts followed by the offset of the end of the last record,
+            i.e. record i spans the bytes [offsets[i], offsets[i + 1]).
+    """
+    offsets = [0]
+
+    with open(sdf_path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+
+        if size == 0:
+            return np.zeros(1, dtype=np.int64)
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            pos = 0
+
+            while True:
+                pos = data.find(RECORD_END_TAG, pos)
+
+                if pos < 0:
+                    break
+
+                if pos > 0 and data[pos - 1] != ord("\n"):
+                    pos += len(RECORD_END_TAG)
+                    continue
+
+                pos = data.find(b"\n", pos)
+                pos = size if pos < 0 else pos + 1
+                offsets.append(pos)
+
+            # a last record without terminating delimiter line
+            if offsets[-1] < size and data[offsets[-1] :].strip():
+                offsets.append(size)
+
+    return np.array(offsets, dtype=np.int64)
+
+
+def get_index_path(sdf_path):
+    return sdf_path + ".idx.npy"
+
+
+def load_sdf_index(sdf_path, index_path=None):
+    """
+    Load the record index of an SD-file, (re)building and saving it if it does not exist or is outdated.
+
+    Args:
+        sdf_path (str): The path of the SD-file.
+        index_path (str, optional): The path of the index file. Defaults to None, which means <sdf_path>.idx.npy.
+
+    Returns:
+        numpy.ndarray: The record offsets (see build_sdf_index).
+    """
+    if index_path is None:
+        index_path = get_index_path(sdf_path)
+
+    sdf_stat = os.stat(sdf_path)
+
+    if os.path.isfile(index_path) and os.stat(index_path).st_mtime_ns >= sdf_stat.st_mtime_ns:
+        offsets = np.load(index_path)
+
+        if len(offsets) > 0 and offsets[-1] <= sdf_stat.st_size and (len(offsets) > 1 or sdf_stat.st_size == 0):
+            return offsets
+
+    offsets = build_sdf_index(sdf_path)
+
+    try:
+        with open(index_path, "wb") as file:
+            np.save(file, offsets)
+
+    except OSError:  # e.g. read-only data directory -> index is only kept in memory
+        pass
+
+    return offsets
+
+
+def read_sdf_records(sdf_path, offsets, start, stop):
+    """
+    Read a range of records from an SD-file.
+
+    Args:
+        sdf_path (str): The path of the SD-file.
+        offsets (numpy.ndarray): The record offsets (see build_sdf_index).
+        start (int): The index of the first record.
+        stop (int): The index after the last record.
+
+    Returns:
+        list: The record data as bytes objects.
+    """
+    with open(sdf_path, "rb") as file:
+        file.seek(offsets[start])
+        data = file.read(offsets[stop] - offsets[start])
+
+    rel_offsets = offsets[start : stop + 1] - offsets[start]
+
+    return [data[rel_offsets[i] : rel_offsets[i + 1]] for i in range(stop - start)]
@@ -0,0 +1,230 @@
+"""Deterministic partitioning of complex collections into shards and merging of the per-shard descriptor outputs."""
+import hashlib
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from .output import get_failure_ledger_path, read_descriptors, read_failure_ledger
+
+
+MANIFEST_VERSION = 1
+
+
+def parse_shard(spec):
+    """
+    Parse a shard specification 'i/N' (1 <= i <= N).
+
+    Raises:
+        ValueError: If the specification is malformed.
+
+    Returns:
+        tuple: The shard number i and the number of shards N.
+    """
+    try:
+        shard, num_shards = (int(part) for part in spec.split("/"))
+
+    except ValueError:
+        raise ValueError(f"Invalid shard specification '{spec}', expected i/N") from None
+
+    if num_shards < 1 or not 1 <= shard <= num_shards:
+        raise ValueError(f"Invalid shard specification '{spec}', expected 1 <= i <= N")
+
+    return shard, num_shards
+
+
+def get_shard(name, num_shards):
+    """
+    Returns:
+        int: The shard number (1..num_shards) of a complex, which depends only on its name.
+    """
+    digest = hashlib.sha1(name.encode()).digest()
+
+    return int.from_bytes(digest[:8], "big") % num_shards + 1
+
+
+class ShardSource:
+    """
+    The complexes of a source that belong to a shard. The names of all complexes of the shard that were passed on are
+    collected in codes.
+
+    Args:
+        source (iterable): The ComplexInput items (e.g. a DirectorySource).
+        shard (int): The shard number (1..num_shards).
+        num_shards (int): The number of shards.
+    """
+
+    def __init__(self, source, shard, num_shards):
+        self.source = source
+        self.shard = shard
+        self.num_shards = num_shards
+        self.codes = []
+
+    def __iter__(self):
+        for item in self.source:
+            if get_shard(item.name, self.num_shards) == self.shard:
+                self.codes.append(item.name)
+                yield item
+
+
+def get_manifest_path(out_path):
+    return out_path + ".manifest.json"
+
+
+def write_manifest(out_path, shard, num_shards, out_format, id_name, column_names, codes=None, settings=None):
+    """
+    Write the manifest of a shard output next to it. A manifest without codes marks a shard that is still running (or
+    was interrupted).
+
+    Args:
+        out_path (str): The path of the descriptor output of the shard.
+        shard (int): The shard number.
+        num_shards (int): The number of shards.
+        out_format (str): The format of the descriptor output (see output.FORMATS).
+        id_name (str): The name of the identifier column.
+        column_names (list): The names of the descriptor elements.
+        codes (list, optional): The names of all complexes of the shard, or None if the shard is not complete. Defaults to
+            None.
+        settings (dict, optional): The calculation settings, which have to agree between shards. Defaults to None.
+    """
+    manifest_path = get_manifest_path(out_path)
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "shard": shard,
+        "num_shards": num_shards,
+        "output": os.path.relpath(out_path, os.path.dirname(os.path.abspath(manifest_path))),
+        "format": out_format,
+        "id_name": id_name,
+        "columns": list(column_names),
+        "settings": settings or {},
+        "complete": codes is not None,
+        "codes": sorted(codes) if codes is not None else [],
+    }
+
+    with open(manifest_path + ".tmp", "w") as file:
+        json.dump(manifest, file, indent=1)
+
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+
+def load_manifest(manifest_path):
+    """
+    Returns:
+        dict: The manifest, with the output path resolved relative to the manifest location.
+    """
+    with open(manifest_path) as file:
+        manifest = json.load(file)
+
+    manifest["output"] = os.path.join(os.path.dirname(os.path.abspath(manifest_path)), manifest["output"])
+
+    return manifest
+
+
+MergedShards = namedtuple(
+    "MergedShards", ["id_name", "columns", "ids", "values", "failures", "missing_shards", "incomplete_shards", "missing", "duplicates", "misplaced"]
+)
+"""
+The combined shard outputs: the identifier column name, the descriptor names, the sorted identifiers with their descriptor
+matrix, the sorted (identifier, reason) failures, and the problems found (shard numbers without or with incomplete
+manifest, complexes neither calculated nor failed, complexes reported more than once, complexes found in the wrong shard).
+"""
+
+
+def merge_shards(manifest_paths):
+    """
+    Combine the outputs of the shards of a sharded descriptor calculation and check them for completeness.
+
+    Args:
+        manifest_paths (list): The manifest files of the shards.
+
+    Raises:
+        ValueError: If the shards do not belong to the same calculation (number of shards, columns or settings differ).
+
+    Returns:
+        MergedShards: The combined outputs. Duplicated complexes are included once (from the first shard).
+    """
+    manifests = [load_manifest(path) for path in manifest_paths]
+
+    if not manifests:
+        raise ValueError("No shard manifests given")
+
+    first = manifests[0]
+
+    for manifest in manifests[1:]:
+        for key in ("num_shards", "id_name", "columns", "settings"):
+            if manifest[key] != first[key]:
+                raise ValueError(f"Shard {manifest['shard']} differs from shard {first['shard']} in {key}")
+
+    id_name = first["id_name"]
+    shards = {}
+    incomplete_shards = set()
+
+    for manifest in sorted(manifests, key=lambda manifest: manifest["shard"]):
+        if manifest["shard"] in shards:
+            raise ValueError(f"Shard {manifest['shard']} given more than once")
+
+        shards[manifest["shard"]] = manifest
+
+        if not manifest["complete"]:
+            incomplete_shards.add(manifest["shard"])
+
+    missing_shards = sorted(set(range(1, first["num_shards"] + 1)) - set(shards))
+    occurrences = {}
+    id_blocks = []
+    value_blocks = []
+    failures = []
+    misplaced = set()
+
+    for shard, manifest in sorted(shards.items()):
+        reported = []
+
+        if os.path.isfile(manifest["output"]):
+            data = read_descriptors(manifest["output"], id_name, csv_names=False, exact=True)
+            ids = data.iloc[:, 0].astype(str).tolist()
+
+            id_blocks.append(ids)
+            value_blocks.append(data.iloc[:, 1:].to_numpy(dtype=np.float64))
+            reported += ids
+
+        ledger_path = get_failure_ledger_path(manifest["output"])
+
+        if os.path.isfile(ledger_path):
+            ledger = read_failure_ledger(ledger_path)
+
+            failures += ledger
+            reported += [identifier for identifier, reason in ledger]
+
+        for identifier in reported:
+            occurrences[identifier] = occurrences.get(identifier, 0) + 1
+
+            if get_shard(identifier, first["num_shards"]) != shard:
+                misplaced.add(identifier)
+
+    expected = set()
+
+    for manifest in shards.values():
+        expected.update(manifest["codes"])
+
+    num_columns = len(first["columns"])
+    ids = [identifier for block in id_blocks for identifier in block]
+    values = np.concatenate(value_blocks) if value_blocks else np.empty((0, num_columns))
+
+    # sorted order, first occurrence of duplicated complexes
+    order = sorted(range(len(ids)), key=lambda i: (ids[i], i))
+    keep = [i for n, i in enumerate(order) if n == 0 or ids[order[n - 1]] != ids[i]]
+    done = set(ids)
+    failures = sorted({identifier: (identifier, reason) for identifier, reason in reversed(failures) if identifier not in done}.values())
+
+    return MergedShards(
+        id_name,
+        first["columns"],
+        [ids[i] for i in keep],
+        values[keep],
+        failures,
+        missing_shards,
+        sorted(incomplete_shards),
+        sorted(expected - set(occurrences)),
+        sorted(identifier for identifier, num in occurrences.items() if num > 1),
+        sorted(misplaced),
+    )
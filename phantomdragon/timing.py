@@ -0,0 +1,180 @@
+"""Per-item, per-stage wall time and counter recording for the descriptor calculation pipeline."""
+import json
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class StageTimer:
+    """
+    Records the wall time spent in the stages of processing an item (e.g. a complex), together with counters such as atom
+    counts and the category of failures. Every finished item yields one record:
+
+        {"id": ..., "status": "ok" | "cached" | "failed", "total": seconds, "stages": {stage: seconds},
+         "counts": {name: value}, "failure": category, "failed_stage": stage}
+
+    Args:
+        log_path (str, optional): A file the records are appended to as JSON lines. Defaults to None.
+    """
+
+    def __init__(self, log_path=None):
+        self.records = []
+        self.current = None
+        self.start_time = None
+        self.log_file = open(log_path, "a") if log_path else None
+
+    def begin(self, item_id):
+        """
+        Start recording a new item.
+
+        Args:
+            item_id (str): The identifier of the item.
+        """
+        self.current = {"id": item_id, "status": "ok", "total": 0.0, "stages": {}, "counts": {}}
+        self.start_time = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Context manager measuring the wall time of a stage of the current item. Time of repeated stages is summed up. An
+        exception raised within the stage marks it as the failed stage.
+
+        Args:
+            name (str): The name of the stage.
+        """
+        start_time = time.perf_counter()
+
+        try:
+            yield
+
+        except Exception:
+            self.current["failed_stage"] = name
+            raise
+
+        finally:
+            stages = self.current["stages"]
+            stages[name] = stages.get(name, 0.0) + time.perf_counter() - start_time
+
+    def count(self, name, value):
+        """
+        Set a counter of the current item, e.g. an atom count.
+        """
+        self.current["counts"][name] = value
+
+    def fail(self, category):
+        """
+        Mark the current item as failed.
+
+        Args:
+            category (str): The failure category, e.g. 'reading ligand failed' or an exception type.
+        """
+        self.current["status"] = "failed"
+        self.current["failure"] = category
+
+    def end(self, status=None):
+        """
+        Finish the current item.
+
+        Args:
+            status (str, optional): Overrides the status of the item (e.g. 'cached'). Defaults to None.
+
+        Returns:
+            dict: The record of the item.
+        """
+        record = self.current
+
+        if status is not None:
+            record["status"] = status
+
+        record["total"] = time.perf_counter() - self.start_time
+        self.current = None
+        self.add(record)
+
+        return record
+
+    def add(self, record):
+        """
+        Add a record that was produced elsewhere (e.g. by a worker process).
+        """
+        self.records.append(record)
+
+        if self.log_file is not None:
+            self.log_file.write(json.dumps(record) + "\n")
+            self.log_file.flush()
+
+    def close(self):
+        if self.log_file is not None:
+            self.log_file.close()
+
+
+def load_records(log_path):
+    """
+    Returns:
+        list: The records of a log written by StageTimer.
+    """
+    with open(log_path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def summarize(records, num_slowest=10):
+    """
+    Create a report of the per-stage wall time distribution, the slowest items and the failure categories.
+
+    Args:
+        records (list): The records of a StageTimer.
+        num_slowest (int, optional): The number of slowest items listed. Defaults to 10.
+
+    Returns:
+        str: The report.
+    """
+    lines = []
+    statuses = {}
+    failures = {}
+    stage_times = {}
+
+    for record in records:
+        statuses[record["status"]] = statuses.get(record["status"], 0) + 1
+
+        if record["status"] == "failed":
+            category = record.get("failure", "unknown")
+
+            if "failed_stage" in record:
+                category += " (in %s)" % record["failed_stage"]
+
+            failures[category] = failures.get(category, 0) + 1
+
+        if record["status"] == "cached":
+            continue
+
+        for stage, seconds in record["stages"].items():
+            stage_times.setdefault(stage, []).append(seconds)
+
+        stage_times.setdefault("total", []).append(record["total"])
+
+    lines.append("Items: %s" % ", ".join("%s %s" % (num, status) for status, num in sorted(statuses.items())))
+    lines.append("%-28s %8s %10s %10s %10s %10s %7s" % ("Stage", "Count", "Sum [s]", "p50 [s]", "p95 [s]", "Max [s]", "Share"))
+
+    total_time = sum(stage_times.get("total", [])) or 1.0
+
+    for stage, times in stage_times.items():
+        times = np.array(times)
+        lines.append("%-28s %8d %10.3f %10.4f %10.4f %10.4f %6.1f%%" % (stage, len(times), times.sum(), np.percentile(times, 50),
+                                                                      np.percentile(times, 95), times.max(), 100.0 * times.sum() / total_time))
+
+    timed = sorted((record for record in records if record["status"] != "cached"), key=lambda record: record["total"], reverse=True)
+
+    if timed:
+        lines.append("Slowest items:")
+
+        for record in timed[:num_slowest]:
+            counts = ", ".join("%s=%s" % (name, value) for name, value in record["counts"].items())
+            lines.append("  %-16s %8.3f s  %s" % (record["id"], record["total"], counts))
+
+    if failures:
+        lines.append("Failures:")
+
+        for category, num in sorted(failures.items(), key=lambda item: -item[1]):
+            lines.append("  %5d  %s" % (num, category))
+
+    return "\n".join(lines)
@@ -0,0 +1,199 @@
+# -*- mode: python; tab-width: 4 -*-
+
+##
+# bench_env_radius.py
+#
+# Copyright (C) 2023 Thomas A. Seidel <thomas.seidel@univie.ac.at>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; see the file COPYING. If not, write to
+# the Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+##
+
+import argparse
+import sys
+
+import numpy as np
+
+from phantomdragon.descriptors import DIRECTORY_LAYOUTS, LIG_ENV_MAX_RADIUS, RADIUS_DEPENDENT_ELEMENTS, DescriptorEngine, open_complex_source
+
+
+# stages whose work depends on the size of the ligand environment
+ENV_STAGES = ['extract_environment', 'remove_non_std_residues', 'extract_sssr', 'init_target_data', 'init_ligand_data', 'calculate']
+
+
+def parseEnvRadius(value):
+    try:
+        radius = float(value)
+
+    except ValueError:
+        raise argparse.ArgumentTypeError('invalid radius: %s' % value)
+
+    if radius <= 0.0:
+        raise argparse.ArgumentTypeError('invalid radius: %s' % value)
+
+    return radius
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description='Compares the descriptors calculated with a smaller ligand environment radius to those of the default radius (e.g. on the PDBbind core set) and reports the deviations and the time saved.')
+
+    parser.add_argument('-d',
+                        dest='complex_data_dir',
+                        required=True,
+                        help='[Required] The directory (or .tar(.gz)/.zip archive) containing the ligand-protein complexes to process.',
+                        nargs=1)
+    parser.add_argument('-l',
+                        dest='layout',
+                        help='[Optional] Organization of the complex directory: pdbbind or plrex (default: pdbbind)·',
+                        choices=list(DIRECTORY_LAYOUTS),
+                        default='pdbbind')
+    parser.add_argument('-r',
+                        dest='env_radius',
+                        required=True,
+                        help='[Required] The environment radius to verify in Angstrom.',
+                        type=parseEnvRadius)
+    parser.add_argument('-B',
+                        dest='base_radius',
+                        help='[Optional] The baseline environment radius in Angstrom (default: %.1f)·' % LIG_ENV_MAX_RADIUS,
+                        type=parseEnvRadius,
+                        default=LIG_ENV_MAX_RADIUS)
+    parser.add_argument('--atol',
+                        dest='atol',
+                        help='[Optional] Absolute tolerance of the descriptor deviations (default: 1e-6)·',
+                        type=float,
+                        default=1e-6)
+    parser.add_argument('--rtol',
+                        dest='rtol',
+                        help='[Optional] Relative tolerance of the descriptor deviations (default: 1e-6)·',
+                        type=float,
+                        default=1e-6)
+    parser.add_argument('--strict',
+                        dest='strict',
+                        help='[Optional] Also require %s, which have no distance cutoff, to be within the tolerance (default: false)·' % ' and '.join(RADIUS_DEPENDENT_ELEMENTS),
+                        action='store_true',
+                        default=False)
+    parser.add_argument('-x',
+                        dest='ext_descr',
+                        help='[Optional] Calculate extended GRAIL descriptor with subdivided HBA/HBD feature types (default: false)·',
+                        action='store_true',
+                        default=False)
+    parser.add_argument('-c',
+                        dest='norm_chgs',
+                        help='[Optional] Change protonation of acidic/basic groups to a state likely at pH7 (default: false)·',
+                        action='store_true',
+                        default=False)
+    parser.add_argument('-o',
+                        dest='out_csv_file',
+                        help='[Optional] Write the maximum absolute and relative deviation and the number of complexes out of tolerance of each descriptor element to a CSV-file (default: none)·',
+                        default=None)
+
+    return parser.parse_args()
+
+def getEnvTime(record):
+    return sum(record['stages'].get(stage, 0.0) for stage in ENV_STAGES)
+
+def printTiming(title, records):
+    env_times = [getEnvTime(record) for record in records]
+    totals = [record['total'] for record in records]
+    env_atoms = [record['counts'].get('env_atoms', 0) for record in records]
+
+    print('%s: %.3f s per complex (environment dependent stages %.3f s), %.0f environment atoms on average' %
+          (title, np.mean(totals), np.mean(env_times), np.mean(env_atoms)))
+
+    return np.sum(env_times)
+
+def process(args):
+    base_engine = DescriptorEngine(args.ext_descr, args.norm_chgs, env_radius=args.base_radius)
+    engine = DescriptorEngine(args.ext_descr, args.norm_chgs, env_radius=args.env_radius)
+    names = engine.names
+    base_records = []
+    records = []
+    base_descrs = []
+    descrs = []
+
+    print('Comparing environment radius %.1f to %.1f Angstrom...' % (args.env_radius, args.base_radius))
+
+    # both radii are calculated back to back for every complex, so that both see the same file system cache state; the
+    # first complex is processed once by both engines before, so that the one-time initialization of CDPKit (e.g. on
+    # the first protein read) is not timed, and the engine going first alternates from complex to complex
+    for i, item in enumerate(open_complex_source(args.complex_data_dir[0], args.layout)):
+        if i == 0:
+            base_engine.process_complex(item)
+            engine.process_complex(item)
+
+        if i % 2 == 0:
+            base_result = base_engine.process_complex(item)
+            result = engine.process_complex(item)
+        else:
+            result = engine.process_complex(item)
+            base_result = base_engine.process_complex(item)
+
+        if base_result.error is not None or result.error is not None:
+            print('!! Processing complex %s failed: ' % item.name, base_result.error or result.error, file=sys.stderr)
+            continue
+
+        base_records.append(base_result.record)
+        records.append(result.record)
+        base_descrs.append(base_result.descriptors)
+        descrs.append(result.descriptors)
+
+    if not descrs:
+        sys.exit('!! No complex could be processed')
+
+    base_descrs = np.array(base_descrs)
+    descrs = np.array(descrs)
+    abs_devs = np.abs(descrs - base_descrs)
+    rel_devs = abs_devs / np.maximum(np.abs(base_descrs), np.finfo(float).tiny)
+    out_of_tol = (abs_devs > args.atol + args.rtol * np.abs(base_descrs)).sum(axis=0)
+
+    print('Compared %s complexes' % len(descrs))
+
+    base_env = printTiming('Radius %.1f' % args.base_radius, base_records)
+    env = printTiming('Radius %.1f' % args.env_radius, records)
+
+    # the other stages (reading, ligand preparation) do not depend on the radius
+    print('Speedup of the environment dependent stages: %.2fx' % (base_env / env))
+
+    failed = []
+
+    for i, name in enumerate(names):
+        if out_of_tol[i] == 0:
+            continue
+
+        note = ''
+
+        if name in RADIUS_DEPENDENT_ELEMENTS:
+            note = ' (no distance cutoff, depends on the radius)'
+
+        print('!! %s: %s complexes out of tolerance, max. abs. deviation %.6g, max. rel. deviation %.6g%s' %
+              (name, out_of_tol[i], abs_devs[:, i].max(), rel_devs[:, i].max(), note), file=sys.stderr)
+
+        if args.strict or name not in RADIUS_DEPENDENT_ELEMENTS:
+            failed.append(name)
+
+    if args.out_csv_file:
+        with open(args.out_csv_file, 'w') as out_file:
+            out_file.write('Element,Max abs. deviation,Max rel. deviation,Out of tolerance\n')
+
+            for i, name in enumerate(names):
+                out_file.write('%s,%r,%r,%s\n' % (name, float(abs_devs[:, i].max()), float(rel_devs[:, i].max()), out_of_tol[i]))
+
+    if failed:
+        sys.exit('!! %s descriptor element(s) deviate beyond the tolerance' % len(failed))
+
+    print('All%s descriptor elements are within the tolerance' % ('' if args.strict else ' cutoff limited'))
+    print('Done!')
+
+if __name__ == '__main__':
+    process(parseArguments())
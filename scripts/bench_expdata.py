@@ -0,0 +1,231 @@
+# -*- mode: python; tab-width: 4 -*-
+
+##
+# bench_expdata.py
+#
+# Copyright (C) 2023 Thomas A. Seidel <thomas.seidel@univie.ac.at>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; see the file COPYING. If not, write to
+# the Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+##
+
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from phantomdragon.expdata import FORMATS, RELATION_COLUMN, SPLIT_EXCLUDED_RELATIONS, read_exp_data, read_index, split_affinity_types, write_tables
+
+
+VALUE_COLUMNS = ['Affinity Data Value', 'pKd pKi pIC50', 'delta G', '1/K']
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description='Benchmarks the parsing of a PDBbind index file and the writing of the all/kd/ki tables by phantomdragon.expdata against the former line by line parser of create_general_set_data.py and checks that both give the same values.')
+
+    parser.add_argument('-i',
+                        dest='index_file',
+                        help='[Optional] The PDBbind index file (default: ../data/exp_data/INDEX_general_PL_data.2020)·',
+                        default='../data/exp_data/INDEX_general_PL_data.2020')
+    parser.add_argument('-f',
+                        dest='out_format',
+                        help='[Optional] The format of the written tables: %s (default: csv)·' % ' or '.join(FORMATS),
+                        choices=FORMATS,
+                        default='csv')
+    parser.add_argument('-p',
+                        dest='published_table',
+                        help='[Optional] A published all table of the index file (e.g. ../data/exp_data/PDBbind_general_set_all.csv) to compare the parsed values with (default: none)·',
+                        default=None)
+    parser.add_argument('--rtol',
+                        dest='rtol',
+                        help='[Optional] Maximum allowed relative deviation of the affinities from the published table (default: 1e-12)·',
+                        type=float,
+                        default=1e-12)
+    parser.add_argument('-n',
+                        dest='repeats',
+                        help='[Optional] Number of timed repetitions (default: 5)·',
+                        type=int,
+                        default=5)
+
+    return parser.parse_args()
+
+def legacyParseIndex(path):
+    # the parser formerly used by create_general_set_data.py
+    tmp = open(path, 'r')
+    lines = tmp.readlines()
+    tmp.close()
+
+    PDB_code_list = []
+    Affinity_Data_Type_list = []
+    Affinity_Data_Value_list = []
+    pKi_pKd_IC50_list = []
+    Delta_G_list = []
+    K_reciprocal_list = []
+
+    for line in lines:
+        test = str(line).split()
+
+        if test[0][0] == '#':
+            continue
+
+        PDB_code_list.append(test[0])
+
+        if '=' in test[4]:
+            Affinity_Data_Type, Affinity_Data_Value = test[4].split(sep='=')
+        elif '~' in test[4]:
+            Affinity_Data_Type, Affinity_Data_Value = test[4].split(sep='~')
+        elif '>' in test[4]:
+            Affinity_Data_Type, Affinity_Data_Value = test[4].split(sep='>')
+        elif '<' in test[4]:
+            Affinity_Data_Type, Affinity_Data_Value = test[4].split(sep='<')
+        else:
+            raise ValueError('No split character found')
+
+        Affinity_Data_Type_list.append(Affinity_Data_Type)
+
+        if Affinity_Data_Value[-2:] == 'nM':
+            Affinity_Data_Value = Affinity_Data_Value[0:-2]
+        elif Affinity_Data_Value[-2:] == 'uM':
+            Affinity_Data_Value = float(Affinity_Data_Value[0:-2])*1000
+        elif Affinity_Data_Value[-2:] == 'pM':
+            Affinity_Data_Value = float(Affinity_Data_Value[0:-2])/1000
+        elif Affinity_Data_Value[-2:] == 'mM':
+            Affinity_Data_Value = float(Affinity_Data_Value[0:-2])*1000000
+        elif Affinity_Data_Value[-2:] == 'fM':
+            Affinity_Data_Value = float(Affinity_Data_Value[0:-2])/1000000
+
+        Affinity_Data_Value_list.append(Affinity_Data_Value)
+        pKi_pKd_IC50_list.append(test[3])
+        Delta_G_list.append(round(0.001987*298*math.log(float(Affinity_Data_Value)/1000000000),2))
+        K_reciprocal_list.append(round(1/float(Affinity_Data_Value),5))
+
+    data = {'PDB code':PDB_code_list,'Affinity Data Type':Affinity_Data_Type_list,'Affinity Data Value':Affinity_Data_Value_list,'pKd pKi pIC50':pKi_pKd_IC50_list,'delta G':Delta_G_list,'1/K':K_reciprocal_list}
+
+    return pd.DataFrame(data)
+
+def legacyWriteTables(df, out_prefix):
+    df.to_csv(out_prefix + '_all.csv')
+    df[df['Affinity Data Type'] == 'Kd'].to_csv(out_prefix + '_kd.csv')
+    df[df['Affinity Data Type'] == 'Ki'].to_csv(out_prefix + '_ki.csv')
+
+def getLegacyTypes(data):
+    # the affinity data types of the former parser, which split e.g. 'Ki<=0.6nM' on '=' into 'Ki<'
+    excluded = data[RELATION_COLUMN].isin(SPLIT_EXCLUDED_RELATIONS)
+
+    return data['Affinity Data Type'].where(~excluded, data['Affinity Data Type'] + data[RELATION_COLUMN].str[0])
+
+def comparePublished(data, path, rtol):
+    published = read_exp_data(path)
+
+    if data['PDB code'].tolist() != published['PDB code'].tolist():
+        print('!! %s: the PDB codes differ' % path, file=sys.stderr)
+        return False
+
+    matching = True
+
+    # the published affinities were not all converted the same way (e.g. 3f6e Kd=4.14mM is 4140000.0, 2zgm
+    # Kd=16.4mM is 16399999.999999998), so they are compared with a relative tolerance
+    for column in VALUE_COLUMNS:
+        values = data[column].to_numpy()
+        published_values = published[column].to_numpy(dtype=np.float64)
+        num_diffs = (values != published_values).sum()
+        deviations = np.abs(values - published_values) / np.maximum(np.abs(published_values), np.finfo(np.float64).tiny)
+        tol = rtol if column == 'Affinity Data Value' else 0.0
+        num_failed = (deviations > tol).sum()
+
+        print('%s: %s values differ from %s, max. rel. deviation %.3g' % (column, num_diffs, path, deviations.max()))
+
+        for code, value, published_value in zip(data['PDB code'][deviations > tol], values[deviations > tol], published_values[deviations > tol]):
+            print('!! %s: %s %r (published: %r)' % (code, column, float(value), float(published_value)), file=sys.stderr)
+
+        matching = matching and num_failed == 0
+
+    types = getLegacyTypes(data) != published['Affinity Data Type']
+
+    for code, data_type, published_type in zip(data['PDB code'][types], data['Affinity Data Type'][types], published['Affinity Data Type'][types]):
+        print('!! %s: affinity data type %s (published: %s)' % (code, data_type, published_type), file=sys.stderr)
+
+    return matching and not types.any()
+
+def timeCall(func, repeats, *args):
+    times = []
+
+    for i in range(repeats):
+        start = time.perf_counter()
+        result = func(*args)
+        times.append(time.perf_counter() - start)
+
+    return result, min(times)
+
+def process(args):
+    try:
+        data, parse_time = timeCall(read_index, args.repeats, args.index_file)
+        legacy, legacy_parse_time = timeCall(legacyParseIndex, args.repeats, args.index_file)
+
+    except (OSError, ValueError) as e:
+        sys.exit('!! ' + str(e))
+
+    print('%s: %s complexes' % (args.index_file, len(data)))
+    print('Parsing: %.4f s (read_index), %.4f s (former parser), speedup %.1fx' % (parse_time, legacy_parse_time, legacy_parse_time / parse_time))
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        paths, write_time = timeCall(write_tables, args.repeats, data, os.path.join(out_dir, 'new'), args.out_format)
+        dummy, legacy_write_time = timeCall(legacyWriteTables, args.repeats, legacy, os.path.join(out_dir, 'legacy'))
+
+        print('Writing the all/kd/ki tables: %.4f s (write_tables, %s), %.4f s (former, csv)' % (write_time, args.out_format, legacy_write_time))
+
+    failed = False
+
+    if data['PDB code'].tolist() != legacy['PDB code'].tolist():
+        sys.exit('!! The PDB codes differ')
+
+    for column in VALUE_COLUMNS:
+        values = data[column].to_numpy()
+        legacy_values = legacy[column].to_numpy(dtype=np.float64)
+        num_diffs = (values != legacy_values).sum()
+
+        if num_diffs > 0:
+            print('!! %s: %s values differ, max. abs. deviation %.6g' % (column, num_diffs, np.abs(values - legacy_values).max()), file=sys.stderr)
+            failed = True
+
+    types = getLegacyTypes(data) != legacy['Affinity Data Type']
+
+    for code, data_type, relation, legacy_type in zip(data['PDB code'][types], data['Affinity Data Type'][types], data[RELATION_COLUMN][types], legacy['Affinity Data Type'][types]):
+        print('!! %s: affinity data type %s, relation %s (former parser: %s)' % (code, data_type, relation, legacy_type), file=sys.stderr)
+        failed = True
+
+    tables = split_affinity_types(data)
+
+    for split, legacy_type in (('kd', 'Kd'), ('ki', 'Ki')):
+        if tables[split]['PDB code'].tolist() != legacy['PDB code'][legacy['Affinity Data Type'] == legacy_type].tolist():
+            print('!! The %s table differs from that of the former parser' % split, file=sys.stderr)
+            failed = True
+
+    if args.published_table and not comparePublished(data, args.published_table, args.rtol):
+        failed = True
+
+    if failed:
+        sys.exit('!! The parsed values differ')
+
+    print('The parsed values, affinity data types and kd/ki tables are identical')
+    print('Done!')
+
+if __name__ == '__main__':
+    process(parseArguments())
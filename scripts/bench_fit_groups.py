@@ -0,0 +1,146 @@
+# -*- mode: python; tab-width: 4 -*-
+
+##
+# bench_fit_groups.py
+#
+# Copyright (C) 2023 Thomas A. Seidel <thomas.seidel@univie.ac.at>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; see the file COPYING. If not, write to
+# the Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+##
+
+import argparse
+import sys
+import tempfile
+
+import numpy as np
+
+import phantomdragon.functions as ph
+from phantomdragon.grid import MIN_SET_SIZE, STATS_COLUMNS, expand_grid, run_group
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description='Runs a fit group of grid cells (one model tested on several test sets, see phantomdragon.grid.run_group()) with repeated tests and checks that the statistics of every test set and repeat match those of phantomtest() on the test set alone (e.g. the kd and ki complexes of the PDBbind core set).')
+
+    parser.add_argument('-d',
+                        dest='descriptor',
+                        help='[Optional] The descriptor: GRADE or X-GRADE (default: GRADE)·',
+                        default='GRADE')
+    parser.add_argument('-t',
+                        dest='testsets',
+                        help='[Optional] The data types of the core set tested with the shared model (default: kd ki)·',
+                        nargs='+',
+                        default=['kd', 'ki'])
+    parser.add_argument('-m',
+                        dest='modeltype',
+                        help='[Optional] The model type (default: linearRegression)·',
+                        default='linearRegression')
+    parser.add_argument('-s',
+                        dest='scoretype',
+                        help='[Optional] The score column (default: pKd pKi pIC50)·',
+                        default='pKd pKi pIC50')
+    parser.add_argument('-n',
+                        dest='repeats',
+                        help='[Optional] Number of repeated tests of the fit group (default: 2)·',
+                        type=int,
+                        default=2)
+    parser.add_argument('--tol',
+                        dest='tol',
+                        help='[Optional] Maximum allowed difference of the statistics (default: 1e-9)·',
+                        type=float,
+                        default=1e-9)
+
+    return parser.parse_args()
+
+def getCells(args):
+    return expand_grid(
+        {"testset": args.testsets},
+        modeltype=args.modeltype,
+        scoretype=args.scoretype,
+        datatype="all",
+        add_information=args.descriptor + "_{testset}",
+        featurepath_train="../data/Descriptors/PDBbind_refined_set_%s.csv" % args.descriptor,
+        featurepath_test="../data/Descriptors/PDBbind_core_set_%s.csv" % args.descriptor,
+        experimentpath_train="../data/exp_data/PDBbind_refined_set_all.csv",
+        experimentpath_test="../data/exp_data/PDBbind_core_set_{testset}.csv",
+        fit_group=args.descriptor + "_check",
+        repeats=args.repeats,
+        shuffle=False,
+    )
+
+def getStatsDeviation(row, param):
+    stats = dict(zip(STATS_COLUMNS, param.get_stats(spearman=True)))
+
+    return max(abs(float(row[name]) - float(stats[name])) for name in STATS_COLUMNS[3:7] + STATS_COLUMNS[8:10])
+
+def process(args):
+    cells = getCells(args)
+
+    try:
+        x_train, x_test, y_train, y_test, groups = ph.prepare_group_data(
+            args.scoretype,
+            cells[0]["featurepath_train"],
+            [cell["featurepath_test"] for cell in cells],
+            cells[0]["experimentpath_train"],
+            [cell["experimentpath_test"] for cell in cells],
+            args.descriptor,
+            sh=False,
+        )
+
+    except (OSError, ValueError, KeyError) as e:
+        sys.exit('!! ' + str(e))
+
+    print('Training set: %s complexes, test sets: %s complexes' %
+          (len(x_train), ', '.join('%s %s' % (cell["testset"], np.count_nonzero(groups == i)) for i, cell in enumerate(cells))))
+
+    failed = []
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        model_dir += '/'
+        results = run_group(cells, model_dir)
+
+        for i, (cell, row) in enumerate(results):
+            mask = groups == i
+
+            if row is None:
+                if np.count_nonzero(mask) >= MIN_SET_SIZE:
+                    print('!! %s: no result row' % cell["testset"], file=sys.stderr)
+                    failed.append(cell["testset"])
+
+                continue
+
+            # the same model tested on the test set alone
+            param = ph.parameterCollector(args.modeltype, cell["fit_group"], args.scoretype)
+
+            param.set_testingdata(x_test[mask], y_test[mask])
+            param.set_datatype("all")
+            param.phantomtest(loadpath=model_dir)
+
+            deviation = getStatsDeviation(row, param)
+            print('%s: %s complexes, r %.6f, Spearman r %.6f, max. deviation of the statistics %.3g' %
+                  (cell["testset"], row["Testing set size"], param.r, param.spearman_r, deviation))
+
+            if row["Testing set size"] != np.count_nonzero(mask) or deviation > args.tol:
+                print('!! %s: the fit group result differs from the single test set' % cell["testset"], file=sys.stderr)
+                failed.append(cell["testset"])
+
+    if failed:
+        sys.exit('!! %s test set(s) differ' % len(failed))
+
+    print('All test sets match over %s repeats' % args.repeats)
+    print('Done!')
+
+if __name__ == '__main__':
+    process(parseArguments())
@@ -0,0 +1,150 @@
+# -*- mode: python; tab-width: 4 -*-
+
+##
+# bench_float32.py
+#
+# Copyright (C) 2023 Thomas A. Seidel <thomas.seidel@univie.ac.at>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; see the file COPYING. If not, write to
+# the Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+##
+
+import argparse
+import sys
+import tempfile
+
+import numpy as np
+
+import phantomdragon.functions as ph
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description='Trains every model type supporting float32 features once on float64 and once on float32 features (prepare_data(..., dtype="float32")) and reports the differences of the predictions and the test statistics (e.g. on the PDBbind core set).')
+
+    parser.add_argument('-d',
+                        dest='descriptor',
+                        help='[Optional] The descriptor: GRADE or X-GRADE (default: GRADE)·',
+                        default='GRADE')
+    parser.add_argument('--train-features',
+                        dest='train_features',
+                        help='[Optional] The descriptor file of the training set (default: ../data/Descriptors/PDBbind_refined_set_<descriptor>.csv)·',
+                        default=None)
+    parser.add_argument('--test-features',
+                        dest='test_features',
+                        help='[Optional] The descriptor file of the test set (default: ../data/Descriptors/PDBbind_core_set_<descriptor>.csv)·',
+                        default=None)
+    parser.add_argument('--train-exp',
+                        dest='train_exp',
+                        help='[Optional] The experimental data of the training set (default: ../data/exp_data/PDBbind_refined_set_all.csv)·',
+                        default='../data/exp_data/PDBbind_refined_set_all.csv')
+    parser.add_argument('--test-exp',
+                        dest='test_exp',
+                        help='[Optional] The experimental data of the test set (default: ../data/exp_data/PDBbind_core_set_all.csv)·',
+                        default='../data/exp_data/PDBbind_core_set_all.csv')
+    parser.add_argument('-s',
+                        dest='scoretype',
+                        help='[Optional] The score column (default: pKd pKi pIC50)·',
+                        default='pKd pKi pIC50')
+    parser.add_argument('-m',
+                        dest='modeltypes',
+                        help='[Optional] The model types to compare (default: all supporting float32 features)·',
+                        nargs='+',
+                        choices=ph.FLOAT32_MODELTYPES,
+                        default=list(ph.FLOAT32_MODELTYPES))
+    parser.add_argument('--tol',
+                        dest='tol',
+                        help='[Optional] Maximum allowed difference of the Pearson and Spearman correlation coefficients (default: 0.001)·',
+                        type=float,
+                        default=0.001)
+    parser.add_argument('-o',
+                        dest='out_csv_file',
+                        help='[Optional] Write the statistics of both precisions and the prediction differences of each model type to a CSV-file (default: none)·',
+                        default=None)
+
+    args = parser.parse_args()
+
+    if args.train_features is None:
+        args.train_features = '../data/Descriptors/PDBbind_refined_set_%s.csv' % args.descriptor
+
+    if args.test_features is None:
+        args.test_features = '../data/Descriptors/PDBbind_core_set_%s.csv' % args.descriptor
+
+    return args
+
+def getArrays(args, dtype):
+    # not shuffled, so that both precisions see the complexes in the same order
+    return ph.prepare_data(args.scoretype, args.train_features, args.test_features, args.train_exp, args.test_exp,
+                           args.descriptor, sh=False, dtype=dtype)
+
+def trainAndTest(modeltype, args, arrays, dtype, model_dir):
+    x_train, x_test, y_train, y_test = arrays
+    param = ph.parameterCollector(modeltype, args.descriptor, args.scoretype, dtype=dtype)
+
+    param.set_trainingdata(x_train, y_train)
+    param.set_testingdata(x_test, y_test)
+    param.set_datatype('all')
+    param.train_and_save_model(savepath=model_dir, additional_marker='_' + dtype)
+
+    return param, param.phantomtest(loadpath=model_dir, additional_marker='_' + dtype, return_values=True)
+
+def process(args):
+    try:
+        arrays64 = getArrays(args, 'float64')
+        arrays32 = getArrays(args, 'float32')
+
+    except (OSError, ValueError, KeyError) as e:
+        sys.exit('!! ' + str(e))
+
+    print('Training set: %s complexes, test set: %s complexes, %s features' % (len(arrays64[0]), len(arrays64[1]), arrays64[0].shape[1]))
+    print('Feature memory: %.2f MB (float64), %.2f MB (float32)' %
+          ((arrays64[0].nbytes + arrays64[1].nbytes) / 1024**2, (arrays32[0].nbytes + arrays32[1].nbytes) / 1024**2))
+
+    rows = []
+    failed = []
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        model_dir += '/'
+
+        for modeltype in args.modeltypes:
+            param64, pred64 = trainAndTest(modeltype, args, arrays64, 'float64', model_dir)
+            param32, pred32 = trainAndTest(modeltype, args, arrays32, 'float32', model_dir)
+
+            max_dev = float(np.abs(pred32 - pred64).max())
+            r_dev = abs(param32.r - param64.r)
+            spearman_dev = abs(param32.spearman_r - param64.spearman_r)
+            rows.append((modeltype, param64.r, param32.r, param64.spearman_r, param32.spearman_r, param64.mse, param32.mse, max_dev))
+
+            print('%s: r %.6f / %.6f, Spearman r %.6f / %.6f, mse %.6f / %.6f (float64 / float32), max. prediction deviation %.3g' %
+                  (modeltype, param64.r, param32.r, param64.spearman_r, param32.spearman_r, param64.mse, param32.mse, max_dev))
+
+            if r_dev > args.tol or spearman_dev > args.tol:
+                print('!! %s: the correlation coefficients differ by more than %g' % (modeltype, args.tol), file=sys.stderr)
+                failed.append(modeltype)
+
+    if args.out_csv_file:
+        with open(args.out_csv_file, 'w') as out_file:
+            out_file.write('Modeltype,Pearson r (float64),Pearson r (float32),Spearman r (float64),Spearman r (float32),mse (float64),mse (float32),Max prediction deviation\n')
+
+            for row in rows:
+                out_file.write('%s,%r,%r,%r,%r,%r,%r,%r\n' % (row[0], *(float(value) for value in row[1:])))
+
+    if failed:
+        sys.exit('!! %s model type(s) deviate beyond the tolerance' % len(failed))
+
+    print('All model types are within the tolerance')
+    print('Done!')
+
+if __name__ == '__main__':
+    process(parseArguments())
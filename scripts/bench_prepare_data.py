@@ -0,0 +1,163 @@
+# -*- mode: python; tab-width: 4 -*-
+
+##
+# bench_prepare_data.py
+#
+# Copyright (C) 2023 Thomas A. Seidel <thomas.seidel@univie.ac.at>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; see the file COPYING. If not, write to
+# the Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+##
+
+import argparse
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import phantomdragon.functions as ph
+from phantomdragon.output import read_descriptors
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description='Benchmarks the removal of the test complexes from the training set in prepare_data() against the former transpose-and-drop implementation and checks that both give the same training data.')
+
+    parser.add_argument('--train-features',
+                        dest='train_features',
+                        help='[Optional] The descriptor file of the training set (default: ../data/Descriptors/PDBbind_general_set_GRADE.csv)·',
+                        default='../data/Descriptors/PDBbind_general_set_GRADE.csv')
+    parser.add_argument('--test-features',
+                        dest='test_features',
+                        help='[Optional] The descriptor file of the test set (default: ../data/Descriptors/PDBbind_refined_set_GRADE.csv)·',
+                        default='../data/Descriptors/PDBbind_refined_set_GRADE.csv')
+    parser.add_argument('--train-exp',
+                        dest='train_exp',
+                        help='[Optional] The experimental data of the training set (default: ../data/exp_data/PDBbind_general_set_all.csv)·',
+                        default='../data/exp_data/PDBbind_general_set_all.csv')
+    parser.add_argument('--test-exp',
+                        dest='test_exp',
+                        help='[Optional] The experimental data of the test set (default: ../data/exp_data/PDBbind_refined_set_all.csv)·',
+                        default='../data/exp_data/PDBbind_refined_set_all.csv')
+    parser.add_argument('-s',
+                        dest='scoretype',
+                        help='[Optional] The score column (default: pKd pKi pIC50)·',
+                        default='pKd pKi pIC50')
+    parser.add_argument('-n',
+                        dest='repeats',
+                        help='[Optional] Number of timed repetitions (default: 5)·',
+                        type=int,
+                        default=5)
+
+    return parser.parse_args()
+
+def legacyRemoveTestComplexes(features_train, experiment_train, PDB_codes, identifier='PDB code'):
+    # the implementation formerly used by prepare_data()
+    if all(x in PDB_codes for x in features_train[identifier]):
+        pass
+    else:
+        bool_list = []
+        for i in range(len(PDB_codes)):
+            if PDB_codes[i] in list(features_train[identifier]):
+                bool_list.append(True)
+            else:
+                bool_list.append(False)
+        PDB_codes = np.array(PDB_codes)
+        PDB_codes = list(PDB_codes[bool_list])
+
+    features_train = features_train.set_index(features_train[identifier])
+    features_train = features_train.transpose()
+
+    for PDB_code in PDB_codes:
+        features_train = features_train.drop(PDB_code, axis=1)
+
+    features_train = features_train.transpose()
+    features_train = features_train.reset_index(drop=True)
+
+    experiment_train = experiment_train.set_index(experiment_train[identifier])
+    experiment_train = experiment_train.transpose()
+
+    experiment_train = experiment_train.drop(PDB_codes, axis=1)
+    experiment_train = experiment_train.transpose()
+
+    return features_train, experiment_train
+
+def loadData(args, identifier='PDB code', experiment_identifier='Affinity Data Type'):
+    # as in prepare_data(): the converters override dtype, which is intended
+    with warnings.catch_warnings():
+        warnings.simplefilter(action='ignore', category=pd.errors.ParserWarning)
+        features_train = read_descriptors(args.train_features, identifier)
+        features_test = read_descriptors(args.test_features, identifier)
+        experiment_train = pd.read_csv(args.train_exp, dtype='float64', converters={identifier: str, experiment_identifier: str})
+        experiment_test = pd.read_csv(args.test_exp, dtype='float64', converters={identifier: str, experiment_identifier: str})
+
+    experiment_train = experiment_train.sort_values(identifier).reset_index(drop=True)
+    experiment_test = experiment_test.sort_values(identifier).reset_index(drop=True)
+    features_train = ph.filter_and_sort_features(experiment_train, features_train)
+    features_test = ph.filter_and_sort_features(experiment_test, features_test)
+    experiment_train = ph.filter_and_sort_features(features_train, experiment_train)
+
+    return features_train, experiment_train, features_test[identifier].tolist()
+
+def timeCall(func, repeats, *args):
+    times = []
+
+    for i in range(repeats):
+        start = time.perf_counter()
+        result = func(*args)
+        times.append(time.perf_counter() - start)
+
+    return result, min(times)
+
+def toArrays(features_train, experiment_train, scoretype, identifier='PDB code'):
+    return (features_train[identifier].tolist(), features_train.drop(identifier, axis=1).to_numpy(dtype=np.float64),
+            np.array(experiment_train[scoretype], dtype=np.float64))
+
+def process(args):
+    try:
+        features_train, experiment_train, test_codes = loadData(args)
+
+    except (OSError, ValueError) as e:
+        sys.exit('!! ' + str(e))
+
+    overlap = features_train['PDB code'].isin(test_codes).sum()
+
+    print('Training set: %s complexes, test set: %s complexes, overlap: %s' % (len(features_train), len(test_codes), overlap))
+
+    new, new_time = timeCall(ph.remove_test_complexes, args.repeats, features_train, experiment_train, test_codes)
+    new = toArrays(*new, args.scoretype)
+
+    print('remove_test_complexes: %.4f s, %s training complexes left' % (new_time, len(new[0])))
+
+    try:
+        legacy, legacy_time = timeCall(legacyRemoveTestComplexes, 1, features_train, experiment_train, test_codes)
+
+    except KeyError as e:
+        sys.exit('!! The former implementation fails on this split (KeyError: %s): all training complexes are in the test set, so it tries to drop test complexes that are not in the training set' % str(e))
+
+    legacy = toArrays(*legacy, args.scoretype)
+
+    print('Former implementation: %.4f s, %s training complexes left' % (legacy_time, len(legacy[0])))
+    print('Speedup: %.1fx' % (legacy_time / new_time))
+
+    if new[0] != legacy[0] or not np.array_equal(new[1], legacy[1], equal_nan=True) or not np.array_equal(new[2], legacy[2], equal_nan=True):
+        sys.exit('!! The training data differ')
+
+    print('The training data are identical')
+    print('Done!')
+
+if __name__ == '__main__':
+    process(parseArguments())
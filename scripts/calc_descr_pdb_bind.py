@@ -22,32 +22,46 @@
 ##
 
 import argparse
-import os
 import sys
 
-import CDPL.Chem as Chem
-import CDPL.Biomol as Biomol
-import CDPL.Math as Math
-import CDPL.GRAIL as GRAIL
+from phantomdragon.cache import DescriptorCache
+from phantomdragon.descriptors import LIG_ENV_MAX_RADIUS, RADIUS_DEPENDENT_ELEMENTS, RECEPTOR_GROUP_WINDOW, VARIANTS, DescriptorEngine, MultiVariantEngine, open_complex_source
+from phantomdragon.output import DEFAULT_BLOCK_SIZE, FORMATS, CSVDescriptorWriter, FailureLedger, create_writer, get_failure_ledger_path, get_variant_path, load_processed_ids
+from phantomdragon.shard import ShardSource, parse_shard, write_manifest
+from phantomdragon.timing import StageTimer, summarize
 
 
-LIG_ENV_MAX_RADIUS = 21.0
-REMOVE_NON_STD_RESIDUES = True
-NON_STD_RESIDUE_MAX_ATOM_COUNT = 8
+LAYOUT = 'pdbbind'
 
 
+def parseEnvRadius(value):
+    try:
+        radius = float(value)
+
+    except ValueError:
+        raise argparse.ArgumentTypeError('invalid radius: %s' % value)
+
+    if radius <= 0.0:
+        raise argparse.ArgumentTypeError('invalid radius: %s' % value)
+
+    if radius < LIG_ENV_MAX_RADIUS:
+        print('!! Warning: the environment radius %.1f Angstrom gives other %s values than the default radius, these elements have no distance cutoff (see bench_env_radius.py)' %
+              (radius, ' and '.join(RADIUS_DEPENDENT_ELEMENTS)), file=sys.stderr)
+
+    return radius
+
 def parseArguments():
     parser = argparse.ArgumentParser(description='Calculates GRAIL affinity prediction descriptors for a set of input ligand-protein complexes.')
     
     parser.add_argument('-d',
                         dest='complex_data_dir',
                         required=True,
-                        help='[Required] The directory containing the ligand-protein complexes to process, organized in PDBBind manner.',
+                        help='[Required] The directory containing the ligand-protein complexes to process, organized in PDBBind manner, or a .tar(.gz)/.zip archive of such a directory (ligand and protein files may be gzipped).',
                         nargs=1)
     parser.add_argument('-o',
                         dest='out_csv_file',
                         required=True,
-                        help='[Required] The path of the output CSV-file containing the descriptor values calculated for each input complex.',
+                        help='[Required] The path of the output file containing the descriptor values calculated for each input complex.',
                         nargs=1)
     parser.add_argument('-c',
                         dest='norm_chgs',
@@ -59,109 +73,186 @@ def parseArguments():
                         help='[Optional] Calculate extended GRAIL descriptor with subdivided HBA/HBD feature types (default: false)·',
                         action='store_true',
                         default=False)
-    return parser.parse_args()
+    parser.add_argument('-V',
+                        dest='variants',
+                        help='[Optional] Calculate several descriptor variants in one pass, sharing the reading and preparation of the complexes: any of GRADE, X-GRADE, GRADE_charged and X-GRADE_charged (charged: protonation changed as with -c). Each variant is written to its own file, named by replacing {variant} in OUT_CSV_FILE or by inserting _VARIANT before its extension; -x and -c are ignored (default: none)·',
+                        choices=list(VARIANTS),
+                        nargs='+',
+                        default=None)
+    parser.add_argument('--env-radius',
+                        dest='env_radius',
+                        help='[Optional] Radius in Angstrom around the ligand atoms within which protein residues form the ligand environment. %s have no distance cutoff and change with smaller radii (default: %.1f)·' % (' and '.join(RADIUS_DEPENDENT_ELEMENTS), LIG_ENV_MAX_RADIUS),
+                        type=parseEnvRadius,
+                        default=LIG_ENV_MAX_RADIUS)
+    parser.add_argument('-j',
+                        dest='num_jobs',
+                        help='[Optional] Number of worker processes calculating descriptors in parallel (default: 1)·',
+                        type=int,
+                        default=1)
+    parser.add_argument('--group-receptors',
+                        dest='group_receptors',
+                        help='[Optional] Process complexes with identical protein structure together, preparing the protein only once per group; the complexes are grouped within windows of --group-window consecutive complexes and the rows of a window are written group by group, not in input order; --prefetch is not used (default: false)·',
+                        action='store_true',
+                        default=False)
+    parser.add_argument('--group-window',
+                        dest='group_window',
+                        help='[Optional] Number of consecutive complexes grouped at once with --group-receptors, whose files are held in memory until they are processed (default: %s)·' % RECEPTOR_GROUP_WINDOW,
+                        type=int,
+                        default=RECEPTOR_GROUP_WINDOW)
+    parser.add_argument('--prefetch',
+                        dest='prefetch',
+                        help='[Optional] Number of complexes whose files are read ahead by reader threads while the current complex is processed; ignored with -j > 1 (default: 0, no read-ahead)·',
+                        type=int,
+                        default=0)
+    parser.add_argument('--io-threads',
+                        dest='io_threads',
+                        help='[Optional] Number of reader threads used with --prefetch (default: 2)·',
+                        type=int,
+                        default=2)
+    parser.add_argument('-f',
+                        dest='out_format',
+                        help='[Optional] Format of the output file: csv, npy (NumPy array with the complex codes and column names in OUT_FILE.json) or parquet (default: csv)·',
+                        choices=FORMATS,
+                        default='csv')
+    parser.add_argument('-b',
+                        dest='block_size',
+                        help='[Optional] Number of output rows that are buffered and written at once (default: %d)·' % DEFAULT_BLOCK_SIZE,
+                        type=int,
+                        default=DEFAULT_BLOCK_SIZE)
+    parser.add_argument('-r',
+                        dest='resume',
+                        help='[Optional] Resume an interrupted run: complexes already listed in the output CSV-file or its failure ledger are skipped (default: false)·',
+                        action='store_true',
+                        default=False)
+    parser.add_argument('-t',
+                        dest='timing_log',
+                        help='[Optional] Record the wall time of the processing stages, atom counts and failure categories of each complex as JSON lines in the given file and print a summary report at the end (default: none)·',
+                        default=None)
+    parser.add_argument('--shard',
+                        dest='shard',
+                        help='[Optional] Process only shard i of N (e.g. 2/8) of the complexes, partitioned by a hash of the PDB code. A manifest listing the complexes of the shard is written to OUT_CSV_FILE.manifest.json; the shard outputs are combined by merge_descr_shards.py (default: all complexes)·',
+                        default=None)
+    parser.add_argument('--cache',
+                        dest='cache_file',
+                        help='[Optional] SQLite-file caching the calculated descriptors by the contents of the input files and the calculation settings (default: none)·',
+                        default=None)
+    parser.add_argument('--cache-max-size',
+                        dest='cache_max_size',
+                        help='[Optional] Maximum size of the cached descriptor data in MB (default: 1024)·',
+                        type=int,
+                        default=1024)
+
+    args = parser.parse_args()
+
+    if args.group_receptors and args.variants:
+        parser.error('argument --group-receptors: not allowed with argument -V')
+
+    if args.resume and args.out_format != 'csv':
+        parser.error('argument -r: resuming requires CSV output')
+
+    if args.shard:
+        try:
+            args.shard = parse_shard(args.shard)
 
-def removeNonStdResidues(pdb_code, lig_env):
-    residues = Biomol.ResidueList(lig_env)
-    
-    for res in residues:
-        is_std_res = Biomol.ResidueDictionary.isStdResidue(Biomol.getResidueCode(res))
-        
-        if is_std_res and res.numAtoms < 5:
-            print('!! While processing complex %s: isolated standard residue fragment of size %s found' % (pdb_code, str(res.numAtoms)), file=sys.stderr)
-            lig_env -= res
-            
-        elif REMOVE_NON_STD_RESIDUES and not is_std_res and res.numAtoms <= NON_STD_RESIDUE_MAX_ATOM_COUNT:
-            if res.numAtoms == 1 and Chem.AtomDictionary.isMetal(Chem.getType(res.atoms[0])):
-                continue
+        except ValueError as e:
+            parser.error('argument --shard: ' + str(e))
+
+    return args
 
-            lig_env -= res
+def getNames(engine, variant):
+    return engine.names if variant is None else engine.names[variant]
 
-def checkProtein(pdb_code, protein):
-    for atom in protein.atoms:
-        if Chem.getType(atom) == Chem.AtomType.H and atom.numAtoms == 0:
-            print('!! While processing complex %s: isolated hydrogen atom encountered' % pdb_code, file=sys.stderr)
-             
-        elif Chem.getType(atom) == Chem.AtomType.UNKNOWN:
-            print('!! While processing complex %s: atom of unknown element encountered' % pdb_code, file=sys.stderr)
+def getDescriptors(result, variant):
+    return result.descriptors if variant is None else result.descriptors.get(variant)
 
-def processComplex(pdb_code, comp_data_dir, out_file, descr_calc, norm_chgs):
-    print('Processing complex %s...' % pdb_code)
+def process(args):
+    out_path = args.out_csv_file[0]
 
-    sdf_reader = Chem.FileSDFMoleculeReader(comp_data_dir + '/' + pdb_code + '_ligand.sdf')
-    ligand = Chem.BasicMolecule()
+    # one output per descriptor variant: (variant, output path, (ext_descr, norm_chgs))
+    if args.variants:
+        engine = MultiVariantEngine(args.variants, args.num_jobs, prefetch=args.prefetch, io_threads=args.io_threads, env_radius=args.env_radius)
+        outputs = [(variant, get_variant_path(out_path, variant), VARIANTS[variant]) for variant in args.variants]
+    else:
+        engine = DescriptorEngine(args.ext_descr, args.norm_chgs, args.num_jobs, prefetch=args.prefetch, io_threads=args.io_threads,
+                                  group_receptors=args.group_receptors, env_radius=args.env_radius,
+                                  group_window=args.group_window)
+        outputs = [(None, out_path, (args.ext_descr, args.norm_chgs))]
 
-    if not sdf_reader.read(ligand):
-        print('!! While processing complex %s: reading ligand SD-file failed' % pdb_code, file=sys.stderr)
-        return
-        
-    pdb_reader = Biomol.FilePDBMoleculeReader(comp_data_dir + '/' + pdb_code + '_protein.pdb')
-    protein = Chem.BasicMolecule()
+    done_codes = {variant: set() for variant, path, settings in outputs}
 
-    if not pdb_reader.read(protein):
-        print('!! While processing complex %s: reading protein PDB-file failed' % pdb_code, file=sys.stderr)
-        return
-    
-    checkProtein(pdb_code, protein)
+    if args.resume:
+        try:
+            for variant, path, settings in outputs:
+                done_codes[variant] = load_processed_ids(path, CSVDescriptorWriter.header_line('PDB code', getNames(engine, variant)))
+                done_codes[variant] |= load_processed_ids(get_failure_ledger_path(path))
 
-    GRAIL.prepareForGRAILDescriptorCalculation(ligand, norm_chgs)
-    GRAIL.prepareForGRAILDescriptorCalculation(protein, norm_chgs)
+        except ValueError as e:
+            sys.exit('!! ' + str(e))
 
-    lig_env = Chem.Fragment()
+    # complexes are skipped only if they are done for all variants
+    skip_codes = set.intersection(*done_codes.values())
 
-    Biomol.extractEnvironmentResidues(ligand, protein, lig_env, Chem.Atom3DCoordinatesFunctor(), LIG_ENV_MAX_RADIUS, False)
-    removeNonStdResidues(pdb_code, lig_env)
-    Chem.extractSSSRSubset(protein, lig_env, True)
-        
-    line = pdb_code
-    descr = Math.DVector()
-    lig_atom_coords = Math.Vector3DArray()
+    if args.resume:
+        print('Resuming: skipping %s already processed complexes' % str(len(skip_codes)))
 
-    Chem.get3DCoordinates(ligand, lig_atom_coords)
+    if args.cache_file:
+        engine.cache = DescriptorCache(args.cache_file, args.cache_max_size * 1024 * 1024)
 
-    descr_calc.initTargetData(lig_env, Chem.Atom3DCoordinatesFunctor())
-    descr_calc.initLigandData(ligand)
+    out_files = {variant: create_writer(args.out_format, path, 'PDB code', getNames(engine, variant), args.block_size, append=args.resume)
+                 for variant, path, settings in outputs}
+    failed_files = {variant: FailureLedger(get_failure_ledger_path(path), append=args.resume) for variant, path, settings in outputs}
+    timer = StageTimer(args.timing_log)
+    source = open_complex_source(args.complex_data_dir[0], LAYOUT, skip_codes)
 
-    descr_calc.calculate(lig_atom_coords, descr)
+    if args.shard:
+        source = ShardSource(source, *args.shard)
 
-    for i in range(0, descr_calc.TOTAL_DESCRIPTOR_SIZE):
-        line += (', ' + str(descr(i)))
+        for variant, path, settings in outputs:
+            write_manifest(path, *args.shard, args.out_format, 'PDB code', getNames(engine, variant),
+                           settings={'ext_descr': settings[0], 'norm_chgs': settings[1], 'env_radius': args.env_radius})
 
-    out_file.write(line + '\n')
-    out_file.flush()
+    for result in engine.run(source, timer):
+        print('Processed complex %s' % result.name)
 
-def outputColNames(out_file, descr_calc):
-    out_file.write('PDB code')
+        for warning in result.warnings:
+            print('!! While processing complex %s: %s' % (result.name, warning), file=sys.stderr)
 
-    for cn in descr_calc.ElementIndex.names.keys():
-        out_file.write(', ' + cn)
+        if result.error is not None:
+            print('!! Processing complex %s failed: ' % result.name, result.error, file=sys.stderr)
 
-    out_file.write('\n')
-    out_file.flush()
-    
-def process(args):
-    out_file = open(args.out_csv_file[0], 'w')
+        for variant, path, settings in outputs:
+            if result.name in done_codes[variant]:
+                continue
 
-    if args.ext_descr:
-        descr_calc = GRAIL.GRAILXDescriptorCalculator()
-    else:
-        descr_calc = GRAIL.GRAILDescriptorCalculator()
+            descr = getDescriptors(result, variant)
 
-    outputColNames(out_file, descr_calc)
-    
-    for pdb_code in os.listdir(args.complex_data_dir[0]):
-        comp_data_dir = os.path.join(args.complex_data_dir[0], pdb_code)
+            if descr is None:
+                failed_files[variant].write(result.name, result.error)
+            else:
+                out_files[variant].write(result.name, descr)
 
-        if os.path.isfile(comp_data_dir): # sanity check
-            continue
+    for variant, path, settings in outputs:
+        out_files[variant].close()
+        failed_files[variant].close()
 
-        try:
-            df = processComplex(pdb_code, comp_data_dir, out_file, descr_calc, args.norm_chgs)
+        if args.shard:
+            write_manifest(path, *args.shard, args.out_format, 'PDB code', getNames(engine, variant), done_codes[variant] | set(source.codes),
+                           {'ext_descr': settings[0], 'norm_chgs': settings[1], 'env_radius': args.env_radius})
+
+    if engine.cache is not None:
+        print(engine.cache.report())
+        engine.cache.close()
+
+    if engine.prefetcher is not None:
+        print(engine.prefetcher.report())
+
+    if engine.group_stats is not None:
+        print(engine.grouping_report())
 
-        except Exception as e:
-            print('!! Processing complex %s failed: ' % pdb_code, e, file=sys.stderr)
+    if args.timing_log:
+        print(summarize(timer.records))
 
-    out_file.close()
+    timer.close()
 
     print('Done!')
     
@@ -22,19 +22,12 @@
 ##
 
 import argparse
-import os
 import sys
 
 from os import path
 
-import CDPL.Chem as Chem
-import CDPL.Biomol as Biomol
-import CDPL.Math as Math
-import CDPL.GRAIL as GRAIL
-
-
-LIG_ENV_MAX_RADIUS = 21.0
-REMOVE_NON_STD_RESIDUES = True
+from phantomdragon.descriptors import DescriptorEngine, LibrarySource, Receptor, extract_reference_environment, extract_residues_environment, extract_union_environment
+from phantomdragon.output import DEFAULT_BLOCK_SIZE, FORMATS, create_writer
 
 
 def parseArguments():
@@ -43,18 +36,30 @@ def parseArguments():
     parser.add_argument('-p',
                         dest='pdb_file',
                         required=True,
-                        help='[Required] The receptor PDB-file.',
+                        help='[Required] The receptor PDB-file or a receptor file written by --prepare-receptor.',
                         nargs=1)
     parser.add_argument('-l',
                         dest='lig_file',
-                        required=True,
-                        help='[Required] The file providing the ligands.',
+                        help='[Required] The file providing the ligands (may be omitted with --prepare-receptor).',
                         nargs=1)
     parser.add_argument('-o',
                         dest='out_csv_file',
-                        required=True,
-                        help='[Required] The path of the output CSV-file containing the descriptors calculated for each input ligand.',
+                        help='[Required] The path of the output file containing the descriptors calculated for each input ligand (may be omitted with --prepare-receptor).',
                         nargs=1)
+    parser.add_argument('-f',
+                        dest='out_format',
+                        help='[Optional] Format of the output file: csv, npy (NumPy array with the ligand names and column names in OUT_FILE.json) or parquet (default: csv)·',
+                        choices=FORMATS,
+                        default='csv')
+    parser.add_argument('-b',
+                        dest='block_size',
+                        help='[Optional] Number of output rows that are buffered and written at once (default: %d)·' % DEFAULT_BLOCK_SIZE,
+                        type=int,
+                        default=DEFAULT_BLOCK_SIZE)
+    parser.add_argument('--prepare-receptor',
+                        dest='prep_receptor_file',
+                        help='[Optional] Save the fully prepared receptor to the given file. Passing this file instead of the PDB-file to -p skips the receptor preparation in subsequent runs (default: none)·',
+                        default=None)
     parser.add_argument('-x',
                         dest='ext_descr',
                         help='[Optional] Calculate extended GRAIL descriptor with subdivided HBA/HBD feature types (default: false)·',
@@ -65,118 +70,118 @@ def parseArguments():
                         help='[Optional] Change protonation of acidic/basic groups to a state likely at pH7 (default: false)·',
                         action='store_true',
                         default=False)
+    parser.add_argument('-j',
+                        dest='num_jobs',
+                        help='[Optional] Number of worker processes calculating descriptors in parallel. Requires an SD-file as ligand file, whose record offsets get indexed in LIG_FILE.idx.npy (default: 1)·',
+                        type=int,
+                        default=1)
+    parser.add_argument('--chunk-size',
+                        dest='chunk_size',
+                        help='[Optional] Number of consecutive ligands processed by a worker process at once (default: 100)·',
+                        type=int,
+                        default=100)
+    parser.add_argument('-P',
+                        dest='poses',
+                        help='[Optional] Rescore docking poses: consecutive records of the same ligand in the ligand file are treated as poses of one ligand that is prepared only once, and one output row <NAME>_<POSE> is written per pose (default: false)·',
+                        action='store_true',
+                        default=False)
 
-    return parser.parse_args()
+    site_group = parser.add_mutually_exclusive_group()
 
-def removeNonStdResidues(pdb_file, protein):
-    residues = Biomol.ResidueList(protein)
-    
-    for res in residues:
-        is_std_res = Biomol.ResidueDictionary.isStdResidue(Biomol.getResidueCode(res))
-        
-        if is_std_res and res.numAtoms < 5:
-            print('!! While processing %s: isolated standard residue fragment of size %s found' % (pdb_file, str(res.numAtoms)), file=sys.stderr)
-            protein -= res
-            
-        elif REMOVE_NON_STD_RESIDUES and not is_std_res:
-            if res.numAtoms == 1 and Chem.AtomDictionary.isMetal(Chem.getType(res.atoms[0])):
-                continue
-
-            protein -= res
-
-    Chem.clearSSSR(protein)
-
-def checkProtein(pdb_file, protein):
-    for atom in protein.atoms:
-        if Chem.getType(atom) == Chem.AtomType.H and atom.numAtoms == 0:
-            print('!! While processing %s: isolated hydrogen atom encountered' % pdb_file, file=sys.stderr)
-             
-        elif Chem.getType(atom) == Chem.AtomType.UNKNOWN:
-            print('!! While processing %s: atom of unknown element encountered' % pdb_file, file=sys.stderr)
-
-def loadPDBFile(pdb_file, norm_chgs):
-    print('Loading PDB-file %s...' % path.basename(pdb_file))
-    
-    pdb_reader = Biomol.FilePDBMoleculeReader(pdb_file)
-    protein = Chem.BasicMolecule()
+    site_group.add_argument('--site-union',
+                            dest='site_union',
+                            help='[Optional] Extract one binding site environment for all ligands: the protein residues within the environment radius of any atom of the prepared input ligands, hydrogens included (default: false)·',
+                            action='store_true',
+                            default=False)
+    site_group.add_argument('--site-ref',
+                            dest='site_ref_lig_file',
+                            help='[Optional] Extract one binding site environment for all ligands around the reference ligand(s) in the given file (default: none)·',
+                            default=None)
+    site_group.add_argument('--site-residues',
+                            dest='site_residues',
+                            help='[Optional] Use the given residues as binding site environment for all ligands. Comma separated list of CHAIN:NUMBER[INSERTION_CODE] items, e.g. A:45,A:46,B:101A (default: none)·',
+                            default=None)
 
-    if not pdb_reader.read(protein):
-        sys.exit('!! Reading PDB-file %s failed' % path.basename(pdb_file), file=sys.stderr)
-    
-    checkProtein(path.basename(pdb_file), protein)
-    removeNonStdResidues(path.basename(pdb_file), protein)
-    
-    GRAIL.prepareForGRAILDescriptorCalculation(protein, norm_chgs)
+    args = parser.parse_args()
 
-    return protein
+    if args.prep_receptor_file is None and (args.lig_file is None or args.out_csv_file is None):
+        parser.error('the following arguments are required: -l, -o')
 
-def processComplex(protein, ligand, out_file, descr_calc, lig_idx, norm_chgs):
-    GRAIL.prepareForGRAILDescriptorCalculation(ligand, norm_chgs)
+    if args.num_jobs > 1 and args.lig_file is not None:
+        if args.poses:
+            parser.error('argument -j: pose rescoring (-P) is done by a single process')
 
-    lig_env = Chem.Fragment()
+        if not args.lig_file[0].lower().endswith('.sdf'):
+            parser.error('argument -j: parallel processing requires an SD-file as ligand file')
 
-    Biomol.extractEnvironmentResidues(ligand, protein, lig_env, Chem.Atom3DCoordinatesFunctor(), LIG_ENV_MAX_RADIUS, False)
-    Chem.extractSSSRSubset(protein, lig_env, True)
+    return args
 
-    line = Chem.getName(ligand)
+def loadReceptor(rec_file, norm_chgs):
+    if Receptor.is_prepared_file(rec_file):
+        print('Loading prepared receptor %s...' % path.basename(rec_file))
+    else:
+        print('Loading PDB-file %s...' % path.basename(rec_file))
 
-    if not line:
-        line = str(lig_idx)
+    try:
+        receptor = Receptor.read(rec_file, norm_chgs)
 
-    descr = Math.DVector()
-    lig_atom_coords = Math.Vector3DArray()
+    except (IOError, ValueError) as e:
+        sys.exit('!! Reading receptor %s failed: %s' % (path.basename(rec_file), str(e)))
 
-    Chem.get3DCoordinates(ligand, lig_atom_coords)
+    for warning in receptor.warnings:
+        print('!! While processing %s: %s' % (path.basename(rec_file), warning), file=sys.stderr)
 
-    descr_calc.initTargetData(lig_env, Chem.Atom3DCoordinatesFunctor())
-    descr_calc.initLigandData(ligand)
+    return receptor
 
-    descr_calc.calculate(lig_atom_coords, descr)
+def extractBindingSite(args, protein):
+    try:
+        if args.site_union:
+            print('Extracting binding site spanning all ligands in %s...' % path.basename(args.lig_file[0]))
 
-    for i in range(0, descr_calc.TOTAL_DESCRIPTOR_SIZE):
-        line += (',' + str(descr(i)))
+            return extract_union_environment(protein, args.lig_file[0], args.norm_chgs)
 
-    out_file.write(line + '\n')
-    out_file.flush()
+        if args.site_ref_lig_file:
+            print('Extracting binding site around reference ligand(s) in %s...' % path.basename(args.site_ref_lig_file))
 
-def outputColNames(out_file, descr_calc):
-    out_file.write('Ligand')
+            return extract_reference_environment(protein, args.site_ref_lig_file)
 
-    for cn in descr_calc.ElementIndex.names.keys():
-        out_file.write(',' + cn)
+        if args.site_residues:
+            print('Extracting binding site residues %s...' % args.site_residues)
 
-    out_file.write('\n')
-    out_file.flush()
-    
-def process(args):
-    protein = loadPDBFile(args.pdb_file[0], args.norm_chgs)
-    
-    lig_reader = Chem.MoleculeReader(args.lig_file[0])
+            return extract_residues_environment(protein, args.site_residues)
+
+    except (IOError, ValueError) as e:
+        sys.exit('!! ' + str(e))
 
-    Chem.setMultiConfImportParameter(lig_reader, False)
+    return None
     
-    ligand = Chem.BasicMolecule()
+def process(args):
+    receptor = loadReceptor(args.pdb_file[0], args.norm_chgs)
 
-    out_file = open(args.out_csv_file[0], 'w')
+    if args.prep_receptor_file:
+        print('Saving prepared receptor to %s...' % path.basename(args.prep_receptor_file))
 
-    if args.ext_descr:
-        descr_calc = GRAIL.GRAILXDescriptorCalculator()
-    else:
-        descr_calc = GRAIL.GRAILDescriptorCalculator()
+        receptor.save(args.prep_receptor_file)
 
-    i = 1
+        if args.lig_file is None:
+            print('Done!')
+            return
     
-    outputColNames(out_file, descr_calc)    
+    site_env = extractBindingSite(args, receptor.protein)
+
+    if site_env is not None:
+        print('Binding site environment: %s atoms' % str(site_env.numAtoms))
+
+    engine = DescriptorEngine(args.ext_descr, args.norm_chgs, args.num_jobs, args.chunk_size)
+    out_file = create_writer(args.out_format, args.out_csv_file[0], 'Ligand', engine.names, args.block_size, sep=',')
 
     print('Calculating descriptors for ligands in %s...' % path.basename(args.lig_file[0]))
-     
-    while lig_reader.read(ligand):
-        try:
-            processComplex(protein, ligand, out_file, descr_calc, i, args.norm_chgs)
-            i += 1
-
-        except Exception as e:
-            print('!! Processing complex failed: ', e, file=sys.stderr)
+
+    for result in engine.run(LibrarySource(receptor, args.lig_file[0], site_env, args.poses)):
+        if result.error is not None:
+            print('!! Processing complex failed: ', result.error, file=sys.stderr)
+        else:
+            out_file.write(result.name, result.descriptors)
 
     out_file.close()
 
@@ -0,0 +1,98 @@
+# -*- mode: python; tab-width: 4 -*-
+
+##
+# merge_descr_shards.py
+#
+# Copyright (C) 2023 Thomas A. Seidel <thomas.seidel@univie.ac.at>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; see the file COPYING. If not, write to
+# the Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+##
+
+import argparse
+import sys
+
+from phantomdragon.output import FORMATS, FailureLedger, create_writer, get_failure_ledger_path
+from phantomdragon.shard import merge_shards
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description='Combines the descriptor outputs of the shards of a calc_descr_pdb_bind.py --shard i/N calculation into one file sorted by PDB code.')
+
+    parser.add_argument('manifests',
+                        help='[Required] The manifest files (OUT_CSV_FILE.manifest.json) of all shards.',
+                        nargs='+')
+    parser.add_argument('-o',
+                        dest='out_file',
+                        required=True,
+                        help='[Required] The path of the combined descriptor file. The combined failure report is written to OUT_FILE.failed.',
+                        nargs=1)
+    parser.add_argument('-f',
+                        dest='out_format',
+                        help='[Optional] Format of the combined descriptor file: csv, npy or parquet (default: csv)·',
+                        choices=FORMATS,
+                        default='csv')
+    parser.add_argument('--force',
+                        dest='force',
+                        help='[Optional] Write the combined files even if shards or complexes are missing or complexes are duplicated; duplicates are then taken from the lowest shard (default: false)·',
+                        action='store_true',
+                        default=False)
+
+    return parser.parse_args()
+
+def reportProblems(merged):
+    problems = [('missing shards', merged.missing_shards),
+                ('unfinished shards', merged.incomplete_shards),
+                ('complexes neither calculated nor failed', merged.missing),
+                ('duplicated complexes', merged.duplicates),
+                ('complexes in the wrong shard', merged.misplaced)]
+    num_problems = 0
+
+    for title, items in problems:
+        if items:
+            print('!! %s %s: %s' % (len(items), title, ' '.join(map(str, items))), file=sys.stderr)
+            num_problems += len(items)
+
+    return num_problems
+
+def process(args):
+    try:
+        merged = merge_shards(args.manifests)
+
+    except (OSError, ValueError) as e:
+        sys.exit('!! ' + str(e))
+
+    print('Merged %s shard(s): %s complexes calculated, %s failed' % (len(args.manifests), len(merged.ids), len(merged.failures)))
+
+    if reportProblems(merged) > 0 and not args.force:
+        sys.exit('!! Shard outputs are incomplete or inconsistent, nothing written (use --force to write anyway)')
+
+    out_path = args.out_file[0]
+
+    with create_writer(args.out_format, out_path, merged.id_name, merged.columns) as out_file:
+        for identifier, values in zip(merged.ids, merged.values):
+            out_file.write(identifier, values)
+
+    failed_file = FailureLedger(get_failure_ledger_path(out_path))
+
+    for identifier, reason in merged.failures:
+        failed_file.write(identifier, reason)
+
+    failed_file.close()
+
+    print('Done!')
+
+if __name__ == '__main__':
+    process(parseArguments())
@@ -1,5 +1,6 @@
+import argparse
 import pandas as pd
-import phantomdragon.functions as ph
+from phantomdragon.grid import STATS_COLUMNS, GridRunner, expand_grid
 
 datatypes = ["all", "ki", "kd"]
 descriptortypes = ["GRADE", "X-GRADE"]
@@ -15,160 +16,47 @@ modeltypes = [
 ]
 scoretypes = ["pKd pKi pIC50"]
 classes = ["1", "2", "3", "4", "5", "6", "7"]
+# the PDBbind set the complexes of each EC class are tested on
+sets = {"test": "general", "val": "core"}
 
-modeltype_list = []
-scoretype_list = []
-datatype_list = []
-mae_list = []
-mse_list = []
-sd_list = []
-pear_list = []
-spear_list = []
-coef_list = []
-confidence_interval_list = []
-add_info_list = []
-classes_list = []
-setlist = []
-setsizes = []
+parser = argparse.ArgumentParser(description="Trains the models on the PDBbind refined set and tests them on the EC classes of the general and core set.")
+parser.add_argument("--shared-fit",
+                    dest="shared_fit",
+                    help="[Optional] Test the core set classes with one model per model type, data type and descriptor, trained without the core complexes of all classes instead of those of the tested class; faster, but the results differ from those of separately trained models (default: false)·",
+                    action="store_true",
+                    default=False)
+parser.add_argument("-j",
+                    dest="num_jobs",
+                    help="[Optional] Number of worker processes running the experiments, 0 for one per CPU; XGBoost trains on all CPUs in each process (default: 1)·",
+                    type=int,
+                    default=1)
+args = parser.parse_args()
 
-for c in classes:
-    for k in datatypes:
-        for modeltype in modeltypes:
-            for score in scoretypes:
-                for descriptor in descriptortypes:
-                    param = ph.parameterCollector(
-                        add_information=f"{descriptor}_class{c}_test", modeltype=modeltype, scoretype=score
-                    )
-                    x_train, x_test, y_train, y_test = ph.prepare_data(
-                        score,
-                        f"../data/Descriptors/PDBbind_refined_set_{descriptor}.csv",
-                        f"../data/Descriptors/EC_numbers/PDBbind_general_set_{descriptor}_class{c}.csv",
-                        f"../data/exp_data/PDBbind_refined_set_{k}.csv",
-                        f"../data/exp_data/EC_numbers/general_set_class{c}.csv",
-                        f"{descriptor}_class{c}_test",
-                    )
-                    if len(x_train) > 1 and len(y_train) > 1 and len(x_test) > 1 and len(y_test) > 1:
-                        param.set_trainingdata(x_train, y_train)
-                        param.set_testingdata(x_test, y_test)
-                        param.set_datatype(f"{k}")
-                        param.train_and_save_model(savepath="../models/")
-                        param.phantomtest(loadpath="../models/")
-                        # param.plot_phantomtest("../plots/")
-                        (
-                            modeltype,
-                            scoret,
-                            datatype,
-                            mae,
-                            mse,
-                            sd,
-                            pearsonr,
-                            confidence_interval,
-                            r_2,
-                            spearman_r,
-                            add_info,
-                        ) = param.get_stats(spearman=True)
-                        modeltype_list.append(modeltype)
-                        scoretype_list.append(scoret)
-                        datatype_list.append(datatype)
-                        mae_list.append(mae)
-                        mse_list.append(mse)
-                        sd_list.append(sd)
-                        pear_list.append(pearsonr)
-                        confidence_interval_list.append(confidence_interval)
-                        coef_list.append(r_2)
-                        spear_list.append(spearman_r)
-                        add_info_list.append(add_info)
-                        classes_list.append(c)
-                        setlist.append("test")
-                        setsizes.append(len(x_test))
-                        print(k, modeltype, score, f"done ({descriptor})","Class",c,"Test")
-                        print("Training Set size", len(x_train))
-                        print("Testing Set size", len(x_test))
-                    else:
-                        print(f"No data for class {c} Test ({descriptor})")
-    ############################################################################################
-                    param = ph.parameterCollector(
-                        add_information=f"{descriptor}_class{c}_val", modeltype=modeltype, scoretype=score
-                    )
-                    x_train, x_test, y_train, y_test = ph.prepare_data(
-                        score,
-                        f"../data/Descriptors/PDBbind_refined_set_{descriptor}.csv",
-                        f"../data/Descriptors/EC_numbers/PDBbind_core_set_{descriptor}_class{c}.csv",
-                        f"../data/exp_data/PDBbind_refined_set_{k}.csv",
-                        f"../data/exp_data/EC_numbers/core_set_class{c}.csv",
-                        f"{descriptor}_class{c}_val",
-                    )
-                    if len(x_train) > 1 and len(y_train) > 1 and len(x_test) > 1 and len(y_test) > 1:
-                        param.set_trainingdata(x_train, y_train)
-                        param.set_testingdata(x_test, y_test)
-                        param.set_datatype(f"{k}")
-                        param.train_and_save_model(savepath="../models/")
-                        param.phantomtest(loadpath="../models/")
-                        # param.plot_phantomtest("../plots/")
-                        (
-                            modeltype,
-                            scoret,
-                            datatype,
-                            mae,
-                            mse,
-                            sd,
-                            pearsonr,
-                            confidence_interval,
-                            r_2,
-                            spearman_r,
-                            add_info,
-                        ) = param.get_stats(spearman=True)
-                        modeltype_list.append(modeltype)
-                        scoretype_list.append(scoret)
-                        datatype_list.append(datatype)
-                        mae_list.append(mae)
-                        mse_list.append(mse)
-                        sd_list.append(sd)
-                        pear_list.append(pearsonr)
-                        confidence_interval_list.append(confidence_interval)
-                        coef_list.append(r_2)
-                        spear_list.append(spearman_r)
-                        add_info_list.append(add_info)
-                        classes_list.append(c)
-                        setlist.append("val")
-                        setsizes.append(len(x_test))
-                        print(k, modeltype, score, f"done ({descriptor})","Class",c,"Validation")
-                        print("Training Set size", len(x_train))
-                        print("Testing Set size", len(x_test))
-                    else:
-                        print(f"No data for class {c} Validation ({descriptor})")
+cells = expand_grid(
+    {
+        "class": classes,
+        "datatype": datatypes,
+        "modeltype": modeltypes,
+        "scoretype": scoretypes,
+        "descriptor": descriptortypes,
+        "set": list(sets),
+    },
+    featurepath_train="../data/Descriptors/PDBbind_refined_set_{descriptor}.csv",
+    featurepath_test=lambda axes: f"../data/Descriptors/EC_numbers/PDBbind_{sets[axes['set']]}_set_{axes['descriptor']}_class{axes['class']}.csv",
+    experimentpath_train="../data/exp_data/PDBbind_refined_set_{datatype}.csv",
+    experimentpath_test=lambda axes: f"../data/exp_data/EC_numbers/{sets[axes['set']]}_set_class{axes['class']}.csv",
+    add_information="{descriptor}_class{class}_{set}",
+    fit_group=lambda axes: f"{axes['descriptor']}_classes_val" if args.shared_fit and axes["set"] == "val" else None,
+)
 
+# with -j > 1, each worker process loads the training sets once; the result rows are written to the .rows.csv file
+# as they finish. Classes without data are skipped. With --shared-fit, the classes of the core set are
+# tested with one model per model type, data type and descriptor, which is trained without the core complexes of all
+# classes. The general set classes overlap with more than half of the refined set together, their models are always
+# trained per class.
+rows = GridRunner(args.num_jobs).run(cells, "../results/classes_results.rows.csv")
 
-print(
-    len(modeltype_list),
-    len(scoretype_list),
-    len(datatype_list),
-    len(mae_list),
-    len(mse_list),
-    len(sd_list),
-    len(pear_list),
-    len(confidence_interval_list),
-    len(coef_list),
-    len(spear_list),
-    len(add_info_list),
-    len(classes_list),
-    len(setlist),
-)
-data = {
-    "Modeltype": modeltype_list,
-    "Scoretype": scoretype_list,
-    "Datatype": datatype_list,
-    "Mean absolute error (mae)": mae_list,
-    "Mean squared error (mse)": mse_list,
-    "Standard Diviation (SD)": sd_list,
-    "Pearson correlation coefficient (r)": pear_list,
-    "90% Confidence interval": confidence_interval_list,
-    "Coefficient of determination (r²)": coef_list,
-    "Spearman correlation coefficient": spear_list,
-    "add. information": add_info_list,
-    "Classes": classes_list,
-    "Set": setlist,
-    "Set size": setsizes,
-}
-df = pd.DataFrame(data)
+df = pd.DataFrame(rows)
+df = df.rename(columns={"class": "Classes", "set": "Set", "Testing set size": "Set size"})
+df = df[list(STATS_COLUMNS) + ["Classes", "Set", "Set size"]]
 df.to_csv("../results/classes_results.csv")
@@ -0,0 +1,220 @@
+# -*- mode: python; tab-width: 4 -*-
+
+##
+# score_panel.py
+#
+# Copyright (C) 2023 Thomas A. Seidel <thomas.seidel@univie.ac.at>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; see the file COPYING. If not, write to
+# the Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+##
+
+import argparse
+import sys
+
+from os import path
+
+import joblib
+import numpy as np
+
+from phantomdragon.descriptors import Receptor, extract_union_environment
+from phantomdragon.output import DEFAULT_BLOCK_SIZE, FORMATS, create_writer, get_variant_path
+from phantomdragon.panel import PanelScorer
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description='Scores a set of input ligands against a panel of receptors and writes a ligand x receptor matrix of predicted affinities.')
+
+    parser.add_argument('-l',
+                        dest='lig_file',
+                        required=True,
+                        help='[Required] The file providing the ligand poses. All receptors have to share the coordinate frame of the poses (e.g. superimposed structures).',
+                        nargs=1)
+    parser.add_argument('-p',
+                        dest='rec_files',
+                        required=True,
+                        help='[Required] The receptor PDB-files or receptor files written by calc_descr_pdb_ligands.py --prepare-receptor. The receptors are named by their file names without extension.',
+                        nargs='+')
+    parser.add_argument('-m',
+                        dest='model_file',
+                        help='[Optional] A model saved by parameterCollector.train_and_save_model() for the calculated descriptor (all elements, e.g. add_information "GRADE" or "X-GRADE"). Required for -o (default: none)·',
+                        default=None)
+    parser.add_argument('-o',
+                        dest='out_csv_file',
+                        help='[Optional] The path of the output CSV-file with one row per ligand and one column of predicted scores per receptor; failed pairs are nan (default: none)·',
+                        default=None)
+    parser.add_argument('-d',
+                        dest='descr_file',
+                        help='[Optional] Write the descriptors of each receptor to a file named by replacing {variant} in DESCR_FILE by the receptor name or by inserting _RECEPTOR before its extension (default: none)·',
+                        default=None)
+    parser.add_argument('-f',
+                        dest='descr_format',
+                        help='[Optional] Format of the descriptor files written with -d: csv, npy or parquet (default: csv)·',
+                        choices=FORMATS,
+                        default='csv')
+    parser.add_argument('-b',
+                        dest='block_size',
+                        help='[Optional] Number of ligands whose scores are predicted and written at once (default: %d)·' % DEFAULT_BLOCK_SIZE,
+                        type=int,
+                        default=DEFAULT_BLOCK_SIZE)
+    parser.add_argument('-x',
+                        dest='ext_descr',
+                        help='[Optional] Calculate extended GRAIL descriptor with subdivided HBA/HBD feature types (default: false)·',
+                        action='store_true',
+                        default=False)
+    parser.add_argument('-c',
+                        dest='norm_chgs',
+                        help='[Optional] Change protonation of acidic/basic groups to a state likely at pH7 (default: false)·',
+                        action='store_true',
+                        default=False)
+    parser.add_argument('--site-union',
+                        dest='site_union',
+                        help='[Optional] Use a fixed binding site per receptor made of the residues within the environment radius of any ligand of the input file, instead of the environment of each ligand (default: false)·',
+                        action='store_true',
+                        default=False)
+
+    args = parser.parse_args()
+
+    if args.out_csv_file and not args.model_file:
+        parser.error('argument -o: requires argument -m')
+
+    if args.model_file and not args.out_csv_file:
+        parser.error('argument -m: requires argument -o')
+
+    if not args.out_csv_file and not args.descr_file:
+        parser.error('one of the arguments -o (with -m) or -d is required')
+
+    return args
+
+def getReceptorName(rec_file):
+    name = path.basename(rec_file)
+
+    while path.splitext(name)[1]:
+        name = path.splitext(name)[0]
+
+    return name
+
+def loadReceptors(args):
+    receptors = []
+
+    for rec_file in args.rec_files:
+        name = getReceptorName(rec_file)
+
+        if name in [rec_name for rec_name, receptor in receptors]:
+            sys.exit('!! Receptor name %s is not unique' % name)
+
+        print('Loading receptor %s...' % name)
+
+        try:
+            receptor = Receptor.read(rec_file, args.norm_chgs)
+
+        except (IOError, ValueError) as e:
+            sys.exit('!! Reading receptor %s failed: %s' % (path.basename(rec_file), str(e)))
+
+        for warning in receptor.warnings:
+            print('!! While processing %s: %s' % (path.basename(rec_file), warning), file=sys.stderr)
+
+        receptors.append((name, receptor))
+
+    return receptors
+
+def loadModel(model_file, num_features):
+    try:
+        model = joblib.load(model_file)
+
+    except Exception as e:
+        sys.exit('!! Loading model %s failed: %s' % (model_file, str(e)))
+
+    if getattr(model, 'n_features_in_', num_features) != num_features:
+        sys.exit('!! Model %s expects %s features, the descriptor has %s elements' % (model_file, model.n_features_in_, num_features))
+
+    return model
+
+def writeScores(model, out_file, names, blocks):
+    descriptors = np.concatenate(blocks)
+    valid = ~np.isnan(descriptors).any(axis=1)
+    scores = np.full(len(descriptors), np.nan)
+
+    if valid.any():
+        scores[valid] = model.predict(descriptors[valid])
+
+    scores = scores.reshape(len(names), -1)
+
+    for name, row in zip(names, scores):
+        out_file.write(name, row)
+
+def process(args):
+    receptors = loadReceptors(args)
+    site_envs = None
+
+    if args.site_union:
+        print('Extracting binding sites spanning all ligands in %s...' % path.basename(args.lig_file[0]))
+
+        try:
+            site_envs = [extract_union_environment(receptor.protein, args.lig_file[0], args.norm_chgs) for name, receptor in receptors]
+
+        except (IOError, ValueError) as e:
+            sys.exit('!! ' + str(e))
+
+    scorer = PanelScorer(receptors, args.ext_descr, site_envs)
+    model = None
+    out_file = None
+    descr_files = []
+
+    if args.model_file:
+        model = loadModel(args.model_file, len(scorer.names))
+        out_file = create_writer('csv', args.out_csv_file, 'Ligand', scorer.receptor_names, args.block_size, sep=',')
+
+    if args.descr_file:
+        descr_files = [create_writer(args.descr_format, get_variant_path(args.descr_file, name), 'Ligand', scorer.names, args.block_size, sep=',')
+                       for name in scorer.receptor_names]
+
+    names = []
+    blocks = []
+
+    for name, descriptors, errors in scorer.run(args.lig_file[0]):
+        print('Processed ligand %s' % name)
+
+        for rec_name, error in zip(scorer.receptor_names, errors):
+            if error is not None:
+                print('!! Processing ligand %s with receptor %s failed: ' % (name, rec_name), error, file=sys.stderr)
+
+        for descr_file, descr, error in zip(descr_files, descriptors, errors):
+            if error is None:
+                descr_file.write(name, descr)
+
+        if model is not None:
+            names.append(name)
+            blocks.append(descriptors)
+
+            if len(names) == args.block_size:
+                writeScores(model, out_file, names, blocks)
+                names = []
+                blocks = []
+
+    if model is not None:
+        if names:
+            writeScores(model, out_file, names, blocks)
+
+        out_file.close()
+
+    for descr_file in descr_files:
+        descr_file.close()
+
+    print(scorer.report())
+    print('Done!')
+
+if __name__ == '__main__':
+    process(parseArguments())
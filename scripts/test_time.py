@@ -1,19 +1,5 @@
 import pandas as pd
-import phantomdragon.functions as ph
-import time
-
-modeltype_list = []
-scoretype_list = []
-datatype_list = []
-mae_list = []
-mse_list = []
-sd_list = []
-pear_list = []
-coef_list = []
-confidence_interval_list =[]
-add_info_list = []
-timelist =[]
-test_val_list = []
+from phantomdragon.grid import STATS_COLUMNS, GridRunner, expand_grid
 
 datatypes = ["all","ki","kd"]
 modeltypes = ["linearRegression","Ridge","Lasso","ElasticNet","SVR","DecisionTree","RandomForest","XGBoost"]
@@ -21,75 +7,20 @@ scoretypes = ["pKd pKi pIC50"]
 descriptor = ["PLEC","GRADE","X-GRADE"]
 test_val = ["core","general"]
 
-for modeltype in modeltypes:
-    for score in scoretypes:
-        for k in datatypes:
-            for des in descriptor:
-                for t in test_val:
-
-                    tmp_modeltype_list = []
-                    tmp_scoretype_list = []
-                    tmp_datatype_list = []
-                    tmp_mae_list = []
-                    tmp_mse_list = []
-                    tmp_sd_list = []
-                    tmp_pear_list = []
-                    tmp_coef_list = []
-                    tmp_confidence_interval_list =[]
-                    tmp_add_info_list = []
-                    tmp_timelist =[]
-                    param = ph.parameterCollector(
-                                        add_information=f"{des}_{t}",
-                                        modeltype=modeltype,
-                                        scoretype=score,
-                                    )
-                    param = ph.parameterCollector(add_information=f"{des}",modeltype=modeltype,scoretype=score)
-                    x_train,x_test,y_train,y_test = ph.prepare_data(score,
-                    f"../data/Descriptors/PDBbind_refined_set_{des}.csv",
-                    f"../data/Descriptors/PDBbind_{t}_set_{des}.csv",
-                    f"../data/exp_data/PDBbind_refined_set_{k}.csv",
-                    f"../data/exp_data/PDBbind_{t}_set_all.csv",
-                    f"{des}")
-                    param.set_trainingdata(x_train,y_train)
-                    param.set_testingdata(x_test,y_test)
-                    param.set_datatype(k)
-                    # param.train_and_save_model(savepath="../models/")
-                    for i in range(10):
-                        start = time.time()
-                        param.phantomtest(loadpath="../models/")
-                        end = time.time()
-                        # param.plot_phantomtest("../plots/")
-                        modeltype,scoret,datatype,mae,mse,sd,pearsonr,confidence_interval,r_2,add_info = param.get_stats()
-                        tmp_modeltype_list.append(modeltype)
-                        tmp_scoretype_list.append(scoret)
-                        tmp_datatype_list.append(datatype)
-                        tmp_mae_list.append(mae)
-                        tmp_mse_list.append(mse)
-                        tmp_sd_list.append(sd)
-                        tmp_pear_list.append(pearsonr)
-                        tmp_confidence_interval_list.append(confidence_interval)
-                        tmp_coef_list.append(r_2)
-                        tmp_add_info_list.append(add_info)
-                        tmp_timelist.append(end-start)
-                    modeltype_list.append(tmp_modeltype_list[0])
-                    scoretype_list.append(tmp_scoretype_list[0])
-                    datatype_list.append(tmp_datatype_list[0])
-                    mae_list.append(sum(tmp_mae_list)/10)
-                    mse_list.append(sum(tmp_mse_list)/10)
-                    coef_list.append(sum(tmp_coef_list)/10)
-                    sd_list.append(sum(tmp_sd_list)/10)
-                    pear_list.append(sum(tmp_pear_list)/10)
-                    confidence_interval_list.append(tmp_confidence_interval_list[0])
-                    add_info_list.append(tmp_add_info_list[0])
-                    timelist.append(sum(tmp_timelist)/10)
-                    test_val_list.append(t)
-
+# the saved models of the pred_*.py scripts are tested 10 times each, the statistics and times are averaged
+cells = expand_grid({"modeltype": modeltypes, "scoretype": scoretypes, "datatype": datatypes, "descriptor": descriptor, "test_set": test_val},
+                    featurepath_train="../data/Descriptors/PDBbind_refined_set_{descriptor}.csv",
+                    featurepath_test="../data/Descriptors/PDBbind_{test_set}_set_{descriptor}.csv",
+                    experimentpath_train="../data/exp_data/PDBbind_refined_set_{datatype}.csv",
+                    experimentpath_test="../data/exp_data/PDBbind_{test_set}_set_all.csv",
+                    add_information="{descriptor}",
+                    train=False,
+                    repeats=10)
 
-                    print(t,des,k,modeltype,score,"done")
-                    print("Training Set size",len(x_train))
-                    print("Testing Set size",len(x_test))
+# one cell at a time, concurrently running cells would distort the measured times
+rows = GridRunner(num_jobs=1).run(cells, "../results/time_all.rows.csv")
 
-#print(len(modeltype_list),len(featuretype_list),len(datatype_list),len(mse_list),len(pear_list),len(coef_list),len(add_info_list))
-data = {'Modeltype':modeltype_list,'Scoretype':scoretype_list,'Datatype':datatype_list,'Mean absolute error (mae)':mae_list,'Mean squared error (mse)':mse_list,'Standard Diviation (SD)':sd_list,'Pearson correlation coefficient (r)':pear_list,'90% Confidence interval':confidence_interval_list,'Coefficient of determination (r²)':coef_list,'add. information':add_info_list,'Time':timelist,'Tested on':test_val_list}
-df = pd.DataFrame(data)
-df.to_csv("../results/time_all.csv")
\ No newline at end of file
+df = pd.DataFrame(rows)
+df = df.rename(columns={"test_set": "Tested on"})
+df = df[[name for name in STATS_COLUMNS if name != "Spearman correlation coefficient"] + ["Time", "Tested on"]]
+df.to_csv("../results/time_all.csv")